@@ -0,0 +1,792 @@
+"""
+Caching of Wikipedia pages between crawls.
+
+The page cache sits under `get_pages_content`: `CachingPageSource` answers from the cache and only
+asks the wrapped client for pages it does not know. Entries older than the TTL are revalidated by
+their latest revision id, so unchanged pages are never downloaded twice.
+
+Pages being fetched for a crawl are not requested again by the other crawls running at the same
+time, they wait for the same fetch instead.
+
+The word counts of every page revision are cached next to the text, so a page is only tokenized
+once per revision and normalization.
+
+With a `PageRefresher` running, the cached pages are revalidated in the background before their
+TTL expires, and the changed ones are fetched and counted again. The cache then works as a store of
+precomputed per-article counts, and requests for the articles it holds do not wait for the API.
+
+The finished results of whole requests are kept in a separate `ResultCache`, bounded by their
+estimated size in memory.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from time import time
+from typing import Generic, NamedTuple, Protocol, TypeVar
+
+import httpx
+
+from wikicounter.counting import NORMALIZATION_KEY
+from wikicounter.scheduling import BACKGROUND_PRIORITY, request_priority
+from wikicounter.tokenization import ProcessTokenizer
+from wikicounter.wiki_connection import PageContent, WikiApiError, WikiClient
+
+REFRESH_BATCH_SIZE = 500
+"""Number of cached pages revalidated at once by the background refresher."""
+
+_logger = logging.getLogger(__name__)
+
+_Key = TypeVar("_Key", bound=Hashable)
+_Value = TypeVar("_Value")
+
+
+class CountsKey(NamedTuple):
+    """Key of the cached word counts of a page."""
+
+    title: str
+    revision_id: int
+    normalization_key: str
+
+
+class CachedPage(NamedTuple):
+    """A cached page with the time it was last fetched or revalidated."""
+
+    content: PageContent
+    fetched_at: float
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters of a cache."""
+
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    coalesced: int = 0
+    refreshed: int = 0
+
+
+@dataclass
+class ResultCacheStats:
+    """Hit, miss and eviction counters and the current size of the result cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+class PageCache(Protocol):
+    """Storage backend of the page cache."""
+
+    def get(self, title: str) -> CachedPage | None:
+        """Returns the cached page, or None if the title is not cached."""
+        ...
+
+    def set(self, title: str, page: CachedPage) -> None:
+        """Stores a page in the cache."""
+        ...
+
+    def stale_pages(self, fetched_before: float, limit: int) -> dict[str, CachedPage]:
+        """Returns at most `limit` pages fetched before the given time, oldest first."""
+        ...
+
+    def get_counts(self, key: CountsKey) -> Counter | None:
+        """Returns the cached word counts of a page revision, or None if they are not cached."""
+        ...
+
+    def set_counts(self, key: CountsKey, counts: Counter) -> None:
+        """Stores the word counts of a page revision."""
+        ...
+
+    def __len__(self) -> int:
+        """Returns the number of cached pages."""
+        ...
+
+    async def flush(self) -> None:
+        """Writes the buffered changes to the storage."""
+        ...
+
+    def close(self) -> None:
+        """Writes the buffered changes and releases the resources held by the cache."""
+        ...
+
+
+class LRUPageCache:
+    """In-memory page cache evicting the least recently used page."""
+
+    def __init__(self, max_size: int) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            max_size (int): The maximum number of pages kept in memory.
+        """
+        self.max_size = max_size
+        self._pages: OrderedDict[str, CachedPage] = OrderedDict()
+        self._counts: OrderedDict[CountsKey, Counter] = OrderedDict()
+
+    def get(self, title: str) -> CachedPage | None:
+        """Returns the cached page, or None if the title is not cached."""
+        page = self._pages.get(title)
+        if page is not None:
+            self._pages.move_to_end(title)
+        return page
+
+    def set(self, title: str, page: CachedPage) -> None:
+        """Stores a page in the cache, evicting the least recently used one if it is full."""
+        self._pages[title] = page
+        self._pages.move_to_end(title)
+        while len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+
+    def stale_pages(self, fetched_before: float, limit: int) -> dict[str, CachedPage]:
+        """Returns at most `limit` pages fetched before the given time, oldest first."""
+        stale = sorted(
+            (page.fetched_at, title)
+            for title, page in self._pages.items()
+            if page.fetched_at < fetched_before
+        )
+        return {title: self._pages[title] for _fetched_at, title in stale[:limit]}
+
+    def get_counts(self, key: CountsKey) -> Counter | None:
+        """Returns the cached word counts of a page revision, or None if they are not cached."""
+        counts = self._counts.get(key)
+        if counts is not None:
+            self._counts.move_to_end(key)
+        return counts
+
+    def set_counts(self, key: CountsKey, counts: Counter) -> None:
+        """Stores the word counts of a page revision, evicting the least recently used ones."""
+        self._counts[key] = counts
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.max_size:
+            self._counts.popitem(last=False)
+
+    def __len__(self) -> int:
+        """Returns the number of cached pages."""
+        return len(self._pages)
+
+    async def flush(self) -> None:
+        """Does nothing, the pages are only kept in memory."""
+
+    def close(self) -> None:
+        """Drops the cached pages and word counts."""
+        self._pages.clear()
+        self._counts.clear()
+
+
+@dataclass
+class _BufferedWrites:
+    """Pages and word counts stored in a `SQLitePageCache` but not written to the database yet."""
+
+    pages: dict[str, CachedPage] = field(default_factory=dict)
+    counts: dict[CountsKey, Counter] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        """Returns whether there is anything to write."""
+        return bool(self.pages or self.counts)
+
+
+class SQLitePageCache:
+    """
+    Page cache persisted in a SQLite database, shared between restarts and processes.
+
+    The stored pages and word counts are buffered in memory, and `flush` writes them in one
+    transaction from a worker thread, so a crawl does not wait for a commit per page. The buffered
+    entries are served like the written ones, `close` writes those left. The database is in WAL
+    mode, and the lookups use a connection of their own, so they do not wait for a flush.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        """
+        Opens (and creates if needed) the cache database.
+
+        Args:
+            path (Path | str): The path of the SQLite database file.
+        """
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._buffered = _BufferedWrites()
+        self._writing = _BufferedWrites()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # Readers see the last commit while a flush writes the next one
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    title TEXT PRIMARY KEY,
+                    revision_id INTEGER NOT NULL,
+                    page_text TEXT NOT NULL,
+                    links TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+                """,
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at)",
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS word_counts (
+                    title TEXT NOT NULL,
+                    revision_id INTEGER NOT NULL,
+                    normalization_key TEXT NOT NULL,
+                    counts TEXT NOT NULL,
+                    PRIMARY KEY (title, revision_id, normalization_key)
+                )
+                """,
+            )
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+
+    def get(self, title: str) -> CachedPage | None:
+        """Returns the cached page, or None if the title is not cached."""
+        page = self._get_buffered(title)
+        if page is not None:
+            return page
+        row = self._reader.execute(
+            "SELECT page_text, links, revision_id, fetched_at FROM pages WHERE title = ?",
+            (title,),
+        ).fetchone()
+        if row is None:
+            return None
+        page_text, links, revision_id, fetched_at = row
+        return CachedPage(PageContent(page_text, json.loads(links), revision_id), fetched_at)
+
+    def set(self, title: str, page: CachedPage) -> None:
+        """Stores a page in the cache, replacing the previous version at the next flush."""
+        self._buffered.pages[title] = page
+
+    def stale_pages(self, fetched_before: float, limit: int) -> dict[str, CachedPage]:
+        """Returns at most `limit` pages fetched before the given time, oldest first."""
+        buffered = {**self._writing.pages, **self._buffered.pages}
+        rows = self._reader.execute(
+            "SELECT title, page_text, links, revision_id, fetched_at FROM pages"
+            " WHERE fetched_at < ? ORDER BY fetched_at LIMIT ?",
+            (fetched_before, limit + len(buffered)),
+        ).fetchall()
+        stale = {
+            title: CachedPage(PageContent(page_text, json.loads(links), revision_id), fetched_at)
+            for title, page_text, links, revision_id, fetched_at in rows
+            if title not in buffered
+        }
+        stale.update(
+            (title, page) for title, page in buffered.items() if page.fetched_at < fetched_before
+        )
+        oldest = sorted(stale, key=lambda title: stale[title].fetched_at)[:limit]
+        return {title: stale[title] for title in oldest}
+
+    def get_counts(self, key: CountsKey) -> Counter | None:
+        """Returns the cached word counts of a page revision, or None if they are not cached."""
+        page = self._get_buffered(key.title)
+        if page is not None and page.content.revision_id != key.revision_id:
+            # The counts of the older revisions are deleted by the next flush
+            return None
+        for writes in (self._buffered, self._writing):
+            if key in writes.counts:
+                return writes.counts[key]
+        row = self._reader.execute(
+            "SELECT counts FROM word_counts"
+            " WHERE title = ? AND revision_id = ? AND normalization_key = ?",
+            key,
+        ).fetchone()
+        return None if row is None else Counter(json.loads(row[0]))
+
+    def set_counts(self, key: CountsKey, counts: Counter) -> None:
+        """Stores the word counts of a page revision at the next flush."""
+        self._buffered.counts[key] = counts
+
+    def __len__(self) -> int:
+        """Returns the number of cached pages."""
+        buffered = {*self._writing.pages, *self._buffered.pages}
+        (count,) = self._reader.execute(
+            "SELECT COUNT(*) FROM pages WHERE title NOT IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(buffered)),),
+        ).fetchone()
+        return count + len(buffered)
+
+    async def flush(self) -> None:
+        """Writes the buffered pages and word counts in one transaction, from a worker thread."""
+        async with self._flush_lock:
+            # The entries buffered while writing are written by the next round
+            while self._buffered:
+                self._writing, self._buffered = self._buffered, _BufferedWrites()
+                try:
+                    await asyncio.to_thread(self._write, self._writing)
+                finally:
+                    self._writing = _BufferedWrites()
+
+    def close(self) -> None:
+        """Writes the buffered pages and word counts, and closes the database connection."""
+        self._write(self._buffered)
+        self._buffered = _BufferedWrites()
+        self._reader.close()
+        with self._lock:
+            self._connection.close()
+
+    def _get_buffered(self, title: str) -> CachedPage | None:
+        """Returns the latest version of a page not written yet, or None."""
+        page = self._buffered.pages.get(title)
+        return page if page is not None else self._writing.pages.get(title)
+
+    def _write(self, writes: _BufferedWrites) -> None:
+        """Writes pages and word counts in a single transaction."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO word_counts VALUES (?, ?, ?, ?)",
+                [(*key, json.dumps(counts)) for key, counts in writes.counts.items()],
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        title,
+                        page.content.revision_id,
+                        page.content.page_text,
+                        json.dumps(page.content.links),
+                        page.fetched_at,
+                    )
+                    for title, page in writes.pages.items()
+                ],
+            )
+            # Counts of older revisions will never be used again
+            self._connection.executemany(
+                "DELETE FROM word_counts WHERE title = ? AND revision_id != ?",
+                [(title, page.content.revision_id) for title, page in writes.pages.items()],
+            )
+
+
+class TieredPageCache:
+    """Page cache looking up the tiers in order, e.g. memory first and disk second."""
+
+    def __init__(self, *tiers: PageCache) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            *tiers (PageCache): The caches from the fastest to the slowest.
+        """
+        self.tiers = tiers
+
+    def get(self, title: str) -> CachedPage | None:
+        """Returns the page from the first tier having it and copies it to the faster tiers."""
+        for index, tier in enumerate(self.tiers):
+            page = tier.get(title)
+            if page is not None:
+                for faster_tier in self.tiers[:index]:
+                    faster_tier.set(title, page)
+                return page
+        return None
+
+    def set(self, title: str, page: CachedPage) -> None:
+        """Stores a page in every tier."""
+        for tier in self.tiers:
+            tier.set(title, page)
+
+    def stale_pages(self, fetched_before: float, limit: int) -> dict[str, CachedPage]:
+        """Returns at most `limit` stale pages, the slower tiers keep the pages evicted from memory."""
+        stale: dict[str, CachedPage] = {}
+        for tier in reversed(self.tiers):
+            for title, page in tier.stale_pages(fetched_before, limit).items():
+                stale.setdefault(title, page)
+        oldest = sorted(stale, key=lambda title: stale[title].fetched_at)[:limit]
+        return {title: stale[title] for title in oldest}
+
+    def get_counts(self, key: CountsKey) -> Counter | None:
+        """Returns the word counts from the first tier having them and copies them to the faster tiers."""
+        for index, tier in enumerate(self.tiers):
+            counts = tier.get_counts(key)
+            if counts is not None:
+                for faster_tier in self.tiers[:index]:
+                    faster_tier.set_counts(key, counts)
+                return counts
+        return None
+
+    def set_counts(self, key: CountsKey, counts: Counter) -> None:
+        """Stores the word counts of a page revision in every tier."""
+        for tier in self.tiers:
+            tier.set_counts(key, counts)
+
+    def __len__(self) -> int:
+        """Returns the number of pages in the largest tier."""
+        return max((len(tier) for tier in self.tiers), default=0)
+
+    async def flush(self) -> None:
+        """Writes the buffered changes of every tier."""
+        for tier in self.tiers:
+            await tier.flush()
+
+    def close(self) -> None:
+        """Closes every tier."""
+        for tier in self.tiers:
+            tier.close()
+
+
+class CachingPageSource:
+    """
+    Page source answering from a page cache and fetching only the unknown or changed pages.
+
+    The changes of the cache are flushed in the background, call `flush` before closing it.
+    """
+
+    def __init__(
+        self,
+        client: WikiClient,
+        cache: PageCache,
+        ttl: float,
+        tokenizer: ProcessTokenizer | None = None,
+    ) -> None:
+        """
+        Initializes the page source.
+
+        Args:
+            client (WikiClient): The client used to fetch and revalidate the pages.
+            cache (PageCache): The cache storing the fetched pages.
+            ttl (float): Seconds a cached page is served without checking its latest revision.
+            tokenizer (ProcessTokenizer | None): Counts the words of the pages missing from the
+                cache, in-process if None.
+        """
+        self.client = client
+        self.cache = cache
+        self.ttl = ttl
+        self.tokenizer = tokenizer or ProcessTokenizer(workers=0)
+        self.stats = CacheStats()
+        self.counts_stats = CacheStats()
+        self._in_flight: dict[str, asyncio.Task[dict[str, PageContent]]] = {}
+        self._flush: asyncio.Task[None] | None = None
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        """
+        Fetches the content of several pages, from the cache where possible.
+
+        Args:
+            page_titles (Iterable[str]): The titles of the Wikipedia pages.
+
+        Returns:
+            dict[str, PageContent]: The content of every requested page, keyed by the requested title.
+        """
+        now = time()
+        titles = list(dict.fromkeys(page_titles))
+        contents: dict[str, PageContent] = {}
+        stale: dict[str, PageContent] = {}
+        missing: list[str] = []
+
+        for title in titles:
+            cached = self.cache.get(title)
+            if cached is None:
+                missing.append(title)
+            elif now - cached.fetched_at <= self.ttl:
+                contents[title] = cached.content
+            else:
+                stale[title] = cached.content
+
+        if stale:
+            latest_revisions = await self.client.get_revision_ids(stale)
+            for title, content in stale.items():
+                if latest_revisions[title] != content.revision_id:
+                    missing.append(title)
+                    continue
+                self.cache.set(title, CachedPage(content, now))
+                contents[title] = content
+                self.stats.revalidations += 1
+            self._schedule_flush()
+
+        self.stats.hits += len(contents)
+        self.stats.misses += len(missing)
+        _logger.debug("Page cache: %d hits, %d misses", len(contents), len(missing))
+
+        if missing:
+            contents.update(await self._fetch_missing(missing, now))
+
+        return {title: contents[title] for title in titles}
+
+    async def refresh(self, fetched_before: float, limit: int = REFRESH_BATCH_SIZE) -> int:
+        """
+        Revalidates the oldest cached pages before a request needs them.
+
+        Unchanged pages are kept, changed pages are fetched again and their words are counted, so
+        the next request finds the counts of the latest revision in the cache.
+
+        Args:
+            fetched_before (float): Only the pages fetched or revalidated before this time are
+                refreshed.
+            limit (int): The maximum number of pages refreshed.
+
+        Returns:
+            int: The number of refreshed pages, less than `limit` when no stale page is left.
+        """
+        now = time()
+        stale = self.cache.stale_pages(fetched_before, limit)
+        if not stale:
+            return 0
+
+        latest_revisions = await self.client.get_revision_ids(stale)
+        changed: list[str] = []
+        for title, cached in stale.items():
+            if latest_revisions[title] != cached.content.revision_id:
+                changed.append(title)
+            else:
+                self.cache.set(title, CachedPage(cached.content, now))
+        self._schedule_flush()
+        if changed:
+            fetched = await self._fetch_missing(changed, now)
+            await asyncio.gather(*(self.count_page(title, page) for title, page in fetched.items()))
+
+        self.stats.refreshed += len(stale)
+        _logger.debug("Refreshed %d cached pages, %d changed", len(stale), len(changed))
+        return len(stale)
+
+    async def _fetch_missing(self, titles: list[str], now: float) -> dict[str, PageContent]:
+        """Fetches the pages missing from the cache, joining the fetches already in flight."""
+        fetches = {self._in_flight[title] for title in titles if title in self._in_flight}
+        new_titles = [title for title in titles if title not in self._in_flight]
+        self.stats.coalesced += len(titles) - len(new_titles)
+
+        if new_titles:
+            fetch = asyncio.ensure_future(self._fetch_and_cache(new_titles, now))
+            self._in_flight.update(dict.fromkeys(new_titles, fetch))
+            fetch.add_done_callback(partial(self._forget_fetch, new_titles))
+            fetches.add(fetch)
+
+        # A cancelled crawl must not cancel the fetches other crawls are waiting for
+        fetched: dict[str, PageContent] = {}
+        for contents in await asyncio.gather(*map(asyncio.shield, fetches)):
+            fetched.update(contents)
+        return {title: fetched[title] for title in titles}
+
+    async def _fetch_and_cache(self, titles: list[str], now: float) -> dict[str, PageContent]:
+        """Fetches pages with the client and stores them in the cache."""
+        fetched = await self.client.get_pages_content(titles)
+        for title, content in fetched.items():
+            self.cache.set(title, CachedPage(content, now))
+        self._schedule_flush()
+        return fetched
+
+    def _forget_fetch(self, titles: list[str], fetch: asyncio.Task) -> None:
+        """Removes a finished fetch from the fetches in flight."""
+        for title in titles:
+            if self._in_flight.get(title) is fetch:
+                del self._in_flight[title]
+
+    async def count_page(self, page_title: str, page: PageContent) -> Counter:
+        """
+        Returns the word counts of a page, counting its words only if they are not cached.
+
+        Args:
+            page_title (str): The title the page was requested with.
+            page (PageContent): The content of the page.
+
+        Returns:
+            Counter: The word counts of the page. It is shared with the cache, do not modify it.
+        """
+        key = CountsKey(page_title, page.revision_id, NORMALIZATION_KEY)
+        counts = self.cache.get_counts(key)
+        if counts is not None:
+            self.counts_stats.hits += 1
+            return counts
+
+        self.counts_stats.misses += 1
+        counts = await self.tokenizer.count(page.page_text)
+        self.cache.set_counts(key, counts)
+        self._schedule_flush()
+        return counts
+
+    async def flush(self) -> None:
+        """Waits until the changes of the cache are written, call it before closing the cache."""
+        if self._flush is not None:
+            await self._flush
+        await self.cache.flush()
+
+    def _schedule_flush(self) -> None:
+        """
+        Writes the changes of the cache in the background.
+
+        The flush starts at the next iteration of the event loop, so the pages of a fetched batch
+        and the counts stored meanwhile are written together.
+        """
+        if self._flush is None or self._flush.done():
+            self._flush = asyncio.ensure_future(self._flush_cache())
+
+    async def _flush_cache(self) -> None:
+        """Writes the changes of the cache, logging the failures as the pages are still served."""
+        try:
+            await self.cache.flush()
+        except sqlite3.Error:
+            _logger.exception("Writing the page cache failed")
+
+
+class PageRefresher:
+    """
+    Background task revalidating the cached pages of a `CachingPageSource` before they expire.
+
+    Every pass refreshes the pages that would be older than the TTL of the page source by the next
+    pass, so requests find them fresh and never wait for a revalidation.
+    """
+
+    def __init__(self, page_source: CachingPageSource, interval: float) -> None:
+        """
+        Initializes the refresher, call `start` to run it.
+
+        Args:
+            page_source (CachingPageSource): The page source whose cache is refreshed.
+            interval (float): Seconds between two passes.
+        """
+        self.page_source = page_source
+        self.interval = interval
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Starts refreshing in the background of the running event loop."""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def refresh_once(self) -> int:
+        """
+        Refreshes every page that would expire before the next pass.
+
+        Returns:
+            int: The number of refreshed pages.
+        """
+        # Pages refreshed during the pass are newer than the threshold, so the pass ends
+        fetched_before = time() - max(0.0, self.page_source.ttl - self.interval)
+        refreshed = 0
+        while True:
+            count = await self.page_source.refresh(fetched_before)
+            refreshed += count
+            if count < REFRESH_BATCH_SIZE:
+                return refreshed
+
+    async def _run(self) -> None:
+        """Runs a pass every interval until cancelled, a failed pass is retried at the next one."""
+        # The requests of the crawls go first
+        with request_priority(BACKGROUND_PRIORITY):
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.refresh_once()
+                except (WikiApiError, httpx.HTTPError):
+                    _logger.exception("Refreshing the page cache failed")
+
+    async def aclose(self) -> None:
+        """Stops refreshing, waiting for the pass in progress to be cancelled."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+class _CachedResult(NamedTuple, Generic[_Value]):
+    """A cached result with its estimated size and the time it was stored."""
+
+    value: _Value
+    size: int
+    stored_at: float
+
+
+class ResultCache(Generic[_Key, _Value]):
+    """In-memory cache of finished results, evicting the least recently used ones above a total size."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            max_size (int): The maximum total estimated size of the results in bytes, 0 disables
+                the cache.
+            ttl (float): Seconds a result is served after it was stored.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = ResultCacheStats()
+        self._results: OrderedDict[_Key, _CachedResult[_Value]] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Returns the number of cached results."""
+        return len(self._results)
+
+    def get(self, key: _Key) -> _Value | None:
+        """Returns the cached result, or None if it is not cached or expired."""
+        cached = self._results.get(key)
+        if cached is not None and time() - cached.stored_at > self.ttl:
+            self._remove(key)
+            cached = None
+        if cached is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        self._results.move_to_end(key)
+        return cached.value
+
+    def set(self, key: _Key, value: _Value, size: int) -> None:
+        """
+        Stores a result, evicting the least recently used ones while the cache is too large.
+
+        Args:
+            key (_Key): The canonical key of the request producing the result.
+            value (_Value): The result. It is shared by every hit, do not modify it.
+            size (int): The estimated size of the result in bytes. Results larger than the whole
+                cache are not stored.
+        """
+        if size > self.max_size:
+            return
+        if key in self._results:
+            self._remove(key)
+        self._results[key] = _CachedResult(value, size, time())
+        self.stats.entries += 1
+        self.stats.size += size
+        while self.stats.size > self.max_size:
+            self._remove(next(iter(self._results)))
+            self.stats.evictions += 1
+
+    def invalidate(self, predicate: Callable[[_Key], bool] | None = None) -> int:
+        """
+        Removes the cached results, or only those whose key matches the predicate.
+
+        Args:
+            predicate (Callable[[_Key], bool] | None): Selects the keys to remove, all if None.
+
+        Returns:
+            int: The number of removed results.
+        """
+        keys = [key for key in self._results if predicate is None or predicate(key)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: _Key) -> None:
+        """Removes a result and updates the size of the cache."""
+        cached = self._results.pop(key)
+        self.stats.entries -= 1
+        self.stats.size -= cached.size
+
+
+def create_page_cache(max_size: int, path: Path | str | None = None) -> PageCache:
+    """
+    Creates the page cache from the in-memory LRU and, if a path is given, the SQLite tier.
+
+    Args:
+        max_size (int): The maximum number of pages kept in memory, 0 disables the memory tier.
+        path (Path | str | None): The path of the SQLite database, None disables the disk tier.
+
+    Returns:
+        PageCache: The configured page cache.
+    """
+    tiers: list[PageCache] = []
+    if max_size > 0:
+        tiers.append(LRUPageCache(max_size))
+    if path is not None:
+        tiers.append(SQLitePageCache(path))
+    return TieredPageCache(*tiers)
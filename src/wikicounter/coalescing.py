@@ -0,0 +1,65 @@
+"""
+Coalescing of identical concurrent work (single-flight).
+
+When many clients request the same crawl at the same moment, only the first one starts it, the
+others wait for the same task and share its result.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from functools import partial
+from typing import Generic, TypeVar
+
+_Key = TypeVar("_Key", bound=Hashable)
+_Result = TypeVar("_Result")
+
+
+@dataclass
+class FlightStats:
+    """Counters of the calls started and of the calls shared with a call in flight."""
+
+    started: int = 0
+    shared: int = 0
+
+
+class SingleFlight(Generic[_Key, _Result]):
+    """Runs at most one call per key at a time, concurrent callers of the same key share it."""
+
+    def __init__(self) -> None:
+        """Initializes the group without calls in flight."""
+        self._calls: dict[_Key, asyncio.Task[_Result]] = {}
+        self.stats = FlightStats()
+
+    def __len__(self) -> int:
+        """Returns the number of calls in flight."""
+        return len(self._calls)
+
+    async def run(self, key: _Key, call: Callable[[], Awaitable[_Result]]) -> _Result:
+        """
+        Returns the result of `call`, or of the call already in flight with the same key.
+
+        The call runs in its own task: a caller being cancelled does not cancel the call for the
+        others waiting for it. Exceptions are raised to every caller.
+
+        Args:
+            key (_Key): Identifies the calls producing the same result.
+            call (Callable[[], Awaitable[_Result]]): Starts the work when no call is in flight.
+
+        Returns:
+            _Result: The result of the shared call. It is shared by every caller, do not modify it.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._forget, key))
+            self.stats.started += 1
+        else:
+            self.stats.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: _Key, task: asyncio.Task[_Result]) -> None:
+        """Removes a finished call, so the next caller starts a new one."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
@@ -1,8 +1,32 @@
 """Counting logic for the wikicounter project."""
 
+import heapq
+import importlib.util
+import math
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
 from collections import Counter
-from collections.abc import Iterable
-from typing import NamedTuple
+from collections.abc import Iterable, Iterator
+from itertools import chain, groupby, repeat
+from operator import itemgetter
+from typing import NamedTuple, TypeVar
+
+_STRIP_CHARS = ".,!?()[]{}\"'"
+
+NORMALIZATION_KEY = f"lower+strip:{_STRIP_CHARS}"
+"""Identifies how words are normalized, cached word counts are only reused with the same key."""
+
+HEAP_SELECTION_MAX_RATIO = 0.25
+"""Above this share of the vocabulary, sorting everything is faster than a heap selection."""
+
+NUMPY_SELECTION_MIN_VOCABULARY = 200_000
+"""Vocabulary size from which the top words are selected with NumPy, if it is installed."""
+
+_HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
 
 
 class WordFrequency(NamedTuple):
@@ -16,6 +40,433 @@ class WordFrequency(NamedTuple):
         return f"{self.word_count} ({self.frequency_percent:.2f}%)"
 
 
+# MARK: Compact Counting
+
+COMPACTION_MIN_PENDING = 4_096
+"""Number of pending words from which a `VocabularyCounter` merges them into its arrays."""
+
+COMPACTION_PENDING_RATIO = 0.25
+"""Share of the merged words the pending ones can reach before they are merged too."""
+
+
+class Vocabulary:
+    """
+    Interned words mapped to dense integer ids, shared by many crawls.
+
+    Every distinct word is stored once, the counts of the crawls are arrays of the ids. The
+    vocabulary holds at most `max_words` words and ids are never reused. Frequent words are met
+    early, so a full vocabulary holds most of the common words, and the counters count the rare
+    words met later by word.
+    """
+
+    def __init__(self, max_words: int | None = None) -> None:
+        """
+        Initializes an empty vocabulary.
+
+        Args:
+            max_words (int | None): The maximum number of words interned, unlimited if None.
+        """
+        self.max_words = max_words
+        self._ids: dict[str, int] = {}
+        self.words: list[str] = []
+
+    def __len__(self) -> int:
+        """Returns the number of known words."""
+        return len(self.words)
+
+    def intern(self, word: str) -> int | None:
+        """Returns the id of a word, adding it if it is new, None if it is new and there is no room."""
+        word_id = self._ids.get(word)
+        if word_id is None and (self.max_words is None or len(self.words) < self.max_words):
+            word_id = self._ids[word] = len(self.words)
+            self.words.append(word)
+        return word_id
+
+    def get_id(self, word: str) -> int | None:
+        """Returns the id of a word, or None if it is not in the vocabulary."""
+        return self._ids.get(word)
+
+
+class _CounterBase(ABC):
+    """Selection of the most common words of the counters supporting part of `Counter`."""
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the counted words."""
+
+    @abstractmethod
+    def values(self) -> Iterator[int]:
+        """Iterates over the counts of the counted words."""
+
+    def items(self) -> Iterator[tuple[str, int]]:
+        """Iterates over the counted words with their counts."""
+        return zip(self, self.values(), strict=True)
+
+    def most_common(self, n: int | None = None) -> list[tuple[str, int]]:
+        """Returns the `n` most common words, or every word, ordered like `Counter.most_common`."""
+        if n is None:
+            return sorted(self.items(), key=itemgetter(1), reverse=True)
+        return heapq.nlargest(n, self.items(), key=itemgetter(1))
+
+
+class VocabularyCounter(_CounterBase):
+    """
+    Word counts stored as sorted `array('q')` of the ids of a shared `Vocabulary` and their counts.
+
+    The arrays only hold the words of this counter, so its size and the cost of reading it do not
+    depend on the size of the vocabulary. The merged pages are added to a `Counter` of pending ids
+    first, merged into the arrays once it reaches a share of them or the counts are read. The words
+    a full vocabulary does not intern are counted by word.
+
+    It supports the part of the `Counter` interface used by `remove_words` and
+    `create_frequency_dict`. Words are iterated in the order of their ids, then the others.
+    """
+
+    def __init__(self, vocabulary: Vocabulary) -> None:
+        """
+        Initializes an empty counter.
+
+        Args:
+            vocabulary (Vocabulary): The vocabulary mapping the words to their ids.
+        """
+        self.vocabulary = vocabulary
+        self._ids = array("q")
+        self._counts = array("q")
+        self._pending: Counter[int] = Counter()
+        self._uninterned: Counter[str] = Counter()
+
+    def update(self, word_counts: Counter) -> None:
+        """Adds the word counts of a page."""
+        pending = self._pending
+        intern = self.vocabulary.intern
+        for word, count in word_counts.items():
+            word_id = intern(word)
+            if word_id is None:
+                self._uninterned[word] += count
+            else:
+                pending[word_id] += count
+        if len(pending) >= max(COMPACTION_MIN_PENDING, len(self._ids) * COMPACTION_PENDING_RATIO):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Merges the pending counts into the sorted arrays."""
+        if not self._pending:
+            return
+        ids, counts = array("q"), array("q")
+        merged = heapq.merge(
+            zip(self._ids, self._counts, strict=True),
+            sorted(self._pending.items()),
+        )
+        for word_id, group in groupby(merged, key=itemgetter(0)):
+            ids.append(word_id)
+            counts.append(sum(map(itemgetter(1), group)))
+        self._ids, self._counts = ids, counts
+        self._pending.clear()
+
+    def _index(self, word: str) -> int | None:
+        """Returns the index of an interned word in the arrays, or None if it was not counted."""
+        word_id = self.vocabulary.get_id(word)
+        if word_id is None:
+            return None
+        self._compact()
+        index = bisect_left(self._ids, word_id)
+        return index if index < len(self._ids) and self._ids[index] == word_id else None
+
+    def __getitem__(self, word: str) -> int:
+        """Returns the count of a word, 0 if it was not counted."""
+        index = self._index(word)
+        return self._uninterned[word] if index is None else self._counts[index]
+
+    def __delitem__(self, word: str) -> None:
+        """Removes a word, like `Counter` it is not an error if it was not counted."""
+        index = self._index(word)
+        if index is None:
+            self._uninterned.pop(word, None)
+            return
+        del self._ids[index]
+        del self._counts[index]
+
+    def __len__(self) -> int:
+        """Returns the number of counted words."""
+        self._compact()
+        return len(self._ids) + len(self._uninterned)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the counted words."""
+        self._compact()
+        return chain(map(self.vocabulary.words.__getitem__, self._ids), self._uninterned)
+
+    def values(self) -> Iterator[int]:
+        """Iterates over the counts of the counted words."""
+        self._compact()
+        return chain(self._counts, self._uninterned.values())
+
+    def total(self) -> int:
+        """Returns the sum of the counts."""
+        return sum(self._counts) + self._pending.total() + self._uninterned.total()
+
+
+# MARK: Approximate Counting
+
+
+class Approximation(NamedTuple):
+    """Parameters of the approximate counting, trading exact counts for bounded memory."""
+
+    error: float = 0.001
+    """Share of the total word count the estimated counts can exceed the exact ones by."""
+    confidence: float = 0.99
+    """Probability that the estimated counts stay within the error."""
+    top_words: int = 1000
+    """Number of most frequent words tracked."""
+
+
+class ErrorBounds(NamedTuple):
+    """How far the counts of an `ApproximateCounter` can be above the exact ones."""
+
+    max_overcount: int
+    """The counts exceed the exact ones by at most this, with probability `confidence`."""
+    confidence: float
+    tracked_words: int
+    """Number of words tracked as candidates for the most frequent ones."""
+    distinct_words: int
+    """Estimated number of distinct counted words, the percentile keeps a share of them."""
+
+
+class CountMinSketch:
+    """
+    Frequencies of any number of items in a fixed table of `depth` rows of `width` counters.
+
+    Every item is added to one counter of each row, the estimate is the smallest of them. It is
+    never below the exact count, and exceeds it by more than `e / width` times the total count
+    with a probability of at most `exp(-depth)`.
+    """
+
+    def __init__(self, width: int, depth: int) -> None:
+        """
+        Initializes an empty sketch.
+
+        Args:
+            width (int): The number of counters of a row.
+            depth (int): The number of rows.
+        """
+        self.width = width
+        self.depth = depth
+        self._counts = array("q", bytes(width * depth * array("q").itemsize))
+        self._row_offsets = range(0, width * depth, width)
+
+    @classmethod
+    def for_error(cls, error: float, confidence: float) -> "CountMinSketch":
+        """Creates the smallest sketch overestimating by at most `error` times the total count."""
+        return cls(math.ceil(math.e / error), math.ceil(math.log(1 / (1 - confidence))))
+
+    def _indices(self, item: str) -> Iterator[int]:
+        """Returns the counter of the item in every row, derived from two halves of its hash."""
+        item_hash = hash(item)
+        step = (item_hash >> 32) | 1
+        return (
+            offset + (item_hash + row * step) % self.width
+            for row, offset in enumerate(self._row_offsets)
+        )
+
+    def add(self, item: str, count: int = 1) -> None:
+        """Adds occurrences of an item."""
+        counts = self._counts
+        for index in self._indices(item):
+            counts[index] += count
+
+    def update(self, item_counts: Counter) -> None:
+        """Adds the occurrences of many items, faster than adding them one by one."""
+        counts = self._counts
+        width = self.width
+        rows = list(enumerate(self._row_offsets))
+        for item, count in item_counts.items():
+            item_hash = hash(item)
+            step = (item_hash >> 32) | 1
+            for row, offset in rows:
+                counts[offset + (item_hash + row * step) % width] += count
+
+    def estimate(self, item: str) -> int:
+        """Returns the estimated count of an item, never below the exact count."""
+        return min(map(self._counts.__getitem__, self._indices(item)))
+
+
+class HyperLogLog:
+    """
+    Estimated number of distinct items, in `2 ** precision` registers of one byte.
+
+    The low bits of the hash of an item select a register, which keeps the highest position of the
+    first set bit of the other bits. The estimate is within about `1.04 / sqrt(2 ** precision)`
+    of the exact number, relatively.
+    """
+
+    def __init__(self, precision: int = 12) -> None:
+        """
+        Initializes an empty estimator.
+
+        Args:
+            precision (int): The number of hash bits selecting a register.
+        """
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add(self, item: str) -> None:
+        """Adds an item."""
+        self.update((item,))
+
+    def update(self, items: Iterable[str]) -> None:
+        """Adds many items, faster than adding them one by one."""
+        registers = self._registers
+        precision = self.precision
+        mask = len(registers) - 1
+        rank_bits = _HASH_BITS - precision
+        for item in items:
+            item_hash = hash(item) & _HASH_MASK
+            index = item_hash & mask
+            rank = rank_bits - (item_hash >> precision).bit_length() + 1
+            registers[index] = max(registers[index], rank)
+
+    def estimate(self) -> int:
+        """Returns the estimated number of distinct items added."""
+        registers = self._registers
+        size = len(registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0**-rank for rank in registers)
+        empty = registers.count(0)
+        if estimate <= 2.5 * size and empty:
+            # Counting the empty registers is more accurate for few items
+            estimate = size * math.log(size / empty)
+        return round(estimate)
+
+
+class ApproximateCounter(_CounterBase):
+    """
+    Word counts in bounded memory: a Count-Min Sketch of every word and a Space-Saving top.
+
+    The Space-Saving summary tracks the `top_words` most frequent words. A new word replaces the
+    least counted one and inherits its count, so the tracked counts are never below the exact
+    ones, and exceed them by at most the last replaced count, above which every word is tracked.
+    The reported count of a tracked word is the smaller of its tracked count and its sketch
+    estimate. A HyperLogLog estimates the number of distinct counted words.
+
+    It supports the part of the `Counter` interface used by `remove_words` and
+    `create_frequency_dict`, over the tracked words. `total` is exact, apart from the removed
+    words that were not tracked.
+    """
+
+    def __init__(self, approximation: Approximation = Approximation()) -> None:  # noqa: B008
+        """
+        Initializes an empty counter.
+
+        Args:
+            approximation (Approximation): The error, its confidence and the number of tracked words.
+        """
+        self.approximation = approximation
+        self.sketch = CountMinSketch.for_error(approximation.error, approximation.confidence)
+        self._tracked: dict[str, int] = {}
+        # One entry per tracked word, with a count that can lag behind the tracked one
+        self._heap: list[tuple[int, str]] = []
+        # Count of the last replaced word, the untracked words were counted at most this often
+        self._floor = 0
+        self._counted = 0
+        self._total = 0
+        self.distinct = HyperLogLog()
+        # Distinct words removed since they were counted, the HyperLogLog cannot forget them
+        self._removed = 0
+
+    def update(self, word_counts: Counter) -> None:
+        """Adds the word counts of a page."""
+        self.sketch.update(word_counts)
+        self.distinct.update(word_counts)
+        tracked = self._tracked
+        for word, count in word_counts.items():
+            tracked_count = tracked.get(word)
+            if tracked_count is not None:
+                tracked[word] = tracked_count + count
+                continue
+            if len(tracked) >= self.approximation.top_words:
+                self._replace_least()
+            # An untracked word was counted at most `_floor` times before
+            tracked_count = tracked[word] = self._floor + count
+            heapq.heappush(self._heap, (tracked_count, word))
+        counted = word_counts.total()
+        self._counted += counted
+        self._total += counted
+
+    def _replace_least(self) -> None:
+        """Stops tracking the least counted word, raising the floor to its count."""
+        heap = self._heap
+        while True:
+            count, word = heapq.heappop(heap)
+            tracked_count = self._tracked.get(word)
+            if tracked_count == count:
+                del self._tracked[word]
+                self._floor = count
+                return
+            # The word was counted again or removed since its entry was pushed
+            if tracked_count is not None:
+                heapq.heappush(heap, (tracked_count, word))
+
+    def __getitem__(self, word: str) -> int:
+        """Returns the estimated count of a word, above the exact one by at most the error bounds."""
+        tracked_count = self._tracked.get(word)
+        if tracked_count is None:
+            return min(self.sketch.estimate(word), self._floor)
+        return min(tracked_count, self.sketch.estimate(word))
+
+    def __delitem__(self, word: str) -> None:
+        """Removes a word, like `Counter` it is not an error if it was not counted."""
+        count = self[word]
+        if count:
+            self._total -= count
+            self._removed += 1
+        self._tracked.pop(word, None)
+
+    def __len__(self) -> int:
+        """Returns the number of tracked words."""
+        return len(self._tracked)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the tracked words."""
+        return iter(self._tracked)
+
+    def values(self) -> Iterator[int]:
+        """Iterates over the reported counts of the tracked words."""
+        return map(self.__getitem__, self._tracked)
+
+    def total(self) -> int:
+        """Returns the number of counted words."""
+        return self._total
+
+    def distinct_words(self) -> int:
+        """Returns the estimated number of distinct counted words, at least the tracked ones."""
+        return max(len(self._tracked), self.distinct.estimate() - self._removed)
+
+    def error_bounds(self) -> ErrorBounds:
+        """
+        Returns how far the reported counts can be above the exact ones.
+
+        The floor of the Space-Saving summary bounds the error with certainty, the sketch bounds it
+        by `error` times the counted words with probability `confidence`.
+        """
+        sketch_error = math.ceil(self.approximation.error * self._counted)
+        if self._floor <= sketch_error:
+            return ErrorBounds(self._floor, 1.0, len(self), self.distinct_words())
+        return ErrorBounds(
+            sketch_error,
+            self.approximation.confidence,
+            len(self),
+            self.distinct_words(),
+        )
+
+
+WordCounts = Counter | VocabularyCounter | ApproximateCounter
+"""The word counters accepted by `remove_words` and `create_frequency_dict`."""
+
+_WordCounts = TypeVar("_WordCounts", bound=WordCounts)
+
+# MARK: Word Counting
+
+
 def count_words(text: str, ignore_words: Iterable[str] | None = None) -> Counter:
     """
     Counts the number of words in a given text.
@@ -23,6 +474,9 @@ def count_words(text: str, ignore_words: Iterable[str] | None = None) -> Counter
     The function normalizes the words by converting them to lowercase and stripping punctuation.
     Ignored words can be specified to exclude them from the count.
 
+    The text is lowercased at once and every token is stripped exactly once, the ignored words are
+    removed from the finished counter instead of being looked up for every token.
+
     Args:
         text (str): The input text to count words from.
         ignore_words (Iterable[str] | None): A list of words to ignore in the count.
@@ -30,17 +484,13 @@ def count_words(text: str, ignore_words: Iterable[str] | None = None) -> Counter
     Returns:
         Counter: A Counter object containing words and their counts.
     """
-    if ignore_words is None:
-        ignore_words = set()
-
-    return Counter(
-        _normalize_word(word) for word in text.split() if _normalize_word(word) not in ignore_words
-    )
+    word_counter = Counter(map(str.strip, text.lower().split(), repeat(_STRIP_CHARS)))
+    return remove_words(word_counter, ignore_words)
 
 
 def _normalize_word(text: str) -> str:
     """Normalizes a word by converting it to lowercase and stripping punctuation."""
-    return text.lower().strip(".,!?()[]{}\"'")
+    return text.lower().strip(_STRIP_CHARS)
     # TODO: DEFINE WORD! How to handle special characters from Wikipedia?
     # - \\lambda
     # - \\times
@@ -48,39 +498,119 @@ def _normalize_word(text: str) -> str:
     # NLTK?
 
 
+def normalize_words(words: Iterable[str] | None) -> frozenset[str]:
+    """
+    Normalizes words the same way as the counted words, e.g. to match an ignore list.
+
+    Args:
+        words (Iterable[str] | None): The words to normalize.
+
+    Returns:
+        frozenset[str]: The distinct normalized words.
+    """
+    return frozenset(map(_normalize_word, words or ()))
+
+
+def remove_words(word_counter: _WordCounts, ignore_words: Iterable[str] | None) -> _WordCounts:
+    """
+    Removes the ignored words from a word counter in place.
+
+    Applying the ignore list after counting allows reusing the same counts for any ignore list.
+
+    Args:
+        word_counter (WordCounts): Counter object with word counts.
+        ignore_words (Iterable[str] | None): The words to remove from the counter.
+
+    Returns:
+        WordCounts: The same counter object, without the ignored words.
+    """
+    for word in frozenset(ignore_words or ()):
+        del word_counter[word]
+    return word_counter
+
+
 def create_frequency_dict(
-    word_counter: Counter,
+    word_counter: WordCounts,
     percentile: float = 0,
 ) -> dict[str, WordFrequency]:
     """
     Creates a frequency dictionary from a word counter.
 
     If `percentile` is specified, only words in the top X percentile by frequency are included.
-    If `percentile` is set to 90, only the top 10% of words by frequency will be included.
+    If `percentile` is set to 90, only the top 10% of words by frequency will be included. For an
+    `ApproximateCounter`, the percentile applies to the estimated number of distinct counted words,
+    but only the tracked words can be included. The frequencies are relative to every counted word.
 
     Args:
-        word_counter (Counter): Counter object with word counts.
+        word_counter (WordCounts): Counter object with word counts.
         percentile (float): Only include words in the top X percentile by frequency.
 
     Returns:
         dict[str, WordFrequency]: A dictionary mapping words to their frequency information.
     """
-    total_words = sum(word_counter.values())
-    sorted_words = word_counter.most_common()
+    total_words = word_counter.total()
 
     # Calculate how many words to keep based on percentile
+    if isinstance(word_counter, ApproximateCounter):
+        keep_count = word_counter.distinct_words()
+    else:
+        keep_count = len(word_counter)
     if percentile > 0:
-        # Convert percentile to actual number of items to keep
-        num_unique_words = len(sorted_words)
-        keep_count = _calculate_keep_count(num_unique_words, percentile)
-        sorted_words = sorted_words[:keep_count]
+        keep_count = _calculate_keep_count(keep_count, percentile)
 
-    return {
-        word: WordFrequency(count, round((count / total_words) * 100, 4))
-        for word, count in sorted_words
-    }
+    # Most words share a handful of counts, so every percentage is only calculated once
+    percentages: dict[int, float] = {}
+    frequency_dict = {}
+    for word, count in _select_top_words(word_counter, keep_count):
+        percent = percentages.get(count)
+        if percent is None:
+            percent = percentages[count] = round((count / total_words) * 100, 4)
+        frequency_dict[word] = WordFrequency(count, percent)
+    return frequency_dict
 
 
 def _calculate_keep_count(item_count: int, percentile: float) -> int:
     """Calculate the number of items to keep based on the specified percentile."""
     return max(1, int((item_count + 1) * (100 - percentile) / 100))
+
+
+def _select_top_words(
+    word_counter: WordCounts,
+    keep_count: int,
+) -> list[tuple[str, int]]:
+    """
+    Selects the `keep_count` most common words, ordered like `Counter.most_common`.
+
+    Sorting the whole vocabulary is only worth it when most of it is kept. A small top is
+    selected with a heap, or with a NumPy partial selection for very large vocabularies.
+    """
+    vocabulary_size = len(word_counter)
+    if keep_count >= vocabulary_size:
+        return word_counter.most_common()
+    if keep_count > vocabulary_size * HEAP_SELECTION_MAX_RATIO:
+        return word_counter.most_common()[:keep_count]
+    if _HAS_NUMPY and vocabulary_size >= NUMPY_SELECTION_MIN_VOCABULARY:
+        return _select_top_words_numpy(word_counter, keep_count)
+    # most_common(n) selects with heapq.nlargest
+    return word_counter.most_common(keep_count)
+
+
+def _select_top_words_numpy(
+    word_counter: WordCounts,
+    keep_count: int,
+) -> list[tuple[str, int]]:
+    """Selects the most common words with `numpy.argpartition`, ties keep the counter order."""
+    import numpy as np  # noqa: PLC0415
+
+    words = list(word_counter)
+    counts = np.fromiter(word_counter.values(), dtype=np.int64, count=len(words))
+
+    # The smallest count still in the top, words above it are all kept
+    threshold = counts[np.argpartition(counts, -keep_count)[-keep_count]]
+    above = np.flatnonzero(counts > threshold)
+    tied = np.flatnonzero(counts == threshold)[: keep_count - len(above)]
+
+    # Sort the selected words by count, the stable sort keeps the counter order for ties
+    selected = np.sort(np.concatenate((above, tied)))
+    selected = selected[np.argsort(-counts[selected], kind="stable")]
+    return [(words[index], int(counts[index])) for index in selected]
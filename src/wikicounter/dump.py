@@ -0,0 +1,518 @@
+"""
+Offline page source reading a local Wikipedia XML dump, e.g. `enwiki-latest-pages-articles.xml.bz2`.
+
+The dump is scanned once to index the byte offset of every article, and the index is stored in a
+SQLite database next to the dump. A page is then read by seeking straight to its offset in the
+memory-mapped dump, so `walk_pages` runs offline at disk speed. Bzip2 compressed dumps are indexed
+by the offset of the compressed stream holding the page: the multistream dumps pack about 100 pages
+into a stream, so a lookup only decompresses a small block. Single-stream dumps work too, but a
+lookup then decompresses the dump up to the page.
+
+`iter_dump_pages` streams every article of a dump with `iterparse` in constant memory, to count a
+whole dump without an index.
+
+Run `wikicounter-dump --help` for the command line interface.
+"""
+
+import argparse
+import asyncio
+import bz2
+import html
+import logging
+import mmap
+import re
+import sqlite3
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from time import time
+from types import TracebackType
+from typing import IO, NamedTuple, Self
+
+import orjson
+
+from wikicounter.counting import (
+    count_words,
+    create_frequency_dict,
+    normalize_words,
+    remove_words,
+)
+from wikicounter.serialization import OutputFormat, encode_word_frequency
+from wikicounter.wiki_connection import CrawlBudget, CrawlResult, PageContent, walk_pages
+from wikicounter.wikitext import (
+    DEFAULT_LINK_PREFIXES,
+    link_prefixes,
+    normalize_title,
+    wikitext_links,
+    wikitext_to_text,
+)
+
+ARTICLE_NAMESPACE = 0
+"""Namespace of the Wikipedia articles, the pages of other namespaces are not indexed."""
+
+CHUNK_SIZE = 1024 * 1024
+"""Number of compressed bytes decompressed at once."""
+
+_BZ2_MAGIC = b"BZh"
+
+_PAGE_START = b"<page>"
+_PAGE_END = b"</page>"
+_TITLE = re.compile(rb"<title>(.*?)</title>", re.DOTALL)
+_NAMESPACE = re.compile(rb"<ns>(-?\d+)</ns>")
+_REDIRECT = re.compile(rb'<redirect title="(.*?)"', re.DOTALL)
+_SITEINFO_END = b"</siteinfo>"
+_SITEINFO_NAMESPACE = re.compile(rb'<namespace key="(-?\d+)"[^>]*>([^<]+)</namespace>')
+
+_logger = logging.getLogger(__name__)
+
+
+class DumpPage(NamedTuple):
+    """An article read from a dump."""
+
+    title: str
+    content: PageContent
+
+
+class _PageHeader(NamedTuple):
+    """The normalized title of an article and the title it redirects to."""
+
+    title: str
+    redirect: str | None
+
+
+class _IndexEntry(NamedTuple):
+    """Where a page is found in the dump, and the page it redirects to."""
+
+    offset: int
+    redirect: str | None
+
+
+class DumpPageSource:
+    """
+    Page source serving the articles of a local XML dump through an offset index.
+
+    The index is built on first use, and rebuilt when the size or modification time of the dump
+    changes. Use it as a context manager or call `close` when done.
+    """
+
+    def __init__(self, dump_path: Path | str, index_path: Path | str | None = None) -> None:
+        """
+        Opens the dump and its index, building the index if it is missing or outdated.
+
+        Args:
+            dump_path (Path | str): The path of the `.xml` or `.xml.bz2` dump.
+            index_path (Path | str | None): The path of the SQLite index. Defaults to the path of
+                the dump with an `.index.sqlite` suffix, `:memory:` keeps it in memory.
+        """
+        dump_path = Path(dump_path)
+        if index_path is None:
+            index_path = dump_path.with_name(f"{dump_path.name}.index.sqlite")
+
+        self._file = dump_path.open("rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.compressed = self._data[: len(_BZ2_MAGIC)] == _BZ2_MAGIC
+        self.link_prefixes = link_prefixes(_parse_namespaces(self._read_siteinfo()))
+        """Prefixes of the links that do not point to an article, from the `<siteinfo>`."""
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(index_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    title TEXT PRIMARY KEY,
+                    offset INTEGER NOT NULL,
+                    redirect TEXT
+                )
+                """,
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS dump (size INTEGER NOT NULL, modified INTEGER NOT NULL)",
+            )
+            indexed = self._connection.execute("SELECT size, modified FROM dump").fetchone()
+
+        stat = dump_path.stat()
+        if indexed != (stat.st_size, stat.st_mtime_ns):
+            self._build_index(stat.st_size, stat.st_mtime_ns)
+
+    def __enter__(self) -> Self:
+        """Enter the context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the dump and the index when leaving the context."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Returns the number of indexed articles, redirects included."""
+        with self._lock:
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM pages").fetchone()
+        return count
+
+    def _read_siteinfo(self) -> bytes:
+        """Returns the start of the dump, up to the end of its `<siteinfo>` if it has one."""
+        if not self.compressed:
+            end = self._data.find(_SITEINFO_END, 0, CHUNK_SIZE)
+            return self._data[: CHUNK_SIZE if end < 0 else end]
+        # The siteinfo is at the start of the first stream
+        decompressor = bz2.BZ2Decompressor()
+        header = b""
+        position = 0
+        while (
+            _SITEINFO_END not in header
+            and _PAGE_START not in header
+            and not decompressor.eof
+            and position < len(self._data)
+        ):
+            header += decompressor.decompress(self._data[position : position + CHUNK_SIZE])
+            position += CHUNK_SIZE
+        return header
+
+    def _build_index(self, size: int, modified: int) -> None:
+        """Scans the dump and stores the offset of every article."""
+        start_time = time()
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM pages")
+            self._connection.execute("DELETE FROM dump")
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO pages VALUES (?, ?, ?)",
+                self._index_rows(),
+            )
+            self._connection.execute("INSERT INTO dump VALUES (?, ?)", (size, modified))
+        _logger.info("Indexed the dump in %.2fs", time() - start_time)
+
+    def _index_rows(self) -> Iterator[tuple[str, int, str | None]]:
+        """Yields the title, offset and redirect of every article of the dump."""
+        for offset, page in self._scan_pages():
+            header = _parse_header(page)
+            if header is not None:
+                yield header.title, offset, header.redirect
+
+    def _scan_pages(self) -> Iterator[tuple[int, bytes]]:
+        """Yields the offset every page is looked up from, with the page or at least its header."""
+        if not self.compressed:
+            for start, end in _find_pages(self._data):
+                # The header comes before the revision, the text is not copied
+                header_end = self._data.find(b"<revision", start, end)
+                yield start, self._data[start : end if header_end < 0 else header_end]
+            return
+
+        offset = 0
+        while offset < len(self._data):
+            stream = _Bz2Stream(self._data, offset)
+            for page in stream:
+                yield offset, page
+            offset = stream.end
+
+    def get_page_content(self, page_title: str) -> PageContent:
+        """
+        Reads an article from the dump, following its redirect.
+
+        Args:
+            page_title (str): The title of the article.
+
+        Returns:
+            PageContent: The plain text and the article links of the page, empty if it is missing.
+        """
+        title = normalize_title(page_title)
+        entry = self._lookup(title)
+        if entry is not None and entry.redirect is not None:
+            title = normalize_title(entry.redirect)
+            entry = self._lookup(title)
+        if entry is None:
+            _logger.warning("Page '%s' does not exist in the dump.", page_title)
+            return PageContent("", [])
+
+        page = self._read_page(entry.offset, title)
+        if page is None:
+            _logger.warning("Page '%s' is missing from the indexed position.", page_title)
+            return PageContent("", [])
+        return page.content
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        """
+        Reads several articles from the dump in a worker thread.
+
+        Args:
+            page_titles (Iterable[str]): The titles of the articles.
+
+        Returns:
+            dict[str, PageContent]: The content of every requested page, keyed by the requested title.
+        """
+        titles = list(dict.fromkeys(page_titles))
+        return await asyncio.to_thread(
+            lambda: {title: self.get_page_content(title) for title in titles},
+        )
+
+    def _lookup(self, title: str) -> _IndexEntry | None:
+        """Returns the index entry of a normalized title, or None if it is not in the dump."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT offset, redirect FROM pages WHERE title = ?",
+                (title,),
+            ).fetchone()
+        return None if row is None else _IndexEntry(*row)
+
+    def _read_page(self, offset: int, title: str) -> DumpPage | None:
+        """Parses the page at an indexed offset, searching its stream if the dump is compressed."""
+        if not self.compressed:
+            end = self._data.find(_PAGE_END, offset) + len(_PAGE_END)
+            return _parse_page(
+                ET.fromstring(self._data[offset:end]),  # noqa: S314
+                self.link_prefixes,
+            )
+
+        # Only the header of the other pages of the stream is read, the matching page is parsed
+        for page in _Bz2Stream(self._data, offset):
+            header = _parse_header(page)
+            if header is not None and header.title == title:
+                return _parse_page(ET.fromstring(page), self.link_prefixes)  # noqa: S314
+        return None
+
+    def close(self) -> None:
+        """Closes the dump and the index database."""
+        self._data.close()
+        self._file.close()
+        with self._lock:
+            self._connection.close()
+
+
+class _Bz2Stream:
+    """The pages of a single bzip2 stream of a dump, decompressed chunk by chunk."""
+
+    def __init__(self, data: mmap.mmap, offset: int) -> None:
+        """
+        Initializes the stream, nothing is decompressed before iterating it.
+
+        Args:
+            data (mmap.mmap): The compressed dump.
+            offset (int): The offset of the stream in the dump.
+        """
+        self.data = data
+        self.offset = offset
+        self.end = len(data)
+        """Offset after the stream, known once the stream is fully iterated."""
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Yields the complete pages of the stream, in order."""
+        decompressor = bz2.BZ2Decompressor()
+        position = self.offset
+        buffer = b""
+        while not decompressor.eof and position < len(self.data):
+            chunk = self.data[position : position + CHUNK_SIZE]
+            position += len(chunk)
+            buffer += decompressor.decompress(chunk)
+
+            consumed = 0
+            for start, end in _find_pages(buffer):
+                yield buffer[start:end]
+                consumed = end
+            # Keep the page that is not complete yet, or a page start split by the chunk
+            incomplete = buffer.find(_PAGE_START, consumed)
+            buffer = buffer[incomplete:] if incomplete >= 0 else buffer[-len(_PAGE_START) :]
+        self.end = position - len(decompressor.unused_data)
+
+
+def _find_pages(data: bytes | mmap.mmap) -> Iterator[tuple[int, int]]:
+    """Yields the start and end offsets of the complete pages in the data."""
+    position = 0
+    while (start := data.find(_PAGE_START, position)) >= 0:
+        end = data.find(_PAGE_END, start)
+        if end < 0:
+            return
+        position = end + len(_PAGE_END)
+        yield start, position
+
+
+def _parse_namespaces(siteinfo: bytes) -> list[str]:
+    """Returns the names of the namespaces listed in a `<siteinfo>`, but the articles."""
+    return [
+        html.unescape(name.decode())
+        for key, name in _SITEINFO_NAMESPACE.findall(siteinfo)
+        if int(key) != ARTICLE_NAMESPACE
+    ]
+
+
+def _parse_header(page: bytes) -> _PageHeader | None:
+    """Returns the normalized title and the redirect of an article, None for other namespaces."""
+    title = _TITLE.search(page)
+    namespace = _NAMESPACE.search(page)
+    if title is None or namespace is None or int(namespace.group(1)) != ARTICLE_NAMESPACE:
+        return None
+    redirect = _REDIRECT.search(page)
+    return _PageHeader(
+        normalize_title(html.unescape(title.group(1).decode())),
+        None if redirect is None else html.unescape(redirect.group(1).decode()),
+    )
+
+
+def _parse_page(page: ET.Element, prefixes: frozenset[str]) -> DumpPage:
+    """Converts a parsed `<page>` element into its title and content."""
+    # `{*}` matches the tags with or without the export namespace of the dump
+    revision_id = page.findtext("{*}revision/{*}id") or "0"
+    wikitext = page.findtext("{*}revision/{*}text") or ""
+    return DumpPage(
+        page.findtext("{*}title") or "",
+        PageContent(
+            wikitext_to_text(wikitext, prefixes),
+            wikitext_links(wikitext, prefixes),
+            int(revision_id),
+        ),
+    )
+
+
+def iter_dump_pages(dump_path: Path | str) -> Iterator[DumpPage]:
+    """
+    Streams the articles of a dump with `iterparse`, in constant memory.
+
+    Redirects and the pages of other namespaces are skipped.
+
+    Args:
+        dump_path (Path | str): The path of the `.xml` or `.xml.bz2` dump.
+
+    Yields:
+        DumpPage: The title and the content of every article, in the order of the dump.
+    """
+    with _open_dump(Path(dump_path)) as dump:
+        events = ET.iterparse(dump, events=("start", "end"))  # noqa: S314
+        _event, root = next(events)
+        prefixes = DEFAULT_LINK_PREFIXES
+        for event, element in events:
+            if event != "end":
+                continue
+            tag = element.tag.rpartition("}")[2]
+            if tag == "siteinfo":
+                prefixes = link_prefixes(
+                    namespace.text
+                    for namespace in element.iterfind("{*}namespaces/{*}namespace")
+                    if namespace.text and namespace.get("key") != str(ARTICLE_NAMESPACE)
+                )
+            if tag != "page":
+                continue
+            if (
+                element.findtext("{*}ns") == str(ARTICLE_NAMESPACE)
+                and element.find("{*}redirect") is None
+            ):
+                yield _parse_page(element, prefixes)
+            # The finished pages are dropped from the tree, so it never grows
+            root.clear()
+
+
+def _open_dump(dump_path: Path) -> IO[bytes]:
+    """Opens a dump for reading, decompressing it if it is a bzip2 file."""
+    with dump_path.open("rb") as dump:
+        compressed = dump.read(len(_BZ2_MAGIC)) == _BZ2_MAGIC
+    return bz2.open(dump_path, "rb") if compressed else dump_path.open("rb")
+
+
+# MARK: Command Line
+
+
+def count_dump(
+    dump_path: Path | str,
+    ignore_words: Iterable[str] | None = None,
+    max_pages: int | None = None,
+) -> CrawlResult:
+    """
+    Counts the words of every article of a dump, streaming it in constant memory.
+
+    Args:
+        dump_path (Path | str): The path of the `.xml` or `.xml.bz2` dump.
+        ignore_words (Iterable[str] | None): The words to remove from the counts.
+        max_pages (int | None): Stop after this many articles, unlimited if None.
+
+    Returns:
+        CrawlResult: The merged word counts, the number of counted articles and whether articles
+            were left uncounted because of `max_pages`.
+    """
+    word_counter: Counter = Counter()
+    pages_visited = 0
+    truncated = False
+    for page in iter_dump_pages(dump_path):
+        if max_pages is not None and pages_visited >= max_pages:
+            truncated = True
+            break
+        word_counter.update(count_words(page.content.page_text))
+        pages_visited += 1
+    return CrawlResult(remove_words(word_counter, ignore_words), pages_visited, truncated)
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    """Parses the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="wikicounter-dump",
+        description="Count word frequencies offline over a local Wikipedia XML dump.",
+    )
+    parser.add_argument("dump", type=Path, help="Path of the .xml or .xml.bz2 dump")
+    parser.add_argument(
+        "article",
+        nargs="?",
+        help="Title of the starting article, every article of the dump is counted when omitted",
+    )
+    parser.add_argument("--depth", type=int, default=0, help="Depth of the articles to traverse")
+    parser.add_argument("--ignore", nargs="*", default=[], help="Words to ignore")
+    parser.add_argument(
+        "--percentile",
+        type=float,
+        default=0,
+        help="Percentile threshold for word frequency",
+    )
+    parser.add_argument("--max-pages", type=int, help="Maximum number of pages visited")
+    parser.add_argument(
+        "--format",
+        type=OutputFormat,
+        choices=list(OutputFormat),
+        default=OutputFormat.DICT,
+        help="Layout of the word frequencies",
+    )
+    parser.add_argument(
+        "--index",
+        type=Path,
+        help="Path of the SQLite offset index, defaults to the dump path with .index.sqlite",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Entry point of `wikicounter-dump`, writes the word frequencies as JSON to the standard output."""
+    args = _parse_args(argv)
+    ignore_words = normalize_words(args.ignore)
+    start_time = time()
+
+    if args.article is None:
+        crawl = count_dump(args.dump, ignore_words, args.max_pages)
+    else:
+        with DumpPageSource(args.dump, args.index) as source:
+            crawl = asyncio.run(
+                walk_pages(
+                    args.article,
+                    args.depth,
+                    ignore_words=ignore_words,
+                    client=source,
+                    budget=CrawlBudget(max_pages=args.max_pages),
+                ),
+            )
+    word_counter, pages_visited, truncated = crawl
+
+    frequency_dict = create_frequency_dict(word_counter, args.percentile)
+    sys.stdout.buffer.write(
+        orjson.dumps(
+            {
+                "start_article": args.article,
+                "max_depth": args.depth,
+                "word_frequency": encode_word_frequency(frequency_dict, args.format),
+                "time_elapsed": round(time() - start_time, 2),
+                "pages_visited": pages_visited,
+                "truncated": truncated,
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        ),
+    )
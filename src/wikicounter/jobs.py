@@ -0,0 +1,385 @@
+"""
+Crawls running in the background as jobs, for crawls outlasting an HTTP request.
+
+A `JobScheduler` runs a bounded number of jobs at a time, the others wait in a queue. The
+progress of a running job, the state of its crawl and the word counts merged so far, is
+checkpointed to a JSON file per job, so the unfinished jobs are resumed where they stopped when
+the service restarts. The checkpoints are encoded and written by a background thread, from a copy
+of the job taken on the event loop.
+
+The scheduler is not thread-safe: call its methods from the event loop running the jobs.
+"""
+
+import asyncio
+import contextlib
+import logging
+import uuid
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import StrEnum
+from pathlib import Path
+from time import monotonic, time
+from typing import Any, NamedTuple
+
+import httpx
+import orjson
+
+from wikicounter.counting import remove_words
+from wikicounter.sites import DEFAULT_LANGUAGE, DEFAULT_SITE, Site, SiteLimitError, WikiProject
+from wikicounter.wiki_connection import (
+    DEFAULT_MAX_CONCURRENCY,
+    CrawlBudget,
+    CrawlState,
+    LinkIndex,
+    PageContent,
+    PageSource,
+    WikiApiError,
+    count_page_words,
+    iter_pages,
+)
+
+DEFAULT_CHECKPOINT_INTERVAL = 10.0
+"""Default seconds between two checkpoints of a running job."""
+
+_logger = logging.getLogger(__name__)
+
+
+class JobStatus(StrEnum):
+    """Lifecycle of a crawl job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job will not change anymore."""
+        return self in {JobStatus.COMPLETED, JobStatus.FAILED}
+
+
+class JobSource(NamedTuple):
+    """Where the pages of the jobs of a site are crawled from, see `iter_pages`."""
+
+    client: PageSource
+    count_page: Callable[[str, PageContent], Awaitable[Counter]] = count_page_words
+    link_index: LinkIndex | None = None
+
+
+class JobLimitError(Exception):
+    """Raised when a job is submitted while the maximum number of jobs are unfinished."""
+
+
+@dataclass
+class CrawlJob:
+    """A crawl running in the background, with its progress and the word counts merged so far."""
+
+    id: str
+    article: str
+    depth: int
+    language: str = DEFAULT_LANGUAGE
+    project: WikiProject = WikiProject.WIKIPEDIA
+    ignore_words: list[str] = field(default_factory=list)
+    percentile: float = 0
+    max_pages: int | None = None
+    max_bytes: int | None = None
+    timeout_s: float | None = None
+    status: JobStatus = JobStatus.QUEUED
+    created_at: float = field(default_factory=time)
+    updated_at: float = field(default_factory=time)
+    error: str | None = None
+    pages_visited: int = 0
+    bytes_fetched: int = 0
+    truncated: bool = False
+    word_counts: Counter = field(default_factory=Counter)
+    state: CrawlState | None = None
+    """Progress of the crawl, None once the job is finished."""
+
+    def snapshot(self) -> dict[str, Any]:
+        """Copies the fields of the job, to encode them as a JSON checkpoint while it goes on."""
+        data: dict[str, Any] = {
+            **vars(self),
+            "ignore_words": list(self.ignore_words),
+            "word_counts": dict(self.word_counts),
+        }
+        if self.state is not None:
+            data["state"] = {
+                **vars(self.state),
+                "frontier": list(self.state.frontier),
+                "counted": list(self.state.counted),
+                "next_frontier": list(self.state.next_frontier),
+                "visited": list(self.state.visited),
+            }
+        return data
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "CrawlJob":
+        """Decodes a job from its JSON checkpoint."""
+        fields = orjson.loads(data)
+        state = fields.pop("state")
+        if state is not None:
+            state = CrawlState(
+                **{**state, "counted": set(state["counted"]), "visited": set(state["visited"])},
+            )
+        status = JobStatus(fields.pop("status"))
+        project = WikiProject(fields.pop("project"))
+        word_counts = Counter(fields.pop("word_counts"))
+        return cls(**fields, project=project, status=status, word_counts=word_counts, state=state)
+
+    @property
+    def site(self) -> Site:
+        """The site the pages are crawled from."""
+        return Site(self.language, self.project)
+
+
+class JobScheduler:
+    """
+    Runs crawl jobs in the background, at most `workers` at a time, checkpointing their progress.
+
+    Call `start` from the running event loop to resume the checkpointed jobs and start the
+    workers, and `aclose` to stop them. Jobs interrupted by `aclose` are resumed by the next
+    scheduler started with the same directory.
+    """
+
+    def __init__(
+        self,
+        sources: Callable[[Site], JobSource],
+        path: Path | None = None,
+        *,
+        workers: int = 2,
+        max_jobs: int = 100,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> None:
+        """
+        Initializes the scheduler, call `start` to run the jobs.
+
+        Args:
+            sources (Callable[[Site], JobSource]): Returns where the pages of a site are crawled
+                from, called when a job starts. It can raise `SiteLimitError` to fail the job.
+            path (Path | None): Directory of the job checkpoints, the jobs are only kept in memory
+                if None.
+            workers (int): Number of jobs running at the same time.
+            max_jobs (int): Number of jobs kept. The oldest finished job is forgotten to make room
+                for a new one, and no job is accepted while every kept job is unfinished.
+            checkpoint_interval (float): Seconds between two checkpoints of a running job.
+            max_concurrency (int): The maximum number of batches fetched at the same time by a job.
+        """
+        self.sources = sources
+        self.path = path
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.checkpoint_interval = checkpoint_interval
+        self.max_concurrency = max_concurrency
+        self._jobs: dict[str, CrawlJob] = {}
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._running: dict[str, asyncio.Task[None]] = {}
+        self._workers: list[asyncio.Task[None]] = []
+        # A single thread writes and deletes the checkpoints in the order they are asked for
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-checkpoints")
+
+    def __len__(self) -> int:
+        """Returns the number of kept jobs."""
+        return len(self._jobs)
+
+    def start(self) -> None:
+        """Loads the checkpointed jobs, queues the unfinished ones and starts the workers."""
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            jobs = []
+            for checkpoint in self.path.glob("*.json"):
+                try:
+                    jobs.append(CrawlJob.from_json(checkpoint.read_bytes()))
+                except (ValueError, TypeError, KeyError):
+                    _logger.exception("Skipping the unreadable job checkpoint '%s'", checkpoint)
+            for job in sorted(jobs, key=lambda job: job.created_at):
+                self._jobs[job.id] = job
+                if not job.status.finished:
+                    job.status = JobStatus.QUEUED
+                    self._queue.put_nowait(job.id)
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    def submit(  # noqa: PLR0913
+        self,
+        article: str,
+        depth: int,
+        *,
+        site: Site = DEFAULT_SITE,
+        ignore_words: list[str] | None = None,
+        percentile: float = 0,
+        max_pages: int | None = None,
+        max_bytes: int | None = None,
+        timeout_s: float | None = None,
+    ) -> CrawlJob:
+        """
+        Queues a crawl job.
+
+        Args:
+            article (str): Title of the article the crawl starts from.
+            depth (int): The maximum depth of the crawl.
+            site (Site): The site the pages are crawled from.
+            ignore_words (list[str] | None): Normalized words left out of the counts.
+            percentile (float): Only include words in the top X percentile by frequency.
+            max_pages (int | None): Maximum number of pages visited, unlimited if None.
+            max_bytes (int | None): Maximum size of the visited page texts, unlimited if None.
+            timeout_s (float | None): Seconds of crawling after which the job stops, counted from
+                its last start, unlimited if None.
+
+        Returns:
+            CrawlJob: The queued job.
+
+        Raises:
+            JobLimitError: If `max_jobs` unfinished jobs are kept already.
+        """
+        if len(self._jobs) >= self.max_jobs:
+            finished = [job for job in self._jobs.values() if job.status.finished]
+            if not finished:
+                msg = f"{self.max_jobs} jobs are queued or running already"
+                raise JobLimitError(msg)
+            self.remove(min(finished, key=lambda job: job.updated_at).id)
+
+        job = CrawlJob(
+            uuid.uuid4().hex,
+            article,
+            depth,
+            language=site.language,
+            project=site.project,
+            ignore_words=ignore_words or [],
+            percentile=percentile,
+            max_pages=max_pages,
+            max_bytes=max_bytes,
+            timeout_s=timeout_s,
+            state=CrawlState.start(article),
+        )
+        self._jobs[job.id] = job
+        self._checkpoint(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> CrawlJob | None:
+        """Returns a job, or None if it is not known."""
+        return self._jobs.get(job_id)
+
+    def remove(self, job_id: str) -> bool:
+        """
+        Cancels a job if it is not finished, then forgets it and deletes its checkpoint.
+
+        Returns:
+            bool: Whether the job was known.
+        """
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return False
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        if self.path is not None:
+            deletion = self._writer.submit((self.path / f"{job_id}.json").unlink, missing_ok=True)
+            deletion.add_done_callback(_log_checkpoint_error)
+        return True
+
+    async def aclose(self) -> None:
+        """Stops the workers, checkpointing the running jobs to resume them on the next start."""
+        tasks = [*self._workers, *self._running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        await asyncio.to_thread(self._writer.shutdown)
+
+    async def _work(self) -> None:
+        """Runs the queued jobs one by one until cancelled."""
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            task = asyncio.ensure_future(self._run(job))
+            self._running[job_id] = task
+            try:
+                # Waiting does not cancel the job, `remove` and `aclose` do
+                await asyncio.wait([task])
+            finally:
+                del self._running[job_id]
+
+    async def _run(self, job: CrawlJob) -> None:
+        """Crawls the pages of a job, merging and checkpointing its progress."""
+        job.status = JobStatus.RUNNING
+        self._checkpoint(job)
+        try:
+            source = self.sources(job.site)
+        except (SiteLimitError, ValueError) as error:
+            job.status = JobStatus.FAILED
+            job.error = str(error)
+            job.state = None
+            self._checkpoint(job)
+            return
+        budget = CrawlBudget(job.max_pages, job.max_bytes, job.timeout_s)
+        budget.pages_visited = job.pages_visited
+        budget.bytes_fetched = job.bytes_fetched
+        checkpointed_at = monotonic()
+        pages = iter_pages(
+            job.article,
+            job.depth,
+            client=source.client,
+            max_concurrency=self.max_concurrency,
+            count_page=source.count_page,
+            budget=budget,
+            link_index=source.link_index,
+            state=job.state,
+        )
+        try:
+            async with contextlib.aclosing(pages):
+                async for visit in pages:
+                    # Before merging, to match the state, which does not include this page yet
+                    if monotonic() - checkpointed_at >= self.checkpoint_interval:
+                        self._checkpoint(job)
+                        checkpointed_at = monotonic()
+                    job.word_counts.update(visit.word_counts)
+                    remove_words(job.word_counts, job.ignore_words)
+                    job.pages_visited += 1
+                    # The budget charges whole batches, a resumed job fetches the unmerged pages again
+                    job.bytes_fetched += visit.size
+        except (WikiApiError, httpx.HTTPError) as error:
+            _logger.exception("Crawl job %s of '%s' failed", job.id, job.article)
+            job.status = JobStatus.FAILED
+            job.error = str(error)
+        except asyncio.CancelledError:
+            # Stopped by `aclose`, the job is resumed on the next start
+            if job.id in self._jobs:
+                self._checkpoint(job)
+            raise
+        except Exception as error:
+            # Any other failure finishes the job too, so it is neither stuck running nor resumed
+            _logger.exception("Crawl job %s of '%s' failed unexpectedly", job.id, job.article)
+            job.status = JobStatus.FAILED
+            job.error = str(error) or type(error).__name__
+        else:
+            job.status = JobStatus.COMPLETED
+        job.truncated = budget.truncated
+        job.state = None
+        self._checkpoint(job)
+
+    def _checkpoint(self, job: CrawlJob) -> None:
+        """Writes the checkpoint of a job in the background, replacing the previous one."""
+        job.updated_at = time()
+        if self.path is None:
+            return
+        write = self._writer.submit(_write_checkpoint, self.path / f"{job.id}.json", job.snapshot())
+        write.add_done_callback(_log_checkpoint_error)
+
+
+def _write_checkpoint(path: Path, snapshot: dict[str, Any]) -> None:
+    """Encodes a job snapshot to its checkpoint file, replacing the previous one atomically."""
+    temporary_path = path.with_suffix(".tmp")
+    temporary_path.write_bytes(orjson.dumps(snapshot))
+    temporary_path.replace(path)
+
+
+def _log_checkpoint_error(future: Future[None]) -> None:
+    """Logs the error of a checkpoint written or deleted in the background."""
+    error = future.exception()
+    if error is not None:
+        _logger.error("Could not update a job checkpoint", exc_info=error)
@@ -0,0 +1,199 @@
+"""
+Local store of the link graph learned from the fetched pages.
+
+Every fetched page records its outgoing links, with the revision id they were read from. The
+store lets a crawl start fetching the next level before the current one arrives, and answers how
+many pages a crawl will touch before it starts.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from time import time
+from typing import NamedTuple
+
+from wikicounter.wiki_connection import PageContent
+
+SQLITE_MAX_VARIABLES = 500
+"""Number of titles looked up in a single query."""
+
+
+class LinkEstimate(NamedTuple):
+    """The number of pages a crawl reaches according to the known links."""
+
+    pages: int
+    unknown_pages: int
+    """Reached pages whose links are not known, the pages behind them are not counted."""
+    limited: bool = False
+    """Whether the counting stopped at the limit."""
+
+    @property
+    def exact(self) -> bool:
+        """Whether every page the crawl expands has known links, so `pages` is not a lower bound."""
+        return self.unknown_pages == 0 and not self.limited
+
+
+class LinkGraph:
+    """
+    Outgoing links of the pages, persisted in a SQLite database.
+
+    The stored links are buffered in memory and written in one transaction from a worker thread,
+    by a flush started from the running event loop, or by `flush` and `close`. The buffered links
+    are served like the written ones. `get_links` reads from a worker thread, `estimate` is
+    synchronous and meant to be run in one.
+    """
+
+    def __init__(self, path: Path | str = ":memory:") -> None:
+        """
+        Opens (and creates if needed) the link graph database.
+
+        Args:
+            path (Path | str): The path of the SQLite database file, kept in memory by default.
+        """
+        self._lock = threading.Lock()
+        # Guards the buffers, read by the lookups from the worker threads
+        self._buffer_lock = threading.Lock()
+        self._buffered: dict[str, PageContent] = {}
+        self._writing: dict[str, PageContent] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task[None] | None = None
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS links (
+                    title TEXT PRIMARY KEY,
+                    revision_id INTEGER NOT NULL,
+                    links TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """,
+            )
+
+    def __len__(self) -> int:
+        """Returns the number of pages with known links."""
+        with self._buffer_lock:
+            buffered = {*self._writing, *self._buffered}
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM links WHERE title NOT IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(buffered)),),
+            ).fetchone()
+        return count + len(buffered)
+
+    def update(self, pages: Mapping[str, PageContent]) -> None:
+        """
+        Stores the links of fetched pages, replacing the links of older revisions.
+
+        The links are written by a flush started in the background when called from the running
+        event loop, and by the next `flush` or `close` otherwise.
+
+        Args:
+            pages (Mapping[str, PageContent]): The fetched pages keyed by their requested titles.
+        """
+        with self._buffer_lock:
+            self._buffered.update(pages)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self.flush())
+
+    async def get_links(self, titles: Iterable[str]) -> dict[str, list[str]]:
+        """
+        Returns the known links of pages, read from a worker thread.
+
+        Args:
+            titles (Iterable[str]): The titles of the pages.
+
+        Returns:
+            dict[str, list[str]]: The links of the pages that are known, keyed by their title.
+        """
+        return await asyncio.to_thread(self._get_links, list(titles))
+
+    async def flush(self) -> None:
+        """Writes the buffered links in one transaction, from a worker thread."""
+        async with self._flush_lock:
+            # The links buffered while writing are written by the next round
+            while self._buffered:
+                with self._buffer_lock:
+                    self._writing, self._buffered = self._buffered, {}
+                try:
+                    await asyncio.to_thread(self._write, self._writing)
+                finally:
+                    with self._buffer_lock:
+                        self._writing = {}
+
+    def _write(self, pages: Mapping[str, PageContent]) -> None:
+        """Writes the links of pages in a single transaction."""
+        now = time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?)",
+                (
+                    (title, page.revision_id, json.dumps(page.links), now)
+                    for title, page in pages.items()
+                ),
+            )
+
+    def _get_links(self, titles: list[str]) -> dict[str, list[str]]:
+        """Returns the known links of pages, the buffered ones first."""
+        links: dict[str, list[str]] = {}
+        with self._buffer_lock:
+            for title in titles:
+                page = self._buffered.get(title) or self._writing.get(title)
+                if page is not None:
+                    links[title] = page.links
+        titles = [title for title in titles if title not in links]
+        with self._lock:
+            for start in range(0, len(titles), SQLITE_MAX_VARIABLES):
+                chunk = titles[start : start + SQLITE_MAX_VARIABLES]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT title, links FROM links WHERE title IN ({placeholders})",  # noqa: S608
+                    chunk,
+                )
+                links.update((title, json.loads(page_links)) for title, page_links in rows)
+        return links
+
+    def estimate(self, page_title: str, max_depth: int, limit: int | None = None) -> LinkEstimate:
+        """
+        Counts the pages a crawl would visit, following the known links breadth-first.
+
+        Args:
+            page_title (str): The title of the starting page.
+            max_depth (int): The maximum depth of the crawl.
+            limit (int | None): Stop counting after this many pages, unlimited if None.
+
+        Returns:
+            LinkEstimate: The number of reached pages and of the pages whose links are unknown.
+                Pages behind unknown pages are not counted, so it is a lower bound unless exact.
+        """
+        visited = {page_title}
+        frontier = [page_title]
+        unknown_pages = 0
+        for _depth in range(max_depth):
+            links = self._get_links(frontier)
+            unknown_pages += len(frontier) - len(links)
+            frontier = []
+            for title in (link for page_links in links.values() for link in page_links):
+                if title not in visited:
+                    visited.add(title)
+                    frontier.append(title)
+            if limit is not None and len(visited) >= limit:
+                return LinkEstimate(len(visited), unknown_pages, limited=True)
+            if not frontier:
+                break
+        return LinkEstimate(len(visited), unknown_pages)
+
+    def close(self) -> None:
+        """Writes the buffered links, and closes the database connection."""
+        with self._buffer_lock:
+            pages, self._buffered = self._buffered, {}
+        self._write(pages)
+        with self._lock:
+            self._connection.close()
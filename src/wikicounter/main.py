@@ -5,30 +5,210 @@ This module sets up the FastAPI application, defines the API endpoints,
 and handles requests to retrieve word frequency data from Wikipedia articles.
 """
 
+import asyncio
+import sys
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from time import time
-from typing import Annotated
+from typing import Annotated, NamedTuple, Self, TypeVar
 
-from fastapi import FastAPI, Query
-from fastapi.responses import RedirectResponse
-from pydantic import BaseModel, Field
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import (
+    ORJSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
+from pydantic import BaseModel, Field, model_validator
 
 from wikicounter import __version__
-from wikicounter.counting import WordFrequency, create_frequency_dict
-from wikicounter.wiki_connection import walk_pages
+from wikicounter.cache import (
+    CacheStats,
+    ResultCache,
+    ResultCacheStats,
+)
+from wikicounter.coalescing import FlightStats, SingleFlight
+from wikicounter.counting import (
+    ApproximateCounter,
+    Approximation,
+    ErrorBounds,
+    Vocabulary,
+    WordFrequency,
+    create_frequency_dict,
+    normalize_words,
+)
+from wikicounter.jobs import CrawlJob, JobLimitError, JobScheduler, JobSource, JobStatus
+from wikicounter.metrics import (
+    METRICS,
+    PROMETHEUS_MEDIA_TYPE,
+    Stage,
+    collect_timings,
+    measure,
+)
+from wikicounter.serialization import OutputFormat, encode_word_frequency
+from wikicounter.settings import Settings
+from wikicounter.sites import (
+    DEFAULT_LANGUAGE,
+    DEFAULT_SITE,
+    LANGUAGE_PATTERN,
+    Site,
+    SiteClients,
+    SiteLimitError,
+    SitePool,
+    WikiProject,
+)
+from wikicounter.streaming import NDJSON_MEDIA_TYPE, stream_word_frequency
+from wikicounter.tokenization import ProcessTokenizer
+from wikicounter.wiki_connection import (
+    CrawlBudget,
+    iter_pages,
+    walk_pages,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Open the shared site pool and background tasks on startup, close them on shutdown.
+
+    The clients and caches of a wiki are only created on its first request or warm-up, so the
+    startup does not wait for any network request.
+    """
+    settings = Settings.from_env()
+    tokenizer = ProcessTokenizer(settings.tokenizer_workers, settings.tokenizer_min_text_size)
+    sites = SitePool(settings, tokenizer)
+    if settings.warmup_articles:
+        sites.warm_up(DEFAULT_SITE, settings.warmup_articles)
+
+    def job_source(site: Site) -> JobSource:
+        clients = sites.get(site)
+        return JobSource(clients.page_source, clients.page_source.count_page, clients.link_graph)
+
+    app.state.settings = settings
+    app.state.sites = sites
+    app.state.crawls = SingleFlight()
+    app.state.results = ResultCache(settings.result_cache_size, settings.result_cache_ttl)
+    app.state.vocabulary = Vocabulary(settings.vocabulary_size) if settings.compact_counts else None
+    jobs = JobScheduler(
+        job_source,
+        settings.jobs_path,
+        workers=settings.job_workers,
+        max_jobs=settings.max_jobs,
+        checkpoint_interval=settings.job_checkpoint_interval,
+        max_concurrency=settings.max_concurrency,
+    )
+    jobs.start()
+    app.state.jobs = jobs
+    try:
+        yield
+    finally:
+        await jobs.aclose()
+        await sites.aclose()
+        tokenizer.close()
+
 
 app = FastAPI(
     title="WikiCounter API",
     description="API for counting word frequencies in Wikipedia articles",
     version=__version__,
+    lifespan=lifespan,
 )
 
+
+def get_sites(request: Request) -> SitePool:
+    """Dependency returning the pool of the clients and caches of the served wikis."""
+    return request.app.state.sites
+
+
+def get_settings(request: Request) -> Settings:
+    """Dependency returning the settings of the application."""
+    return request.app.state.settings
+
+
+SitesDep = Annotated[SitePool, Depends(get_sites)]
+SettingsDep = Annotated[Settings, Depends(get_settings)]
+
+
+def open_site(sites: SitePool, site: Site) -> SiteClients:
+    """Return the clients of a site, answering 503 if no more sites can be served."""
+    try:
+        return sites.get(site)
+    except SiteLimitError as error:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, str(error)) from error
+    except ValueError as error:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(error)) from error
+
+
+async def get_site_clients(
+    sites: SitesDep,
+    language: Annotated[
+        str,
+        Query(pattern=LANGUAGE_PATTERN, description="Language code of the wiki, e.g. `en` or `de`"),
+    ] = DEFAULT_LANGUAGE,
+    site: Annotated[
+        WikiProject,
+        Query(description="Wikimedia project of the wiki, e.g. `wikipedia` or `wiktionary`"),
+    ] = WikiProject.WIKIPEDIA,
+) -> SiteClients:
+    """
+    Dependency returning the clients of the wiki selected by the query parameters.
+
+    Asynchronous, so a new site is opened on the event loop, where its background tasks start.
+    """
+    return open_site(sites, Site(language, site))
+
+
+SiteClientsDep = Annotated[SiteClients, Depends(get_site_clients)]
+
 # MARK: API Models
 
 
-class KeywordsRequest(BaseModel):
-    """Request model for keywords endpoint."""
+class CrawlLimits(BaseModel):
+    """Optional limits of a crawl, capped by the limits of the service settings."""
+
+    max_pages: int | None = Field(default=None, ge=1, description="Maximum number of pages visited")
+    max_bytes: int | None = Field(
+        default=None,
+        ge=1,
+        description="Maximum size of the visited page texts in bytes",
+    )
+    timeout_s: float | None = Field(
+        default=None,
+        gt=0,
+        description="Seconds after which the crawl stops and returns the partial result",
+    )
+
+    def create_budget(self, settings: Settings) -> CrawlBudget:
+        """Creates the budget of a crawl from the stricter of the requested and configured limits."""
+        return CrawlBudget(
+            max_pages=_stricter(self.max_pages, settings.max_pages),
+            max_bytes=_stricter(self.max_bytes, settings.max_bytes),
+            timeout_s=_stricter(self.timeout_s, settings.crawl_timeout),
+        )
+
+
+_Limit = TypeVar("_Limit", int, float)
+
+
+def _stricter(requested: _Limit | None, configured: _Limit | None) -> _Limit | None:
+    """Returns the smaller of two optional limits, None meaning unlimited."""
+    limits = [limit for limit in (requested, configured) if limit is not None]
+    return min(limits, default=None)
+
+
+class CrawlRequest(CrawlLimits):
+    """The article, site and options of a crawl, shared by the keywords and job requests."""
 
     article: str = Field(..., description="Title of the Wikipedia article")
+    language: str = Field(
+        default=DEFAULT_LANGUAGE,
+        pattern=LANGUAGE_PATTERN,
+        description="Language code of the wiki, e.g. `en` or `de`",
+    )
+    site: WikiProject = Field(
+        default=WikiProject.WIKIPEDIA,
+        description="Wikimedia project of the wiki, e.g. `wikipedia` or `wiktionary`",
+    )
     depth: int = Field(default=0, ge=0, description="Depth of the articles to traverse")
     ignore_list: list[str] | None = Field(None, description="List of words to ignore")
     percentile: int = Field(
@@ -38,6 +218,36 @@ class KeywordsRequest(BaseModel):
         description="Percentile threshold for word frequency",
     )
 
+
+class KeywordsRequest(CrawlRequest):
+    """Request model for keywords endpoint."""
+
+    stream: bool = Field(default=False, description="Stream progress and results as NDJSON")
+    format: OutputFormat = Field(
+        default=OutputFormat.DICT,
+        description="Layout of the word frequencies: `dict` or parallel `columnar` arrays",
+    )
+    debug_timings: bool = Field(
+        default=False,
+        description="Return the seconds spent in each stage of the request",
+    )
+    approximate: bool = Field(
+        default=False,
+        description=(
+            "Count with a sketch of bounded memory, only the most frequent words are returned, with"
+            " the error bounds of their counts. `percentile` applies to the estimated number of"
+            " distinct words"
+        ),
+    )
+
+    @model_validator(mode="after")
+    def _check_approximate(self) -> Self:
+        """The streamed progress reports exact counts, so it is not combined with `approximate`."""
+        if self.approximate and self.stream:
+            msg = "`approximate` cannot be combined with `stream`"
+            raise ValueError(msg)
+        return self
+
     model_config = {
         "json_schema_extra": {
             "examples": [
@@ -52,13 +262,45 @@ class KeywordsRequest(BaseModel):
     }
 
 
+class ColumnarWordFrequency(BaseModel):
+    """Word frequencies as parallel arrays, ordered from the most frequent word."""
+
+    words: list[str]
+    counts: list[int]
+    percent: list[float]
+
+
+class ApproximationResponse(BaseModel):
+    """Error bounds of the approximate word counts."""
+
+    max_overcount: int = Field(description="The counts exceed the exact ones by at most this")
+    confidence: float = Field(description="Probability that the counts are within `max_overcount`")
+    tracked_words: int = Field(description="Number of the most frequent words tracked")
+    distinct_words: int = Field(
+        description=(
+            "Estimated number of distinct counted words, `percentile` keeps a share of them among"
+            " the tracked words"
+        ),
+    )
+
+
 class BaseResponse(BaseModel):
     """Base response model for API endpoints."""
 
     start_article: str
     max_depth: int
-    word_frequency: dict[str, WordFrequency]
+    word_frequency: dict[str, WordFrequency] | ColumnarWordFrequency
     time_elapsed: float
+    pages_visited: int
+    truncated: bool = Field(description="Whether the crawl was stopped early by a limit")
+    debug_timings: dict[str, float] | None = Field(
+        default=None,
+        description="Seconds spent in each stage of the request, only returned when requested",
+    )
+    approximation: ApproximationResponse | None = Field(
+        default=None,
+        description="Error bounds of the counts, only returned for approximate counting",
+    )
 
 
 class WordFrequencyResponse(BaseResponse):
@@ -69,6 +311,122 @@ class KeywordsResponse(BaseResponse):
     """Response model for keywords endpoint."""
 
 
+class JobRequest(CrawlRequest):
+    """Request model for starting a crawl job."""
+
+
+class JobResponse(BaseModel):
+    """Response model for the crawl job endpoints."""
+
+    id: str
+    status: JobStatus
+    start_article: str
+    max_depth: int
+    created_at: float
+    updated_at: float
+    current_depth: int | None = Field(description="Depth being crawled, null once finished")
+    pages_visited: int
+    pages_queued: int = Field(description="Pages found by the crawl and not visited yet")
+    truncated: bool = Field(description="Whether the crawl was stopped early by a limit")
+    error: str | None
+    word_frequency: dict[str, WordFrequency] | ColumnarWordFrequency = Field(
+        description="Word frequencies of the pages visited so far",
+    )
+
+
+class EstimateResponse(BaseModel):
+    """Response model for the crawl estimate endpoint."""
+
+    start_article: str
+    max_depth: int
+    pages: int = Field(description="Number of pages the crawl reaches through the known links")
+    unknown_pages: int = Field(description="Reached pages whose links are not known yet")
+    exact: bool = Field(description="Whether `pages` is exact rather than a lower bound")
+
+
+STREAM_RESPONSES: dict[int | str, dict] = {
+    200: {
+        "description": "The word frequencies, or NDJSON events if `stream` is set",
+        "content": {NDJSON_MEDIA_TYPE: {}},
+    },
+}
+
+
+def get_crawl_limits(
+    max_pages: Annotated[
+        int | None,
+        Query(ge=1, description="Maximum number of pages visited"),
+    ] = None,
+    max_bytes: Annotated[
+        int | None,
+        Query(ge=1, description="Maximum size of the visited page texts in bytes"),
+    ] = None,
+    timeout_s: Annotated[
+        float | None,
+        Query(
+            gt=0,
+            description="Seconds after which the crawl stops and returns the partial result",
+        ),
+    ] = None,
+) -> CrawlLimits:
+    """Dependency reading the crawl limits from the query parameters."""
+    return CrawlLimits(max_pages=max_pages, max_bytes=max_bytes, timeout_s=timeout_s)
+
+
+CrawlLimitsDep = Annotated[CrawlLimits, Depends(get_crawl_limits)]
+
+
+class CrawlKey(NamedTuple):
+    """Identifies the crawls producing the same word frequencies."""
+
+    site: Site
+    article: str
+    depth: int
+    ignore_words: frozenset[str]
+    percentile: float
+    max_pages: int | None
+    max_bytes: int | None
+    timeout_s: float | None
+    approximate: bool = False
+
+
+class CountedCrawl(NamedTuple):
+    """The frequency table of a crawl, shared by identical requests."""
+
+    word_frequency: dict[str, WordFrequency]
+    pages_visited: int
+    truncated: bool
+    error_bounds: ErrorBounds | None = None
+
+
+def get_crawls(request: Request) -> SingleFlight[CrawlKey, CountedCrawl]:
+    """Dependency returning the crawls in flight, shared by identical concurrent requests."""
+    return request.app.state.crawls
+
+
+def get_results(request: Request) -> ResultCache[CrawlKey, CountedCrawl]:
+    """Dependency returning the cache of the finished crawls."""
+    return request.app.state.results
+
+
+def get_vocabulary(request: Request) -> Vocabulary | None:
+    """Dependency returning the vocabulary shared by the crawls, None if counters are used."""
+    return request.app.state.vocabulary
+
+
+def get_jobs(request: Request) -> JobScheduler:
+    """Dependency returning the scheduler of the crawl jobs."""
+    return request.app.state.jobs
+
+
+CrawlsDep = Annotated[SingleFlight[CrawlKey, CountedCrawl], Depends(get_crawls)]
+ResultsDep = Annotated[ResultCache[CrawlKey, CountedCrawl], Depends(get_results)]
+VocabularyDep = Annotated[Vocabulary | None, Depends(get_vocabulary)]
+JobsDep = Annotated[JobScheduler, Depends(get_jobs)]
+
+_FREQUENCY_ENTRY_SIZE = sys.getsizeof(WordFrequency(0, 0.0)) + sys.getsizeof(0) + sys.getsizeof(0.0)
+"""Estimated size of a value of a frequency table in bytes."""
+
 # MARK: API Endpoints
 
 
@@ -78,34 +436,477 @@ def forward_to_docs() -> RedirectResponse:
     return RedirectResponse(url="/docs", status_code=307)
 
 
-@app.get("/word-frequency", summary="Get word frequency from a Wikipedia article(s)")
-def get_word_frequency(
+@app.get(
+    "/word-frequency",
+    summary="Get word frequency from a Wikipedia article(s)",
+    response_model=WordFrequencyResponse,
+    responses=STREAM_RESPONSES,
+)
+async def get_word_frequency(  # noqa: PLR0913, PLR0917
     article: Annotated[str, Query(description="Title of the Wikipedia article")],
+    clients: SiteClientsDep,
+    settings: SettingsDep,
+    crawls: CrawlsDep,
+    results: ResultsDep,
+    vocabulary: VocabularyDep,
+    limits: CrawlLimitsDep,
     depth: Annotated[int, Query(description="Depth of the articles to traverse", ge=0)] = 0,
-) -> WordFrequencyResponse:
+    stream: Annotated[bool, Query(description="Stream progress and results as NDJSON")] = False,  # noqa: FBT002
+    output_format: Annotated[
+        OutputFormat,
+        Query(
+            alias="format",
+            description="Layout of the word frequencies: `dict` or parallel `columnar` arrays",
+        ),
+    ] = OutputFormat.DICT,
+    debug_timings: Annotated[  # noqa: FBT002
+        bool,
+        Query(description="Return the seconds spent in each stage of the request"),
+    ] = False,
+) -> ORJSONResponse | StreamingResponse:
     """Get the word frequency from a Wikipedia article."""
+    if stream:
+        return _streaming_response(
+            article,
+            depth,
+            clients,
+            settings,
+            output_format=output_format,
+            budget=limits.create_budget(settings),
+        )
+
     start_time = time()
-    word_counter = walk_pages(article, depth)
-    frequency_dict = create_frequency_dict(word_counter)
-    elapsed_time = round(time() - start_time, 2)
-    return WordFrequencyResponse(
+    with collect_timings() as timings:
+        counted = await _count_frequencies(
+            _crawl_key(clients.site, article, depth, limits),
+            limits,
+            clients=clients,
+            settings=settings,
+            crawls=crawls,
+            results=results,
+            vocabulary=vocabulary,
+        )
+        elapsed_time = round(time() - start_time, 2)
+        return _frequency_response(
+            counted,
+            output_format,
+            start_article=article,
+            max_depth=depth,
+            time_elapsed=elapsed_time,
+            timings=timings if debug_timings else None,
+        )
+
+
+@app.post(
+    "/keywords",
+    summary="Get keywords from a Wikipedia article(s) by filtering",
+    response_model=KeywordsResponse,
+    responses=STREAM_RESPONSES,
+)
+async def get_keywords(
+    request: KeywordsRequest,
+    sites: SitesDep,
+    settings: SettingsDep,
+    crawls: CrawlsDep,
+    results: ResultsDep,
+    vocabulary: VocabularyDep,
+) -> ORJSONResponse | StreamingResponse:
+    """Get the keywords from a Wikipedia article."""
+    clients = open_site(sites, Site(request.language, request.site))
+    if request.stream:
+        return _streaming_response(
+            request.article,
+            request.depth,
+            clients,
+            settings,
+            output_format=request.format,
+            budget=request.create_budget(settings),
+            ignore_words=request.ignore_list,
+            percentile=request.percentile,
+        )
+
+    start_time = time()
+    key = _crawl_key(
+        clients.site,
+        request.article,
+        request.depth,
+        request,
+        ignore_words=request.ignore_list,
+        percentile=request.percentile,
+        approximate=request.approximate,
+    )
+    with collect_timings() as timings:
+        counted = await _count_frequencies(
+            key,
+            request,
+            clients=clients,
+            settings=settings,
+            crawls=crawls,
+            results=results,
+            vocabulary=vocabulary,
+        )
+        elapsed_time = round(time() - start_time, 2)
+        return _frequency_response(
+            counted,
+            request.format,
+            start_article=request.article,
+            max_depth=request.depth,
+            time_elapsed=elapsed_time,
+            timings=timings if request.debug_timings else None,
+        )
+
+
+def _crawl_key(  # noqa: PLR0913
+    site: Site,
+    article: str,
+    depth: int,
+    limits: CrawlLimits,
+    *,
+    ignore_words: list[str] | None = None,
+    percentile: float = 0,
+    approximate: bool = False,
+) -> CrawlKey:
+    """
+    Create the canonical key of a crawl, equal for the requests producing the same word frequencies.
+
+    The ignore list is normalized like the counted words, so its order, duplicates and case do not
+    matter.
+    """
+    return CrawlKey(
+        site,
+        article,
+        depth,
+        normalize_words(ignore_words),
+        percentile,
+        limits.max_pages,
+        limits.max_bytes,
+        limits.timeout_s,
+        approximate,
+    )
+
+
+async def _count_frequencies(  # noqa: PLR0913
+    key: CrawlKey,
+    limits: CrawlLimits,
+    *,
+    clients: SiteClients,
+    settings: Settings,
+    crawls: SingleFlight[CrawlKey, CountedCrawl],
+    results: ResultCache[CrawlKey, CountedCrawl],
+    vocabulary: Vocabulary | None,
+) -> CountedCrawl:
+    """
+    Crawl the pages and create the frequency table, unless an identical request was answered recently.
+
+    Identical concurrent requests share one crawl. Truncated results are not cached, as they depend
+    on how fast the pages were fetched.
+    """
+    cached = results.get(key)
+    if cached is not None:
+        return cached
+
+    page_source = clients.page_source
+    approximation = None
+    if key.approximate:
+        approximation = Approximation(
+            settings.approximate_error,
+            settings.approximate_confidence,
+            settings.approximate_top_words,
+        )
+
+    async def count() -> CountedCrawl:
+        crawl = await walk_pages(
+            key.article,
+            key.depth,
+            ignore_words=key.ignore_words,
+            client=page_source,
+            max_concurrency=settings.max_concurrency,
+            count_page=page_source.count_page,
+            budget=limits.create_budget(settings),
+            vocabulary=vocabulary,
+            link_index=clients.link_graph,
+            approximation=approximation,
+        )
+        with measure(Stage.FREQUENCY):
+            frequency_dict = create_frequency_dict(crawl.word_counter, key.percentile)
+        error_bounds = None
+        if isinstance(crawl.word_counter, ApproximateCounter):
+            error_bounds = crawl.word_counter.error_bounds()
+        counted = CountedCrawl(frequency_dict, crawl.pages_visited, crawl.truncated, error_bounds)
+        if not crawl.truncated:
+            results.set(key, counted, _estimate_size(frequency_dict))
+        return counted
+
+    return await crawls.run(key, count)
+
+
+def _estimate_size(frequency_dict: dict[str, WordFrequency]) -> int:
+    """Estimate the memory used by a frequency table in bytes."""
+    return (
+        sys.getsizeof(frequency_dict)
+        + sum(map(sys.getsizeof, frequency_dict))
+        + len(frequency_dict) * _FREQUENCY_ENTRY_SIZE
+    )
+
+
+def _frequency_response(
+    counted: CountedCrawl,
+    output_format: OutputFormat,
+    *,
+    start_article: str,
+    max_depth: int,
+    time_elapsed: float,
+    timings: dict[str, float] | None = None,
+) -> ORJSONResponse:
+    """
+    Encode a frequency table response with orjson.
+
+    The content has the shape of `BaseResponse`, but it is built from built-in types and skips the
+    Pydantic validation, which is slow for large tables. The `debug_timings` are only added when
+    `timings` is given, they cannot include the final encoding of the response itself.
+    """
+    with measure(Stage.SERIALIZE):
+        word_frequency = encode_word_frequency(counted.word_frequency, output_format)
+    content = {
+        "start_article": start_article,
+        "max_depth": max_depth,
+        "word_frequency": word_frequency,
+        "time_elapsed": time_elapsed,
+        "pages_visited": counted.pages_visited,
+        "truncated": counted.truncated,
+    }
+    if counted.error_bounds is not None:
+        content["approximation"] = counted.error_bounds._asdict()
+    if timings is not None:
+        content["debug_timings"] = {stage: round(seconds, 6) for stage, seconds in timings.items()}
+    with measure(Stage.SERIALIZE):
+        return ORJSONResponse(content)
+
+
+def _streaming_response(  # noqa: PLR0913
+    article: str,
+    depth: int,
+    clients: SiteClients,
+    settings: Settings,
+    *,
+    output_format: OutputFormat,
+    budget: CrawlBudget,
+    ignore_words: list[str] | None = None,
+    percentile: float = 0,
+) -> StreamingResponse:
+    """Crawl the pages while streaming the progress and the result as NDJSON."""
+    pages = iter_pages(
+        article,
+        depth,
+        client=clients.page_source,
+        max_concurrency=settings.max_concurrency,
+        count_page=clients.page_source.count_page,
+        budget=budget,
+        link_index=clients.link_graph,
+    )
+    return StreamingResponse(
+        stream_word_frequency(
+            pages,
+            budget=budget,
+            start_article=article,
+            max_depth=depth,
+            ignore_words=normalize_words(ignore_words),
+            percentile=percentile,
+            output_format=output_format,
+        ),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+@app.post(
+    "/jobs",
+    summary="Start a crawl in the background",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={429: {"description": "Too many crawl jobs are queued or running"}},
+)
+async def start_job(request: JobRequest, jobs: JobsDep, settings: SettingsDep) -> ORJSONResponse:
+    """
+    Queue a crawl, and return its job to poll for the progress.
+
+    The page and byte limits of the service cap those of the job. The crawl timeout of the
+    service bounds the HTTP requests, so it does not apply to the jobs.
+    """
+    try:
+        job = jobs.submit(
+            request.article,
+            request.depth,
+            site=Site(request.language, request.site),
+            ignore_words=sorted(normalize_words(request.ignore_list)),
+            percentile=request.percentile,
+            max_pages=_stricter(request.max_pages, settings.max_pages),
+            max_bytes=_stricter(request.max_bytes, settings.max_bytes),
+            timeout_s=request.timeout_s,
+        )
+    except JobLimitError as error:
+        raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, str(error)) from error
+    return _job_response(job, OutputFormat.DICT, status_code=status.HTTP_202_ACCEPTED)
+
+
+@app.get(
+    "/jobs/{job_id}",
+    summary="Get the progress and the word frequencies of a crawl job",
+    response_model=JobResponse,
+)
+async def get_job(
+    job_id: str,
+    jobs: JobsDep,
+    output_format: Annotated[
+        OutputFormat,
+        Query(
+            alias="format",
+            description="Layout of the word frequencies: `dict` or parallel `columnar` arrays",
+        ),
+    ] = OutputFormat.DICT,
+) -> ORJSONResponse:
+    """Get the status of a crawl job, with the word frequencies of the pages visited so far."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown job '{job_id}'")
+    return _job_response(job, output_format)
+
+
+@app.delete(
+    "/jobs/{job_id}",
+    summary="Cancel and forget a crawl job",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_job(job_id: str, jobs: JobsDep) -> Response:
+    """Cancel the crawl of a job if it is not finished, and delete the job with its checkpoint."""
+    if not jobs.remove(job_id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown job '{job_id}'")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _job_response(
+    job: CrawlJob,
+    output_format: OutputFormat,
+    status_code: int = status.HTTP_200_OK,
+) -> ORJSONResponse:
+    """
+    Encode the progress of a job, with the frequency table of the counts merged so far.
+
+    Called on the event loop, where the job merges its counts, so they do not change meanwhile.
+    """
+    with measure(Stage.FREQUENCY):
+        frequency_dict = create_frequency_dict(job.word_counts, job.percentile)
+    state = job.state
+    content = {
+        "id": job.id,
+        "status": job.status,
+        "start_article": job.article,
+        "max_depth": job.depth,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "current_depth": None if state is None else state.depth,
+        "pages_visited": job.pages_visited,
+        "pages_queued": 0 if state is None else len(state.remaining()) + len(state.next_frontier),
+        "truncated": job.truncated,
+        "error": job.error,
+        "word_frequency": encode_word_frequency(frequency_dict, output_format),
+    }
+    return ORJSONResponse(content, status_code=status_code)
+
+
+@app.get(
+    "/estimate",
+    summary="Estimate the number of pages a crawl touches from the known link graph",
+)
+async def get_estimate(
+    article: Annotated[str, Query(description="Title of the Wikipedia article")],
+    clients: SiteClientsDep,
+    depth: Annotated[int, Query(description="Depth of the articles to traverse", ge=0)] = 0,
+    limit: Annotated[
+        int | None,
+        Query(ge=1, description="Stop counting after this many pages"),
+    ] = None,
+) -> EstimateResponse:
+    """Count the pages a crawl would visit, without fetching any of them."""
+    # The breadth-first search reads SQLite, off the event loop
+    estimate = await asyncio.to_thread(clients.link_graph.estimate, article, depth, limit)
+    return EstimateResponse(
         start_article=article,
         max_depth=depth,
-        word_frequency=frequency_dict,
-        time_elapsed=elapsed_time,
+        pages=estimate.pages,
+        unknown_pages=estimate.unknown_pages,
+        exact=estimate.exact,
     )
 
 
-@app.post("/keywords", summary="Get keywords from a Wikipedia article(s) by filtering")
-def get_keywords(request: KeywordsRequest) -> KeywordsResponse:
-    """Get the keywords from a Wikipedia article."""
-    start_time = time()
-    word_counter = walk_pages(request.article, request.depth, ignore_words=request.ignore_list)
-    frequency_dict = create_frequency_dict(word_counter, percentile=request.percentile)
-    elapsed_time = round(time() - start_time, 2)
-    return KeywordsResponse(
-        start_article=request.article,
-        max_depth=request.depth,
-        word_frequency=frequency_dict,
-        time_elapsed=elapsed_time,
+@app.get(
+    "/metrics",
+    summary="Get the stage timings and counters in the Prometheus text format",
+    response_class=PlainTextResponse,
+)
+async def get_metrics(
+    sites: SitesDep,
+    crawls: CrawlsDep,
+    results: ResultsDep,
+) -> PlainTextResponse:
+    """Get the time spent in each stage, the work counters and the cache statistics of the process."""
+    pages, word_counts = sites.page_stats()
+    metrics = METRICS.render(
+        {
+            "pages": pages,
+            "word_counts": word_counts,
+            "crawls": crawls.stats,
+            "results": results.stats,
+        },
     )
+    return PlainTextResponse(metrics, media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@app.get("/cache", summary="Get the hit and miss statistics of the page and word count caches")
+async def get_cache_stats(
+    sites: SitesDep,
+    crawls: CrawlsDep,
+    results: ResultsDep,
+) -> dict[str, CacheStats | FlightStats | ResultCacheStats]:
+    """Get the statistics of the caches, summed over the wikis, and of the shared crawls."""
+    pages, word_counts = sites.page_stats()
+    return {
+        "pages": pages,
+        "word_counts": word_counts,
+        "crawls": crawls.stats,
+        "results": results.stats,
+    }
+
+
+@app.delete("/cache/results", summary="Invalidate the cached results")
+async def invalidate_results(
+    results: ResultsDep,
+    article: Annotated[
+        str | None,
+        Query(description="Only invalidate the results starting from this article"),
+    ] = None,
+    language: Annotated[
+        str | None,
+        Query(pattern=LANGUAGE_PATTERN, description="Only invalidate the results of this language"),
+    ] = None,
+    site: Annotated[
+        WikiProject | None,
+        Query(description="Only invalidate the results of this Wikimedia project"),
+    ] = None,
+) -> dict[str, int]:
+    """
+    Remove the cached results, so the next requests crawl the pages again.
+
+    The filters are combined, e.g. `article` and `language` only invalidate the results of the
+    article in that language edition of every project.
+    """
+
+    def matches(key: CrawlKey) -> bool:
+        return (
+            (article is None or key.article == article)
+            and (language is None or key.site.language == language)
+            and (site is None or key.site.project == site)
+        )
+
+    if article is None and language is None and site is None:
+        return {"invalidated": results.invalidate()}
+    return {"invalidated": results.invalidate(matches)}
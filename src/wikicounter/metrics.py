@@ -0,0 +1,183 @@
+"""
+Timings of the stages of the requests and counters of the work done, exposed on `/metrics`.
+
+The stages are measured where the work happens, e.g. `with measure(Stage.FETCH): ...`, and added
+to the process-wide `METRICS`. Inside `collect_timings`, they are also added to the timings of the
+current request, which are returned in the `debug_timings` field of the responses.
+
+The timings of a stage are summed over the concurrent tasks of a crawl, so the sum of the stages
+can exceed the wall-clock time of the request.
+"""
+
+import threading
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import StrEnum
+from time import perf_counter
+
+METRICS_PREFIX = "wikicounter_"
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Stage(StrEnum):
+    """Stages of the work done for a request."""
+
+    FETCH = "fetch"
+    """Fetching the pages, from the page cache or the API."""
+
+    LINKS = "links"
+    """Collecting the not yet visited links of the fetched pages."""
+
+    TOKENIZE = "tokenize"
+    """Counting the words of the pages, or reading their cached counts."""
+
+    MERGE = "merge"
+    """Merging the word counts of the pages."""
+
+    FREQUENCY = "frequency"
+    """Building the frequency table from the merged counts."""
+
+    SERIALIZE = "serialize"
+    """Encoding the frequency table of the response."""
+
+
+class MetricCounter(StrEnum):
+    """Counters of the work done by the service."""
+
+    API_REQUESTS = "api_requests"
+    """HTTP requests sent to the MediaWiki API."""
+
+    API_RETRIES = "api_retries"
+    """Retries of the MediaWiki API requests that failed transiently."""
+
+    API_THROTTLED = "api_throttled"
+    """MediaWiki API responses asking to slow down, with HTTP 429, 503 or a `maxlag` error."""
+
+    API_RESPONSE_BYTES = "api_response_bytes"
+    """Size of the MediaWiki API responses."""
+
+    PAGES_FETCHED = "pages_fetched"
+    """Pages downloaded from the MediaWiki API."""
+
+    PAGES_VISITED = "pages_visited"
+    """Pages counted by the crawls, including the cached ones."""
+
+
+@dataclass
+class StageTiming:
+    """Number of measurements and total seconds of a stage."""
+
+    count: int = 0
+    seconds: float = 0.0
+
+
+class Metrics:
+    """Process-wide stage timings and counters."""
+
+    def __init__(self) -> None:
+        """Initializes every stage and counter to zero."""
+        self._lock = threading.Lock()
+        self.stages = {stage: StageTiming() for stage in Stage}
+        self.counters = dict.fromkeys(MetricCounter, 0)
+
+    def observe(self, stage: Stage, seconds: float) -> None:
+        """Adds a measurement of a stage."""
+        with self._lock:
+            timing = self.stages[stage]
+            timing.count += 1
+            timing.seconds += seconds
+
+    def increment(self, counter: MetricCounter, value: int = 1) -> None:
+        """Increments a counter."""
+        with self._lock:
+            self.counters[counter] += value
+
+    def reset(self) -> None:
+        """Sets every stage and counter back to zero."""
+        with self._lock:
+            self.stages = {stage: StageTiming() for stage in Stage}
+            self.counters = dict.fromkeys(MetricCounter, 0)
+
+    def render(self, stats: Mapping[str, object] | None = None) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Args:
+            stats (Mapping[str, object] | None): Statistics dataclasses keyed by the name of their
+                cache, e.g. `CacheStats`, rendered as `wikicounter_cache_<field>{cache="<name>"}`.
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        with self._lock:
+            stages = {stage: StageTiming(t.count, t.seconds) for stage, t in self.stages.items()}
+            counters = dict(self.counters)
+
+        lines = [
+            f"# HELP {METRICS_PREFIX}stage_seconds_total Seconds spent in each stage.",
+            f"# TYPE {METRICS_PREFIX}stage_seconds_total counter",
+            *(
+                f'{METRICS_PREFIX}stage_seconds_total{{stage="{stage}"}} {timing.seconds:.6f}'
+                for stage, timing in stages.items()
+            ),
+            f"# HELP {METRICS_PREFIX}stage_calls_total Number of measurements of each stage.",
+            f"# TYPE {METRICS_PREFIX}stage_calls_total counter",
+            *(
+                f'{METRICS_PREFIX}stage_calls_total{{stage="{stage}"}} {timing.count}'
+                for stage, timing in stages.items()
+            ),
+        ]
+        for counter, value in counters.items():
+            lines.append(f"# TYPE {METRICS_PREFIX}{counter}_total counter")
+            lines.append(f"{METRICS_PREFIX}{counter}_total {value}")
+
+        # Hits only grow, but the entries and size go up and down
+        samples: dict[str, list[str]] = {}
+        for name, cache_stats in (stats or {}).items():
+            for field, value in vars(cache_stats).items():
+                samples.setdefault(field, []).append(
+                    f'{METRICS_PREFIX}cache_{field}{{cache="{name}"}} {value}',
+                )
+        for field, field_samples in samples.items():
+            lines.append(f"# TYPE {METRICS_PREFIX}cache_{field} untyped")
+            lines.extend(field_samples)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+"""The metrics of the process."""
+
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def measure(stage: Stage) -> Iterator[None]:
+    """Measures the wall-clock time of the block as a stage of the current request."""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        METRICS.observe(stage, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage.value] = timings.get(stage.value, 0.0) + elapsed
+
+
+@contextmanager
+def collect_timings() -> Iterator[dict[str, float]]:
+    """
+    Collects the stages measured in the block and in the tasks it starts.
+
+    Yields:
+        dict[str, float]: The seconds spent in each measured stage, filled while the block runs.
+    """
+    timings: dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
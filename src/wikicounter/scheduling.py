@@ -0,0 +1,281 @@
+"""
+Scheduling of the requests sent to the MediaWiki API.
+
+Wikimedia asks API clients to slow down when its servers are busy: with HTTP 429 and 503
+responses, and with `maxlag` errors when the replication lag of its databases exceeds the `maxlag`
+parameter of a request. The requests of the service go through a shared `RequestScheduler`, which
+
+- starts at most `rate` requests per second, in bursts of at most `burst` requests (token bucket),
+- keeps an adaptive number of requests in flight: halved when the API throttles, lowered by one
+  per window of requests slower than twice the fastest observed latency, raised by one per window
+  of faster requests,
+- holds back every request until the `Retry-After` of a throttled response has passed,
+- retries throttled responses, server errors and transport errors with jittered exponential
+  backoff,
+- starts the waiting requests in order of priority, e.g. the pages near the start of a crawl
+  before its deep frontier, see `request_priority`.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import random
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from time import monotonic
+
+import httpx
+
+from wikicounter.metrics import METRICS, MetricCounter
+
+DEFAULT_RATE = 50.0
+"""Default number of requests started per second."""
+
+DEFAULT_MAX_IN_FLIGHT = 20
+"""Default maximum number of requests in flight."""
+
+DEFAULT_MAX_RETRIES = 3
+"""Default number of times a failed request is retried."""
+
+BACKGROUND_PRIORITY = 1_000
+"""Priority of the requests no client is waiting for, e.g. the refresh of the page cache."""
+
+THROTTLE_STATUS_CODES = frozenset({429, 503})
+"""Status codes of the responses asking the client to slow down."""
+
+RETRY_STATUS_CODES = frozenset({*THROTTLE_STATUS_CODES, 500, 502, 504})
+"""Status codes of the responses that are retried."""
+
+MAXLAG_ERROR = "maxlag"
+"""Error code of the MediaWiki API when its replication lag exceeds the `maxlag` parameter."""
+
+LATENCY_TOLERANCE = 2.0
+"""Ratio of the smoothed latency to the fastest one above which the concurrency is lowered."""
+
+FASTEST_LATENCY_DECAY = 1.001
+"""Growth of the fastest latency per response, so that it follows a lasting change."""
+
+_priority: ContextVar[int] = ContextVar("request_priority", default=0)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """
+    Sends the requests of the block, and of the tasks it starts, with a priority.
+
+    Args:
+        priority (int): Waiting requests with a lower priority are started first, e.g. the depth
+            of the pages in a crawl. Requests outside of the block have the priority 0.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Returns the priority of the requests sent from the current context."""
+    return _priority.get()
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Returns the seconds to wait given by the `Retry-After` header of a response, if any."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    with contextlib.suppress(ValueError):
+        return max(0.0, float(value))
+    # Naive dates cannot be compared to the current time, they are ignored
+    with contextlib.suppress(TypeError, ValueError):
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    return None
+
+
+def is_throttled(response: httpx.Response) -> bool:
+    """Returns whether the response asks the client to slow down."""
+    return (
+        response.status_code in THROTTLE_STATUS_CODES
+        or response.headers.get("MediaWiki-API-Error") == MAXLAG_ERROR
+    )
+
+
+class RequestScheduler:
+    """
+    Rate limiter, adaptive concurrency limiter and retry loop of the requests to an API.
+
+    A scheduler is meant to be shared by every client of the process talking to the same API. It
+    is not thread-safe, the requests must be sent from the same event loop.
+    """
+
+    def __init__(
+        self,
+        rate: float | None = DEFAULT_RATE,
+        *,
+        burst: int | None = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ) -> None:
+        """
+        Initializes the scheduler with a full token bucket and the maximum concurrency.
+
+        Args:
+            rate (float | None): Requests started per second, unlimited if None.
+            burst (int | None): Requests that can be started at once after an idle period.
+                Defaults to one second worth of requests.
+            max_in_flight (int): Maximum number of requests in flight.
+            max_retries (int): Number of times a failed request is retried.
+            backoff (float): Seconds of the first retry delay, doubled for every further retry.
+                The delays are drawn uniformly up to this bound.
+            max_backoff (float): Upper bound of the retry delays in seconds.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, round(rate or 1))
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limit = float(max_in_flight)
+        self.in_flight = 0
+        self.latency: float | None = None
+        self._fastest_latency = float("inf")
+        self._tokens = float(self.burst)
+        self._refilled_at = monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def send(self, request: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Sends a request when its turn comes, and retries it while it fails transiently.
+
+        Args:
+            request (Callable[[], Awaitable[httpx.Response]]): Sends the request, called again for
+                every retry.
+
+        Returns:
+            httpx.Response: The first response that is not retried, or the last one when the
+                retries are used up.
+
+        Raises:
+            httpx.TransportError: If the last attempt could not get a response.
+        """
+        priority = current_priority()
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            try:
+                start = monotonic()
+                response = await request()
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if not self._adapt(response, monotonic() - start) or attempt >= self.max_retries:
+                    return response
+            finally:
+                self._release()
+            METRICS.increment(MetricCounter.API_RETRIES)
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _adapt(self, response: httpx.Response, latency: float) -> bool:
+        """Adapts the concurrency to a response, and returns whether it should be retried."""
+        if is_throttled(response):
+            METRICS.increment(MetricCounter.API_THROTTLED)
+            self.limit = max(1.0, self.limit / 2)
+            pause = retry_after(response)
+            if pause is not None:
+                self._paused_until = max(self._paused_until, monotonic() + pause)
+            return True
+        if response.status_code in RETRY_STATUS_CODES:
+            return True
+
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        self._fastest_latency = min(self._fastest_latency * FASTEST_LATENCY_DECAY, latency)
+        # Changes by one per window of `limit` responses
+        if self.latency > self._fastest_latency * LATENCY_TOLERANCE:
+            self.limit = max(1.0, self.limit - 1 / self.limit)
+        else:
+            self.limit = min(float(self.max_in_flight), self.limit + 1 / self.limit)
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        """Returns a random delay before a retry, the bound doubling with every attempt."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))  # noqa: S311
+
+    async def _acquire(self, priority: int) -> None:
+        """Waits until the request can be started, then takes its place among those in flight."""
+        if not self._waiters and self._can_start():
+            self._start()
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Started just before being cancelled, the place goes to the next request
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        """Frees the place of a finished request for the next waiting one."""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _can_start(self) -> bool:
+        """Returns whether a request can be started now."""
+        return self.in_flight < max(1, int(self.limit)) and self._wait_time() == 0
+
+    def _start(self) -> None:
+        """Takes a token and a place in flight for a request."""
+        self._tokens -= 1
+        self.in_flight += 1
+
+    def _wait_time(self) -> float:
+        """Refills the token bucket, and returns the seconds until a request can be started."""
+        now = monotonic()
+        wait = self._paused_until - now
+        if self.rate is None:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(
+                float(self.burst),
+                self._tokens + (now - self._refilled_at) * self.rate,
+            )
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        self._refilled_at = now
+        return max(0.0, wait)
+
+    def _dispatch(self) -> None:
+        """Starts the waiting requests in order of priority while they can be started."""
+        while self._waiters:
+            _priority, _sequence, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= max(1, int(self.limit)):
+                # A finished request dispatches again
+                return
+            wait = self._wait_time()
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+            heapq.heappop(self._waiters)
+            self._start()
+            future.set_result(None)
+
+    def _on_timer(self) -> None:
+        """Dispatches the waiting requests once the tokens or the pause allow it."""
+        self._timer = None
+        self._dispatch()
@@ -0,0 +1,199 @@
+"""
+Runtime settings of the wikicounter service.
+
+Every setting can be overridden with an environment variable named after the field with a
+`WIKICOUNTER_` prefix, e.g. `WIKICOUNTER_PAGE_CACHE_TTL=600`.
+"""
+
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Self
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from wikicounter.wiki_connection import API_URL_TEMPLATE
+
+ENV_PREFIX = "WIKICOUNTER_"
+
+
+class Settings(BaseModel):
+    """Settings of the service, read from the environment on startup."""
+
+    model_config = ConfigDict(frozen=True)
+
+    api_url: str = Field(
+        default=API_URL_TEMPLATE,
+        description=(
+            "URL of the `api.php` endpoint of the wikis, the `{language}` and `{project}`"
+            " placeholders are replaced with those of the requested site"
+        ),
+    )
+    max_sites: int = Field(
+        default=16,
+        ge=1,
+        description="Number of language editions and projects served, each with its own clients and caches",
+    )
+    api_rate_limit: float = Field(
+        default=50,
+        gt=0,
+        description="Requests per second sent to the MediaWiki API, in bursts of a second worth",
+    )
+    api_max_concurrency: int = Field(
+        default=20,
+        ge=1,
+        description="Maximum number of concurrent API requests, lowered while the API throttles",
+    )
+    api_max_retries: int = Field(
+        default=3,
+        ge=0,
+        description="Number of retries of the API requests failing with a throttling or server error",
+    )
+    api_maxlag: int | None = Field(
+        default=5,
+        ge=0,
+        description="Database lag in seconds above which the API asks to retry later, not sent when not set",
+    )
+    max_concurrency: int = Field(
+        default=8,
+        ge=1,
+        description="Number of page batches fetched concurrently by a single crawl",
+    )
+    page_cache_size: int = Field(
+        default=2048,
+        ge=0,
+        description="Number of pages kept in the in-memory LRU cache, 0 disables it",
+    )
+    page_cache_path: Path | None = Field(
+        default=None,
+        description="Path of the SQLite page cache, no disk cache is used when not set",
+    )
+    link_graph_path: Path | None = Field(
+        default=None,
+        description="Path of the SQLite link graph, it is kept in memory when not set",
+    )
+    page_cache_ttl: float = Field(
+        default=3600,
+        ge=0,
+        description="Seconds a cached page is served without checking its latest revision",
+    )
+    page_cache_refresh_interval: float | None = Field(
+        default=None,
+        gt=0,
+        description="Seconds between background revalidations of the cached pages, off when not set",
+    )
+    warmup_articles: tuple[str, ...] = Field(
+        default=(),
+        description=(
+            "Articles of the default wiki fetched and counted in the background on startup,"
+            " separated by `|` in the environment variable"
+        ),
+    )
+
+    tokenizer_workers: int = Field(
+        default=0,
+        ge=0,
+        description="Number of processes counting the words of large pages, 0 counts in-process",
+    )
+    tokenizer_min_text_size: int = Field(
+        default=32_768,
+        ge=0,
+        description="Text length from which a page is counted in a tokenizer process",
+    )
+    compact_counts: bool = Field(
+        default=False,
+        description="Merge the counts of the crawls into arrays of the ids of a shared vocabulary",
+    )
+    vocabulary_size: int = Field(
+        default=1_000_000,
+        ge=0,
+        description="Maximum number of words of the shared vocabulary, the others are counted by word",
+    )
+    approximate_error: float = Field(
+        default=0.001,
+        gt=0,
+        lt=1,
+        description="Share of the total word count the approximate counts can exceed the exact ones by",
+    )
+    approximate_confidence: float = Field(
+        default=0.99,
+        gt=0,
+        lt=1,
+        description="Probability that the approximate counts stay within the error",
+    )
+    approximate_top_words: int = Field(
+        default=1000,
+        ge=1,
+        description="Number of most frequent words tracked by the approximate counting",
+    )
+    result_cache_size: int = Field(
+        default=64 * 1024 * 1024,
+        ge=0,
+        description="Maximum estimated size of the cached results in bytes, 0 disables the cache",
+    )
+    result_cache_ttl: float = Field(
+        default=300,
+        ge=0,
+        description="Seconds a finished result is served to identical requests",
+    )
+    max_pages: int | None = Field(
+        default=None,
+        ge=1,
+        description="Maximum number of pages visited by a single crawl, unlimited when not set",
+    )
+    max_bytes: int | None = Field(
+        default=None,
+        ge=1,
+        description="Maximum size of the page texts visited by a single crawl, unlimited when not set",
+    )
+    crawl_timeout: float | None = Field(
+        default=None,
+        gt=0,
+        description="Seconds after which a crawl returns its partial result, unlimited when not set",
+    )
+    jobs_path: Path | None = Field(
+        default=None,
+        description="Directory of the crawl job checkpoints, the jobs are lost on restart when not set",
+    )
+    job_workers: int = Field(
+        default=2,
+        ge=1,
+        description="Number of crawl jobs running at the same time",
+    )
+    max_jobs: int = Field(
+        default=100,
+        ge=1,
+        description="Number of crawl jobs kept, the oldest finished ones are forgotten first",
+    )
+    job_checkpoint_interval: float = Field(
+        default=10,
+        gt=0,
+        description="Seconds between two checkpoints of a running crawl job",
+    )
+
+    @field_validator("warmup_articles", mode="before")
+    @classmethod
+    def _split_titles(cls, value: object) -> object:
+        """Splits `|` separated titles, the separator of the MediaWiki API, which titles cannot contain."""
+        if isinstance(value, str):
+            return tuple(title.strip() for title in value.split("|") if title.strip())
+        return value
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> Self:
+        """
+        Creates the settings from `WIKICOUNTER_` prefixed environment variables.
+
+        Args:
+            environ (Mapping[str, str]): The environment to read the variables from.
+
+        Returns:
+            Settings: The settings, with defaults for the variables that are not set.
+        """
+        return cls.model_validate(
+            {
+                name: environ[f"{ENV_PREFIX}{name.upper()}"]
+                for name in cls.model_fields
+                if f"{ENV_PREFIX}{name.upper()}" in environ
+            },
+        )
@@ -0,0 +1,234 @@
+"""
+Pool of the wikis served by the service, one language edition of a Wikimedia project each.
+
+The clients of a site are only created when the site is first requested: its `WikiClient`, with
+the connection pool of that site, its page cache, its link graph and its page refresher, so a
+process starts without paying for the sites nobody requested. Every site sends its requests through
+the single `RequestScheduler` of the pool, so the rate limit holds for the whole process.
+Titles only identify pages within a site, so every site has a cache
+namespace of its own: separate in-memory caches, and separate files next to the configured cache
+and link graph paths.
+"""
+
+import asyncio
+import contextlib
+import logging
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import NamedTuple
+
+import httpx
+
+from wikicounter.cache import (
+    CacheStats,
+    CachingPageSource,
+    PageCache,
+    PageRefresher,
+    create_page_cache,
+)
+from wikicounter.link_graph import LinkGraph
+from wikicounter.scheduling import RequestScheduler
+from wikicounter.settings import Settings
+from wikicounter.tokenization import ProcessTokenizer
+from wikicounter.wiki_connection import WikiApiError, WikiClient
+
+DEFAULT_LANGUAGE = "en"
+
+LANGUAGE_PATTERN = r"^[a-z][a-z0-9-]{1,15}$"
+"""Language codes of the editions, e.g. `en`, `de` or `zh-min-nan`, part of the API host name."""
+
+_logger = logging.getLogger(__name__)
+
+
+class WikiProject(StrEnum):
+    """Wikimedia projects with language editions."""
+
+    WIKIPEDIA = "wikipedia"
+    WIKTIONARY = "wiktionary"
+    WIKIBOOKS = "wikibooks"
+    WIKINEWS = "wikinews"
+    WIKIQUOTE = "wikiquote"
+    WIKISOURCE = "wikisource"
+    WIKIVERSITY = "wikiversity"
+    WIKIVOYAGE = "wikivoyage"
+
+
+class Site(NamedTuple):
+    """A language edition of a Wikimedia project."""
+
+    language: str = DEFAULT_LANGUAGE
+    project: WikiProject = WikiProject.WIKIPEDIA
+
+    def __str__(self) -> str:
+        """Returns the name of the site, e.g. `en.wikipedia`."""
+        return f"{self.language}.{self.project}"
+
+
+DEFAULT_SITE = Site()
+"""The English Wikipedia."""
+
+
+class SiteLimitError(Exception):
+    """Raised when a new site is requested while the pool holds the maximum number of sites."""
+
+
+@dataclass
+class SiteClients:
+    """The client, caches and background tasks of a site."""
+
+    site: Site
+    client: WikiClient
+    page_cache: PageCache
+    page_source: CachingPageSource
+    link_graph: LinkGraph
+    refresher: PageRefresher | None = None
+    warmup: asyncio.Task[None] | None = None
+
+
+class SitePool:
+    """
+    Creates the clients of the sites on their first request, and keeps them until closed.
+
+    The clients are created and shared from the running event loop, call `aclose` when done. A
+    site is opened without awaiting, so concurrent first requests of a site share its clients.
+    """
+
+    def __init__(self, settings: Settings, tokenizer: ProcessTokenizer | None = None) -> None:
+        """
+        Initializes the pool without any site.
+
+        Args:
+            settings (Settings): The settings every site is configured with. The `{language}` and
+                `{project}` placeholders of `api_url` are replaced with those of the site.
+            tokenizer (ProcessTokenizer | None): Counts the words of the pages of every site.
+        """
+        self.settings = settings
+        self.tokenizer = tokenizer
+        # Shared by every site: the Wikimedia sites are served by the same infrastructure
+        self.scheduler = RequestScheduler(
+            settings.api_rate_limit,
+            max_in_flight=settings.api_max_concurrency,
+            max_retries=settings.api_max_retries,
+        )
+        self._sites: dict[Site, SiteClients] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of opened sites."""
+        return len(self._sites)
+
+    def get(self, site: Site) -> SiteClients:
+        """
+        Returns the clients of a site, creating them on the first request of the site.
+
+        Raises:
+            SiteLimitError: If the site is new and `max_sites` sites are open already.
+            ValueError: If the language code is invalid.
+            RuntimeError: If called outside of the running event loop.
+        """
+        # Outside of the loop, two first requests of a site could both open it
+        asyncio.get_running_loop()
+        clients = self._sites.get(site)
+        if clients is not None:
+            return clients
+        if len(self._sites) >= self.settings.max_sites:
+            msg = f"At most {self.settings.max_sites} sites are served, cannot open {site}"
+            raise SiteLimitError(msg)
+        if not re.match(LANGUAGE_PATTERN, site.language):
+            msg = f"Invalid language code '{site.language}'"
+            raise ValueError(msg)
+
+        clients = self._open(site)
+        self._sites[site] = clients
+        return clients
+
+    def page_stats(self) -> tuple[CacheStats, CacheStats]:
+        """Returns the statistics of the page and word count caches, summed over the sites."""
+        pages, word_counts = CacheStats(), CacheStats()
+        for clients in self._sites.values():
+            for total, stats in (
+                (pages, clients.page_source.stats),
+                (word_counts, clients.page_source.counts_stats),
+            ):
+                for name, value in vars(stats).items():
+                    setattr(total, name, getattr(total, name) + value)
+        return pages, word_counts
+
+    def warm_up(self, site: Site, titles: Iterable[str]) -> None:
+        """
+        Fetches and counts pages of a site in the background, e.g. its most requested articles.
+
+        The crawls requesting the pages before they are cached join the fetches in flight.
+
+        Raises:
+            SiteLimitError: If the site is new and `max_sites` sites are open already.
+            ValueError: If the language code is invalid.
+        """
+        clients = self.get(site)
+        clients.warmup = asyncio.ensure_future(_warm_up(clients, list(titles)))
+
+    async def aclose(self) -> None:
+        """Stops the background tasks and closes the clients and caches of every site."""
+        sites, self._sites = self._sites, {}
+        for clients in sites.values():
+            if clients.warmup is not None:
+                clients.warmup.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await clients.warmup
+            if clients.refresher is not None:
+                await clients.refresher.aclose()
+            await clients.client.aclose()
+            await clients.page_source.flush()
+            clients.page_cache.close()
+            await clients.link_graph.flush()
+            clients.link_graph.close()
+
+    def _open(self, site: Site) -> SiteClients:
+        """Creates the clients of a site."""
+        settings = self.settings
+        client = WikiClient(
+            settings.api_url.format(language=site.language, project=site.project),
+            max_connections=settings.api_max_concurrency,
+            scheduler=self.scheduler,
+            maxlag=settings.api_maxlag,
+        )
+        page_cache = create_page_cache(
+            settings.page_cache_size,
+            site_path(settings.page_cache_path, site),
+        )
+        page_source = CachingPageSource(
+            client,
+            page_cache,
+            settings.page_cache_ttl,
+            self.tokenizer,
+        )
+        link_graph = LinkGraph(site_path(settings.link_graph_path, site) or ":memory:")
+        refresher = None
+        if settings.page_cache_refresh_interval is not None:
+            refresher = PageRefresher(page_source, settings.page_cache_refresh_interval)
+            refresher.start()
+        return SiteClients(site, client, page_cache, page_source, link_graph, refresher)
+
+
+async def _warm_up(clients: SiteClients, titles: list[str]) -> None:
+    """Fetches pages into the cache of a site, with their word counts and links."""
+    page_source = clients.page_source
+    try:
+        pages = await page_source.get_pages_content(titles)
+        await asyncio.gather(
+            *(page_source.count_page(title, page) for title, page in pages.items()),
+        )
+    except (WikiApiError, httpx.HTTPError):
+        _logger.exception("Warming up the cache of %s failed", clients.site)
+        return
+    clients.link_graph.update(pages)
+    _logger.info("Warmed up the cache of %s with %d pages", clients.site, len(pages))
+
+
+def site_path(path: Path | None, site: Site) -> Path | None:
+    """Returns the path of the file of a site, e.g. `pages.en.wikipedia.sqlite` for `pages.sqlite`."""
+    if path is None:
+        return None
+    return path.with_name(f"{path.stem}.{site}{path.suffix}")
@@ -0,0 +1,114 @@
+"""
+Streaming of crawl progress and results as newline-delimited JSON (NDJSON).
+
+Instead of holding back the response until the whole crawl is finished, every counted page is
+reported as soon as it is merged, then the frequency table is sent in chunks. Every line is a
+JSON object with an `event` field:
+
+- `page`: a page was counted, with the running totals of the crawl
+- `word_frequency`: a chunk of the frequency table, ordered from the most frequent word
+- `done`: the crawl is finished, with the same metadata as the non-streaming responses
+- `error`: the crawl failed, the stream ends after this event
+"""
+
+import logging
+from collections import Counter
+from collections.abc import AsyncIterator, Iterable
+from itertools import islice
+from time import time
+from typing import Any
+
+import httpx
+import orjson
+
+from wikicounter.counting import create_frequency_dict, remove_words
+from wikicounter.metrics import Stage, measure
+from wikicounter.serialization import OutputFormat, encode_word_frequency
+from wikicounter.wiki_connection import CrawlBudget, PageVisit, WikiApiError
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+STREAM_CHUNK_SIZE = 1000
+"""Number of words sent in a single `word_frequency` event."""
+
+_logger = logging.getLogger(__name__)
+
+
+async def stream_word_frequency(  # noqa: PLR0913
+    pages: AsyncIterator[PageVisit],
+    *,
+    start_article: str,
+    max_depth: int,
+    ignore_words: Iterable[str] | None = None,
+    percentile: float = 0,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    output_format: OutputFormat = OutputFormat.DICT,
+    budget: CrawlBudget | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Merges the counted pages of a crawl and streams the progress and the result as NDJSON.
+
+    Args:
+        pages (AsyncIterator[PageVisit]): The pages of the crawl, e.g. from `iter_pages`.
+        start_article (str): Title of the Wikipedia article the crawl started from.
+        max_depth (int): The maximum depth of the crawl.
+        ignore_words (Iterable[str] | None): Words to leave out of the totals and the result.
+        percentile (float): Only include words in the top X percentile by frequency.
+        chunk_size (int): Number of words sent in a single `word_frequency` event.
+        output_format (OutputFormat): The layout of the `word_frequency` chunks.
+        budget (CrawlBudget | None): The budget the pages are crawled with, to report whether the
+            crawl was truncated.
+
+    Yields:
+        bytes: One encoded JSON line per event.
+    """
+    start_time = time()
+    ignored = frozenset(ignore_words or ())
+    word_counter: Counter = Counter()
+    pages_visited = 0
+    total_words = 0
+
+    try:
+        async for visit in pages:
+            with measure(Stage.MERGE):
+                word_counter.update(visit.word_counts)
+            pages_visited += 1
+            page_words = visit.word_counts.total() - sum(visit.word_counts[w] for w in ignored)
+            total_words += page_words
+            yield _encode_event(
+                "page",
+                title=visit.title,
+                depth=visit.depth,
+                page_words=page_words,
+                pages_visited=pages_visited,
+                total_words=total_words,
+                unique_words=len(word_counter) - len(ignored.intersection(word_counter)),
+            )
+    except (WikiApiError, httpx.HTTPError) as error:
+        _logger.exception("Streamed crawl of '%s' failed", start_article)
+        yield _encode_event("error", detail=str(error))
+        return
+
+    with measure(Stage.FREQUENCY):
+        frequency_dict = create_frequency_dict(remove_words(word_counter, ignored), percentile)
+    words = iter(frequency_dict.items())
+    while chunk := dict(islice(words, chunk_size)):
+        yield _encode_event(
+            "word_frequency",
+            word_frequency=encode_word_frequency(chunk, output_format),
+        )
+
+    yield _encode_event(
+        "done",
+        start_article=start_article,
+        max_depth=max_depth,
+        pages_visited=pages_visited,
+        total_words=total_words,
+        truncated=budget is not None and budget.truncated,
+        time_elapsed=round(time() - start_time, 2),
+    )
+
+
+def _encode_event(event: str, **fields: Any) -> bytes:  # noqa: ANN401
+    """Encodes an event as a single NDJSON line."""
+    return orjson.dumps({"event": event, **fields}, option=orjson.OPT_APPEND_NEWLINE)
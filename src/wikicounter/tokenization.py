@@ -0,0 +1,70 @@
+"""
+Counting of page words in worker processes.
+
+Counting the words of a large page holds the GIL for milliseconds, during which the event loop
+can neither fetch other pages nor serve other requests. `ProcessTokenizer` sends the texts of
+large pages to a pool of worker processes and counts small pages in-process, where sending the
+text and the counts between the processes would cost more than counting them.
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from typing import TYPE_CHECKING
+
+from wikicounter.counting import count_words
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+PROCESS_MIN_TEXT_SIZE = 32_768
+"""Text length from which a page is counted in a worker process."""
+
+_logger = logging.getLogger(__name__)
+
+
+class ProcessTokenizer:
+    """Counts the words of large texts in a process pool and of small texts in-process."""
+
+    def __init__(self, workers: int, min_text_size: int = PROCESS_MIN_TEXT_SIZE) -> None:
+        """
+        Starts the worker processes.
+
+        Args:
+            workers (int): The number of worker processes, 0 counts every text in-process.
+            min_text_size (int): Text length from which a text is counted in a worker process.
+        """
+        self.workers = workers
+        self.min_text_size = min_text_size
+        self._executor: ProcessPoolExecutor | None = None
+        if workers > 0:
+            # Imported on demand, the in-process default does not pay for the process machinery
+            import concurrent.futures  # noqa: PLC0415
+            import multiprocessing  # noqa: PLC0415
+
+            # Forking a process running an event loop and threads is unsafe
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _logger.info("Started %d tokenizer processes", workers)
+
+    async def count(self, text: str) -> Counter:
+        """
+        Counts the words of a text, see `count_words`.
+
+        Args:
+            text (str): The text to count the words of.
+
+        Returns:
+            Counter: The word counts of the text.
+        """
+        if self._executor is None or len(text) < self.min_text_size:
+            return count_words(text)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, count_words, text)
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -1,22 +1,58 @@
 """
-
 Module to connect to a wikipedia API and retrieve page content.
 
-`Wikipedia-API <https://pypi.org/project/wikipedia-api/>`_ is used to connect to the MediaWiki API.
+The `MediaWiki action API <https://www.mediawiki.org/wiki/API:Main_page>`_ is queried directly
+with a pooled, HTTP/2-capable `httpx <https://www.python-httpx.org/>`_ client, so pages can be
+fetched concurrently from the event loop.
 """
 
+import asyncio
 import logging
 from collections import Counter
-from collections.abc import Iterable
-from typing import NamedTuple
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from functools import partial
+from time import monotonic
+from types import TracebackType
+from typing import Any, NamedTuple, Protocol, Self
+
+import httpx
+
+from wikicounter.counting import (
+    ApproximateCounter,
+    Approximation,
+    Vocabulary,
+    VocabularyCounter,
+    WordCounts,
+    count_words,
+    remove_words,
+)
+from wikicounter.metrics import METRICS, MetricCounter, Stage, measure
+from wikicounter.scheduling import RequestScheduler, request_priority
+from wikicounter.wikitext import link_prefixes, wikitext_to_text
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+API_URL_TEMPLATE = "https://{language}.{project}.org/w/api.php"
+"""URL of the API of a language edition of a Wikimedia project."""
+USER_AGENT = "WikiCounterBot (peter@mizsak.hu)"
+
+DEFAULT_MAX_CONCURRENCY = 8
+"""Default number of pages fetched concurrently while walking the link graph."""
+
+DEFAULT_MAX_CONNECTIONS = 20
+"""Default size of the HTTP connection pool of a WikiClient."""
+
+MAX_TITLES_PER_QUERY = 50
+"""Maximum number of titles the MediaWiki API accepts in a single query."""
 
-from wikipediaapi import Wikipedia
+DEFAULT_MAXLAG = 5
+"""Default replication lag of the wiki databases in seconds above which the API asks to wait."""
 
-from wikicounter.counting import count_words
+_logger = logging.getLogger(__name__)
 
-wiki_wiki = Wikipedia(user_agent="WikiCounterBot (peter@mizsak.hu)", language="en")
 
-__logger = logging.getLogger(__name__)
+class WikiApiError(Exception):
+    """Raised when the MediaWiki API answers with an error."""
 
 
 class PageContent(NamedTuple):
@@ -24,72 +60,639 @@ class PageContent(NamedTuple):
 
     page_text: str
     links: list[str]
+    revision_id: int = 0
+
+
+class PageSource(Protocol):
+    """Anything the pages of a crawl can be fetched from."""
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        """Fetches the content of several pages, keyed by the requested titles."""
+        ...
+
+
+class LinkIndex(Protocol):
+    """Store of the known outgoing links of the pages, e.g. `LinkGraph`."""
+
+    async def get_links(self, titles: Iterable[str]) -> dict[str, list[str]]:
+        """Returns the known links of the pages, keyed by their title."""
+        ...
+
+    def update(self, pages: Mapping[str, PageContent]) -> None:
+        """Stores the links of fetched pages, without waiting for them to be written."""
+        ...
+
+
+class WikiClient:
+    """
+    Asynchronous client for the MediaWiki action API.
+
+    The client keeps a pool of keep-alive (HTTP/2 when available) connections, so it should be
+    created once and shared. Use it as an async context manager or call `aclose` when done.
+
+    Every request goes through a `RequestScheduler`, which limits the request rate, backs off when
+    the API is throttling and retries the transient failures.
+    """
+
+    def __init__(
+        self,
+        api_url: str = API_URL,
+        *,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float = 10.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+        scheduler: RequestScheduler | None = None,
+        maxlag: int | None = DEFAULT_MAXLAG,
+    ) -> None:
+        """
+        Initializes the client and its connection pool.
+
+        Args:
+            api_url (str): URL of the `api.php` endpoint of the wiki.
+            max_connections (int): Maximum number of pooled connections.
+            timeout (float): Timeout of a single HTTP request in seconds.
+            transport (httpx.AsyncBaseTransport | None): Custom transport, mainly for testing.
+            scheduler (RequestScheduler | None): Scheduler shared with the other clients of the
+                process. Defaults to a scheduler of its own with the default limits.
+            maxlag (int | None): Seconds of replication lag above which the API asks the client to
+                wait instead of answering, not sent if None.
+        """
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.maxlag = maxlag
+        self._link_prefixes: frozenset[str] | None = None
+        self._siteinfo_lock = asyncio.Lock()
+        self._http = httpx.AsyncClient(
+            base_url=api_url,
+            headers={"User-Agent": USER_AGENT},
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> Self:
+        """Enter the async context."""
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the connection pool when leaving the async context."""
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Closes the underlying connection pool."""
+        await self._http.aclose()
+
+    async def get_page_content(self, page_title: str) -> PageContent:
+        """
+        Fetches the content of a Wikipedia page by its title.
+
+        Args:
+            page_title (str): The title of the Wikipedia page.
+
+        Returns:
+            PageContent: A named tuple containing the page content and a list of links found on the page.
+        """
+        return (await self.get_pages_content([page_title]))[page_title]
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        """
+        Fetches the content of several Wikipedia pages with as few API calls as possible.
+
+        The titles are queried in batches of `MAX_TITLES_PER_QUERY`, requesting the wikitext and
+        the links of every page of a batch in the same query, see `_get_batch_content`. The
+        batches run concurrently, bounded by the scheduler.
+
+        Args:
+            page_titles (Iterable[str]): The titles of the Wikipedia pages.
+
+        Returns:
+            dict[str, PageContent]: The content of every requested page, keyed by the requested title.
+        """
+        batches = await asyncio.gather(
+            *(self._get_batch_content(batch) for batch in batched(dict.fromkeys(page_titles))),
+        )
+        contents = {title: content for batch in batches for title, content in batch.items()}
+        METRICS.increment(MetricCounter.PAGES_FETCHED, len(contents))
+        return contents
+
+    async def get_revision_ids(self, page_titles: Iterable[str]) -> dict[str, int]:
+        """
+        Fetches the id of the latest revision of several Wikipedia pages.
+
+        This is much cheaper than fetching the pages, so it is used to revalidate cached content.
+
+        Args:
+            page_titles (Iterable[str]): The titles of the Wikipedia pages.
+
+        Returns:
+            dict[str, int]: The latest revision id keyed by the requested title, 0 for missing pages.
+        """
+        batches = await asyncio.gather(
+            *(self._get_batch_revision_ids(batch) for batch in batched(dict.fromkeys(page_titles))),
+        )
+        return {title: revision for batch in batches for title, revision in batch.items()}
+
+    async def _get_batch_content(self, page_titles: list[str]) -> dict[str, PageContent]:
+        """
+        Fetches the text and links of at most `MAX_TITLES_PER_QUERY` pages.
+
+        The wikitext, links and revisions of the whole batch come from one query and its
+        continuations. TextExtracts only returns one full-page extract per response, so the
+        wikitext is converted into plain text instead, from a worker thread.
+        """
+        prefixes = await self._get_link_prefixes()
+        aliases, links, revisions, wikitexts = await self._get_batch_pages(page_titles)
+        texts = await asyncio.to_thread(
+            lambda: {title: wikitext_to_text(text, prefixes) for title, text in wikitexts.items()},
+        )
+
+        contents = {}
+        for requested_title in page_titles:
+            title = _resolve_title(requested_title, aliases)
+            if title not in links:
+                _logger.warning("Page '%s' does not exist or is not unique.", requested_title)
+                contents[requested_title] = PageContent("", [])
+                continue
+            contents[requested_title] = PageContent(
+                texts.get(title, ""),
+                links[title],
+                revisions[title],
+            )
+        return contents
+
+    async def _get_batch_pages(
+        self,
+        page_titles: list[str],
+    ) -> tuple[dict[str, str], dict[str, list[str]], dict[str, int], dict[str, str]]:
+        """Fetches the title aliases, and the links, revision ids and wikitext of the existing pages."""
+        aliases: dict[str, str] = {}
+        links: dict[str, list[str]] = {}
+        revisions: dict[str, int] = {}
+        wikitexts: dict[str, str] = {}
+
+        async for query in self._query(
+            prop="links|info|revisions",
+            plnamespace=0,
+            pllimit="max",
+            rvprop="ids|content",
+            rvslots="main",
+            titles="|".join(page_titles),
+        ):
+            for alias in (*query.get("normalized", []), *query.get("redirects", [])):
+                aliases[alias["from"]] = alias["to"]
+            for page in query.get("pages", []):
+                if page.get("missing") or page.get("invalid"):
+                    continue
+                title = page["title"]
+                # Only keep links where namespace == 0 (wikipedia articles)
+                links.setdefault(title, []).extend(
+                    link["title"] for link in page.get("links", []) if link["ns"] == 0
+                )
+                for revision in page.get("revisions", []):
+                    wikitexts[title] = revision["slots"]["main"].get("content", "")
+                    revisions[title] = revision["revid"]
+                # The revision of the text wins, the page may be edited between continuations
+                if title not in wikitexts:
+                    revisions[title] = page.get("lastrevid", revisions.get(title, 0))
+        return aliases, links, revisions, wikitexts
+
+    async def _get_link_prefixes(self) -> frozenset[str]:
+        """Returns the prefixes of the links to the other namespaces of the wiki, fetched once."""
+        async with self._siteinfo_lock:
+            if self._link_prefixes is None:
+                names: list[str] = []
+                async for query in self._query(
+                    meta="siteinfo",
+                    siprop="namespaces|namespacealiases",
+                ):
+                    for namespace in query.get("namespaces", {}).values():
+                        if namespace["id"] != 0:
+                            names.extend((namespace["name"], namespace.get("canonical", "")))
+                    names.extend(alias["alias"] for alias in query.get("namespacealiases", []))
+                self._link_prefixes = link_prefixes(name for name in names if name)
+        return self._link_prefixes
+
+    async def _get_batch_revision_ids(self, page_titles: list[str]) -> dict[str, int]:
+        """Fetches the latest revision id of at most `MAX_TITLES_PER_QUERY` pages."""
+        aliases: dict[str, str] = {}
+        revisions: dict[str, int] = {}
+
+        async for query in self._query(prop="info", titles="|".join(page_titles)):
+            for alias in (*query.get("normalized", []), *query.get("redirects", [])):
+                aliases[alias["from"]] = alias["to"]
+            for page in query.get("pages", []):
+                if not (page.get("missing") or page.get("invalid")):
+                    revisions[page["title"]] = page.get("lastrevid", 0)
+
+        return {
+            requested_title: revisions.get(_resolve_title(requested_title, aliases), 0)
+            for requested_title in page_titles
+        }
+
+    async def _query(self, **params: Any) -> AsyncIterator[dict[str, Any]]:  # noqa: ANN401
+        """
+        Runs an `action=query` request and follows its continuations.
+
+        Args:
+            **params (Any): The query parameters, e.g. `prop` and `titles`.
+
+        Yields:
+            dict[str, Any]: The `query` object of every response.
+
+        Raises:
+            WikiApiError: If the API returns an error object, e.g. when it is still lagging after
+                the retries of the scheduler.
+        """
+        request_params = {
+            "action": "query",
+            "format": "json",
+            "formatversion": 2,
+            "redirects": 1,
+            **params,
+        }
+        if self.maxlag is not None:
+            request_params["maxlag"] = self.maxlag
+        continue_params: dict[str, Any] = {}
+        while True:
+            response = await self.scheduler.send(
+                partial(self._http.get, "", params={**request_params, **continue_params}),
+            )
+            METRICS.increment(MetricCounter.API_REQUESTS)
+            METRICS.increment(MetricCounter.API_RESPONSE_BYTES, len(response.content))
+            response.raise_for_status()
+            data = response.json()
+
+            if "error" in data:
+                raise WikiApiError(data["error"].get("info", "Unknown MediaWiki API error"))
+            if "query" in data:
+                yield data["query"]
+            if "continue" not in data:
+                return
+            continue_params = data["continue"]
+
 
+def batched(titles: Iterable[str], size: int = MAX_TITLES_PER_QUERY) -> list[list[str]]:
+    """Splits the titles into batches that fit into a single MediaWiki query."""
+    titles = list(titles)
+    return [titles[start : start + size] for start in range(0, len(titles), size)]
 
-def get_page_content(page_title: str) -> PageContent:
+
+async def count_page_words(page_title: str, page: PageContent) -> Counter:  # noqa: ARG001
+    """Counts the words of a page in-process, without any caching."""
+    return count_words(page.page_text)
+
+
+def _resolve_title(title: str, aliases: dict[str, str]) -> str:
+    """Follows the title normalization first, then the redirect reported by the API."""
+    title = aliases.get(title, title)
+    return aliases.get(title, title)
+
+
+async def _predict_next_level(
+    link_index: LinkIndex,
+    frontier: list[str],
+    visited: set[str],
+    budget: "CrawlBudget",
+) -> list[str]:
+    """Returns the not yet visited pages the known links of the frontier lead to, within the budget."""
+    predicted = dict.fromkeys(
+        link
+        for links in (await link_index.get_links(frontier)).values()
+        for link in links
+        if link not in visited
+    )
+    if budget.max_pages is None:
+        return list(predicted)
+    return list(predicted)[: max(0, budget.max_pages - budget.pages_visited - len(frontier))]
+
+
+@dataclass
+class CrawlState:
     """
-    Fetches the content of a Wikipedia page by its title.
+    Progress of a breadth-first crawl, enough to resume it after an interruption.
+
+    A page of the frontier is counted once the consumer of `iter_pages` asks for the page after it,
+    so the state always matches the pages the consumer has merged.
+    """
+
+    depth: int = 0
+    """Depth of the level being crawled."""
+
+    frontier: list[str] = field(default_factory=list)
+    """Pages of the current level, including the counted ones."""
+
+    counted: set[str] = field(default_factory=set)
+    """Pages of the current level already counted."""
+
+    next_frontier: list[str] = field(default_factory=list)
+    """Pages of the next level found so far."""
+
+    visited: set[str] = field(default_factory=set)
+    """Every page counted or queued by the crawl."""
+
+    @classmethod
+    def start(cls, page_title: str) -> "CrawlState":
+        """Returns the state of a crawl starting from a page."""
+        return cls(frontier=[page_title], visited={page_title})
+
+    def remaining(self) -> list[str]:
+        """Returns the pages of the current level that are not counted yet."""
+        return [title for title in self.frontier if title not in self.counted]
+
+    def advance(self) -> None:
+        """Moves on to the next level."""
+        self.depth += 1
+        self.frontier = self.next_frontier
+        self.counted = set()
+        self.next_frontier = []
+
+
+class PageVisit(NamedTuple):
+    """A page counted during a crawl."""
+
+    title: str
+    depth: int
+    word_counts: Counter
+    size: int = 0
+    """UTF-8 size of the page text, as charged to the crawl budget."""
+
+
+class CrawlResult(NamedTuple):
+    """The merged word counts of a crawl."""
+
+    word_counter: WordCounts
+    pages_visited: int
+    truncated: bool = False
+
+
+class CrawlBudget:
+    """
+    Limits of a single crawl: the number of pages, the size of their text and the wall-clock time.
+
+    The budget keeps track of what the crawl used, and whether it had to stop before visiting
+    every page in reach.
+    """
+
+    def __init__(
+        self,
+        max_pages: int | None = None,
+        max_bytes: int | None = None,
+        timeout_s: float | None = None,
+    ) -> None:
+        """
+        Initializes the budget, the wall-clock time starts running now.
+
+        Args:
+            max_pages (int | None): Maximum number of pages visited, unlimited if None.
+            max_bytes (int | None): Maximum size of the visited page texts in UTF-8 bytes. The
+                crawl stops after the page exceeding it, unlimited if None.
+            timeout_s (float | None): Seconds after which no more pages are fetched, unlimited if None.
+        """
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.deadline = None if timeout_s is None else monotonic() + timeout_s
+        self.pages_visited = 0
+        self.bytes_fetched = 0
+        self.truncated = False
+
+    def time_left(self) -> float | None:
+        """Returns the seconds left until the deadline, None without a timeout."""
+        return None if self.deadline is None else max(0.0, self.deadline - monotonic())
+
+    def is_exhausted(self) -> bool:
+        """Returns whether the crawl must stop before the next page."""
+        return (
+            (self.max_pages is not None and self.pages_visited >= self.max_pages)
+            or (self.max_bytes is not None and self.bytes_fetched >= self.max_bytes)
+            or self.time_left() == 0
+        )
+
+    def fit_pages(self, titles: list[str]) -> list[str]:
+        """Returns the titles that still fit into the page budget."""
+        if self.max_pages is None:
+            return titles
+        return titles[: max(0, self.max_pages - self.pages_visited)]
+
+    def charge(self, page: PageContent) -> None:
+        """Accounts a visited page."""
+        self.pages_visited += 1
+        self.bytes_fetched += len(page.page_text.encode())
+
+    def take(self, pages: dict[str, PageContent]) -> list[tuple[str, PageContent]]:
+        """Accounts the fetched pages in order until the budget runs out, and returns them."""
+        taken: list[tuple[str, PageContent]] = []
+        for title, page in pages.items():
+            if self.is_exhausted():
+                self.truncated = True
+                break
+            self.charge(page)
+            taken.append((title, page))
+        return taken
+
+
+async def iter_pages(  # noqa: C901, PLR0912, PLR0913, PLR0915
+    page_title: str,
+    max_depth: int,
+    *,
+    client: PageSource,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    count_page: Callable[[str, PageContent], Awaitable[Counter]] = count_page_words,
+    budget: CrawlBudget | None = None,
+    link_index: LinkIndex | None = None,
+    state: CrawlState | None = None,
+) -> AsyncGenerator[PageVisit, None]:
+    """
+    Walks through Wikipedia pages breadth-first and yields every page as soon as it is counted.
+
+    The link graph is traversed level by level: the pages of the current frontier are fetched in
+    batches of `MAX_TITLES_PER_QUERY`, at most `max_concurrency` batches at a time, and the links
+    found on them form the frontier of the next level. The pages of a batch are counted
+    concurrently, so a `count_page` using worker processes counts them in parallel.
+
+    When the budget runs out, the crawl stops cleanly: the pages visited so far are kept, batches
+    still being fetched at the deadline are dropped, and `budget.truncated` is set.
+
+    With a link index, the links of the fetched pages are recorded, and the pages the known links
+    of the current level lead to are prefetched while the current level is being fetched. The
+    prefetched pages are not used directly, so this only pays off with a caching page source,
+    which serves them to the next level.
+
+    The API requests of the pages are sent with their depth as `request_priority`, so the
+    scheduler of the client serves the shallow pages of concurrent crawls first.
 
     Args:
-        page_title (str): The title of the Wikipedia page.
+        page_title (str): The title of the starting Wikipedia page.
+        max_depth (int): The maximum depth to traverse.
+        client (PageSource): The client used to fetch the pages.
+        max_concurrency (int, optional): The maximum number of batches fetched at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENCY.
+        count_page (Callable[[str, PageContent], Awaitable[Counter]], optional): Returns the word
+            counts of a page. The returned counter is not modified. Defaults to count_page_words.
+        budget (CrawlBudget | None, optional): The limits of the crawl. Defaults to no limits.
+        link_index (LinkIndex | None, optional): Records the links of the fetched pages and
+            predicts the next level. Defaults to None.
+        state (CrawlState | None, optional): Kept up to date with the progress of the crawl. Pass
+            the state of an interrupted crawl to resume it, `page_title` is then only used in the
+            logs. Defaults to a new crawl from `page_title`.
 
-    Returns:
-        PageContent: A named tuple containing the page content and a list of links found on the page.
+    Yields:
+        PageVisit: The title, depth and word counts of every visited page.
     """
-    page = wiki_wiki.page(page_title)
+    if budget is None:
+        budget = CrawlBudget()
+    if state is None:
+        state = CrawlState.start(page_title)
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-    if not page.exists():
-        __logger.warning("Page '%s' does not exist or is not unique.", page_title)
-        return PageContent("", [])
+    async def fetch(titles: list[str], priority: int) -> dict[str, PageContent]:
+        async with semaphore:
+            with measure(Stage.FETCH), request_priority(priority):
+                return await client.get_pages_content(titles)
 
-    # Only keep links where namespace == 0 (wikipedia articles)
-    article_links = [title for title, link in page.links.items() if link.namespace == 0]
-    return PageContent(page.text, article_links)
+    prefetches: list[asyncio.Future] = []
 
+    try:
+        while state.depth <= max_depth:
+            depth = state.depth
+            # Prefetches still waiting for their turn are fetched again by the level itself
+            for prefetch in prefetches:
+                prefetch.cancel()
+            frontier = state.remaining()
+            if not frontier:
+                # A resumed level can be fully counted already
+                if not state.next_frontier:
+                    return
+                state.advance()
+                continue
+            if budget.is_exhausted() or len(budget.fit_pages(frontier)) < len(frontier):
+                budget.truncated = True
+                frontier = budget.fit_pages(frontier)
+                if not frontier or budget.is_exhausted():
+                    return
 
-def walk_pages(
+            tasks = [asyncio.ensure_future(fetch(batch, depth)) for batch in batched(frontier)]
+            if link_index is not None and depth < max_depth:
+                predicted = await _predict_next_level(link_index, frontier, state.visited, budget)
+                prefetches = [
+                    asyncio.ensure_future(fetch(batch, depth + 1)) for batch in batched(predicted)
+                ]
+            try:
+                done, pending = await asyncio.wait(tasks, timeout=budget.time_left())
+            finally:
+                for task in tasks:
+                    task.cancel()
+            if pending:
+                _logger.info("Crawl of '%s' ran out of time at depth %d", page_title, depth)
+                budget.truncated = True
+
+            for task in tasks:
+                if task not in done:
+                    continue
+                fetched = task.result()
+                if link_index is not None:
+                    link_index.update(fetched)
+                pages = budget.take(fetched)
+                METRICS.increment(MetricCounter.PAGES_VISITED, len(pages))
+                with measure(Stage.TOKENIZE):
+                    word_counts = await asyncio.gather(
+                        *(count_page(title, page) for title, page in pages),
+                    )
+                for (title, page), counts in zip(pages, word_counts, strict=True):
+                    _logger.debug("Visited: '%s' (depth: %d)", title, depth)
+                    _logger.debug("Number of links found: %d", len(page.links))
+                    yield PageVisit(title, depth, counts, len(page.page_text.encode()))
+
+                    if depth < max_depth:
+                        with measure(Stage.LINKS):
+                            for link in page.links:
+                                if link not in state.visited:
+                                    state.visited.add(link)
+                                    state.next_frontier.append(link)
+                    state.counted.add(title)
+                if len(pages) < len(fetched):
+                    return
+            if pending:
+                return
+            state.advance()
+    finally:
+        for prefetch in prefetches:
+            prefetch.cancel()
+
+
+async def walk_pages(  # noqa: PLR0913
     page_title: str,
     max_depth: int,
-    depth: int = 0,
-    word_counter: Counter | None = None,
-    visited: set[str] | None = None,
     ignore_words: Iterable[str] | None = None,
-) -> Counter:
+    *,
+    client: PageSource,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    count_page: Callable[[str, PageContent], Awaitable[Counter]] = count_page_words,
+    budget: CrawlBudget | None = None,
+    vocabulary: Vocabulary | None = None,
+    link_index: LinkIndex | None = None,
+    approximation: Approximation | None = None,
+) -> CrawlResult:
     """
-    Recursively walks through Wikipedia pages starting from a given page title.
+    Walks through Wikipedia pages breadth-first, starting from a given page title.
+
+    The words of every page are counted by `count_page`, which can serve them from a cache, and
+    the ignored words are only removed from the merged counter. See `iter_pages` for the walk.
 
     Args:
         page_title (str): The title of the starting Wikipedia page.
         max_depth (int): The maximum depth to traverse.
-        depth (int, optional): The current depth in the traversal. Defaults to 0.
-        word_counter (Counter | None, optional): A Counter object to accumulate word counts. Defaults to None.
-        visited (set[str] | None, optional): A set of visited page titles to avoid cycles. Defaults to None.
         ignore_words (Iterable[str] | None, optional): A set of words to ignore in the count. Defaults to None.
+        client (PageSource): The client used to fetch the pages.
+        max_concurrency (int, optional): The maximum number of batches fetched at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENCY.
+        count_page (Callable[[str, PageContent], Awaitable[Counter]], optional): Returns the word
+            counts of a page. The returned counter is not modified. Defaults to count_page_words.
+        budget (CrawlBudget | None, optional): The limits of the crawl. Defaults to no limits.
+        vocabulary (Vocabulary | None, optional): If given, the counts are merged into a compact
+            `VocabularyCounter` using this vocabulary instead of a `Counter`. Defaults to None.
+        link_index (LinkIndex | None, optional): Records the links of the fetched pages and
+            predicts the next level, see `iter_pages`. Defaults to None.
+        approximation (Approximation | None, optional): If given, the counts are merged into an
+            `ApproximateCounter` of bounded size, taking precedence over `vocabulary`. Defaults
+            to None.
 
     Returns:
-        Counter: A Counter object containing the word counts from all visited pages.
+        CrawlResult: The word counts from all visited pages, the number of visited pages and
+            whether the crawl was cut short by the budget.
     """
-    if visited is None:
-        visited = set()
+    if budget is None:
+        budget = CrawlBudget()
 
-    if word_counter is None:
+    word_counter: WordCounts
+    if approximation is not None:
+        word_counter = ApproximateCounter(approximation)
+    elif vocabulary is not None:
+        word_counter = VocabularyCounter(vocabulary)
+    else:
         word_counter = Counter()
+    async for visit in iter_pages(
+        page_title,
+        max_depth,
+        client=client,
+        max_concurrency=max_concurrency,
+        count_page=count_page,
+        budget=budget,
+        link_index=link_index,
+    ):
+        # Merge in place, `+=` would copy the whole accumulated vocabulary for every page
+        with measure(Stage.MERGE):
+            word_counter.update(visit.word_counts)
 
-    visited.add(page_title)
-    content, links = get_page_content(page_title)
-    word_counter += count_words(content, ignore_words)
-    __logger.debug("Visited: '%s' (depth: %d)", page_title, depth)
-    __logger.debug("Number of links found: %d", len(links))
-
-    # TODO: parallelize this to speed up the process
-    for link in links:
-        if link not in visited and (depth + 1) <= max_depth:
-            word_counter = walk_pages(
-                link,
-                max_depth,
-                depth + 1,
-                word_counter,
-                visited,
-                ignore_words,
-            )
-    return word_counter
+    return CrawlResult(
+        remove_words(word_counter, ignore_words),
+        budget.pages_visited,
+        budget.truncated,
+    )
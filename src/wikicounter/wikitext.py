@@ -0,0 +1,172 @@
+"""
+Conversion of the MediaWiki markup, the wikitext of the pages, into their plain text and links.
+
+Used for the pages of the dumps, and for the pages fetched from the API in their wikitext, which
+the API returns for many pages at once unlike their plain text extracts.
+"""
+
+import html
+import re
+from collections.abc import Iterable
+
+_DEFAULT_NAMESPACES = (
+    "Media",
+    "Special",
+    "Talk",
+    "User",
+    "User talk",
+    "Wikipedia",
+    "Wikipedia talk",
+    "File",
+    "File talk",
+    "MediaWiki",
+    "MediaWiki talk",
+    "Template",
+    "Template talk",
+    "Help",
+    "Help talk",
+    "Category",
+    "Category talk",
+    "Portal",
+    "Portal talk",
+    "Draft",
+    "Draft talk",
+    "Module",
+    "Module talk",
+)
+"""Namespaces of the English Wikipedia, for the wikis whose namespaces are not known."""
+
+_LINK_PREFIXES = frozenset(
+    {
+        "commons",
+        "image",
+        "m",
+        "meta",
+        "mw",
+        "project",
+        "simple",
+        "w",
+        "wikibooks",
+        "wikidata",
+        "wikinews",
+        "wikiquote",
+        "wikisource",
+        "wikispecies",
+        "wikiversity",
+        "wikivoyage",
+        "wikt",
+        "wiktionary",
+        "wp",
+    },
+)
+"""Namespace aliases and interwiki prefixes, missing from the namespace lists of the wikis."""
+
+_LANGUAGE_PREFIX = re.compile(r"[a-z]{2,3}(?:-[a-z]+)*")
+"""Interlanguage prefix, written in lowercase unlike the titles, e.g. `de` or `zh-yue`."""
+
+_LINK = re.compile(r"\[\[([^\[\]|]*)(?:\|([^\[\]]*))?\]\]")
+_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_REFERENCE = re.compile(r"<ref[^>]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+_TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+_TABLE = re.compile(r"\{\|[^{}]*?\|\}", re.DOTALL)
+_EXTERNAL_LINK = re.compile(r"\[(?:https?:)?//[^\s\]]+ ?([^\]]*)\]")
+_TAG = re.compile(r"<[^>]+>")
+_FORMATTING = re.compile(r"'{2,}|^=+|=+$", re.MULTILINE)
+
+
+def link_prefixes(namespaces: Iterable[str]) -> frozenset[str]:
+    """
+    Returns the lowercase prefixes of the links that do not point to an article.
+
+    Args:
+        namespaces (Iterable[str]): The names of the other namespaces of the wiki, those of the
+            English Wikipedia if empty.
+
+    Returns:
+        frozenset[str]: The namespaces, their aliases and the interwiki prefixes.
+    """
+    names = list(namespaces) or _DEFAULT_NAMESPACES
+    return _LINK_PREFIXES.union(name.strip().lower() for name in names)
+
+
+DEFAULT_LINK_PREFIXES = link_prefixes(())
+"""Prefixes of the links that do not point to an article on the English Wikipedia."""
+
+
+def normalize_title(title: str) -> str:
+    """Normalizes a title like MediaWiki: underscores to spaces and an uppercase first letter."""
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def wikitext_links(wikitext: str, prefixes: frozenset[str] = DEFAULT_LINK_PREFIXES) -> list[str]:
+    """
+    Returns the distinct articles linked from a wikitext, in order of appearance.
+
+    Links to other namespaces (e.g. `File:` or `Category:`), to other wikis and to sections of the
+    same page are skipped.
+
+    Args:
+        wikitext (str): The wikitext of a page.
+        prefixes (frozenset[str]): The lowercase prefixes of the links to other namespaces and
+            wikis, see `link_prefixes`.
+
+    Returns:
+        list[str]: The normalized titles of the linked articles.
+    """
+    links: dict[str, None] = {}
+    for match in _LINK.finditer(wikitext):
+        target = match.group(1).partition("#")[0].strip()
+        if target and _is_article_link(target, prefixes):
+            links[normalize_title(target)] = None
+    return list(links)
+
+
+def _is_article_link(target: str, prefixes: frozenset[str]) -> bool:
+    """Returns whether a link target is an article rather than another namespace or wiki."""
+    if target.startswith(":"):
+        return False
+    prefix, colon, _rest = target.partition(":")
+    if not colon:
+        return True
+    prefix = prefix.strip()
+    return not (
+        " ".join(prefix.replace("_", " ").split()).lower() in prefixes
+        or _LANGUAGE_PREFIX.fullmatch(prefix)
+    )
+
+
+def wikitext_to_text(wikitext: str, prefixes: frozenset[str] = DEFAULT_LINK_PREFIXES) -> str:
+    """
+    Converts wikitext into plain text, close to what the extracts of the MediaWiki API return.
+
+    Templates, tables, references, comments and HTML tags are removed, and links are replaced by
+    their label. Links to other namespaces, e.g. images and categories, are removed entirely.
+
+    Args:
+        wikitext (str): The wikitext of a page.
+        prefixes (frozenset[str]): The lowercase prefixes of the links to other namespaces and
+            wikis, see `link_prefixes`.
+
+    Returns:
+        str: The plain text of the page.
+    """
+    text = _REFERENCE.sub("", _COMMENT.sub("", wikitext))
+    # Nested templates are removed from the inside out
+    previous = None
+    while previous != text:
+        previous = text
+        text = _TEMPLATE.sub("", text)
+    text = _TABLE.sub("", text)
+    text = _LINK.sub(lambda match: _link_label(match, prefixes), text)
+    text = _EXTERNAL_LINK.sub(r"\1", text)
+    text = _TAG.sub("", text)
+    return html.unescape(_FORMATTING.sub("", text))
+
+
+def _link_label(match: re.Match[str], prefixes: frozenset[str]) -> str:
+    """Returns the displayed text of a wikitext link, empty for links to other namespaces."""
+    target, label = match.groups()
+    if not _is_article_link(target, prefixes):
+        return ""
+    return target if label is None else label
@@ -0,0 +1,179 @@
+"""A local MediaWiki stand-in serving a synthetic link graph over HTTP, for the benchmarks."""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from functools import cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Self
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 makes the 64 concurrent connections wait for SYN retries
+    request_queue_size = 128
+
+
+class FakeMediaWiki:
+    """
+    Answers the `action=query` requests of `WikiClient` for a synthetic link graph.
+
+    The pages are titled `Page 0` to `Page <page_count - 1>`. Every page links to the `fan_out`
+    pages following it in a stride, so the crawls reach new pages at every level, and has
+    `page_words` words drawn from a shared vocabulary. Every response is delayed by `latency`
+    seconds, like a remote API, and holds at most `max_result_size` bytes of page contents, like
+    `$wgAPIMaxResultSize` (8 MiB) of the Wikimedia wikis.
+    """
+
+    def __init__(
+        self,
+        page_count: int = 5_000,
+        fan_out: int = 8,
+        page_words: int = 300,
+        latency: float = 0.005,
+        max_result_size: int = 8 * 1024 * 1024,
+    ) -> None:
+        self.page_count = page_count
+        self.fan_out = fan_out
+        self.page_words = page_words
+        self.latency = latency
+        self.max_result_size = max_result_size
+        self.requests = 0
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/w/api.php"
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @cache  # noqa: B019
+    def page(self, index: int) -> dict:
+        words = (
+            f"word{(index * 31 + position * 7) % 5_000}" for position in range(self.page_words)
+        )
+        links = (
+            (index * self.fan_out + offset) % self.page_count
+            for offset in range(1, self.fan_out + 1)
+        )
+        return {
+            "title": f"Page {index}",
+            "lastrevid": index + 1,
+            "content": "The " + " ".join(words) + ".",
+            "links": [{"ns": 0, "title": f"Page {link}"} for link in links],
+        }
+
+    def query(self, params: dict[str, str]) -> dict:
+        """
+        Answers a query like the MediaWiki API, with the requested properties of the pages.
+
+        The contents past `max_result_size` bytes follow through `rvcontinue`, and like the
+        generic continuation of the API, the continued responses only hold the revisions.
+        """
+        if params.get("meta") == "siteinfo":
+            return {"query": {"namespaces": {"0": {"id": 0, "name": ""}}, "namespacealiases": []}}
+        props = params.get("prop", "").split("|")
+        content_offset = int(params.get("rvcontinue", 0))
+        continuing = "rvcontinue" in params
+        result_size = 0
+        next_offset = None
+        pages = []
+        for position, title in enumerate(params.get("titles", "").split("|")):
+            prefix, _space, index = title.partition(" ")
+            if prefix != "Page" or not index.isdigit() or int(index) >= self.page_count:
+                pages.append({"title": title, "missing": True})
+                continue
+            page = self.page(int(index))
+            answer = {"title": title}
+            if "info" in props and not continuing:
+                answer["lastrevid"] = page["lastrevid"]
+            if "links" in props and not continuing:
+                answer["links"] = page["links"]
+            if "revisions" in props and position >= content_offset and next_offset is None:
+                if result_size and result_size + len(page["content"]) > self.max_result_size:
+                    next_offset = position
+                else:
+                    result_size += len(page["content"])
+                    content = {"content": page["content"]}
+                    answer["revisions"] = [{"revid": page["lastrevid"], "slots": {"main": content}}]
+            pages.append(answer)
+        if next_offset is not None:
+            return {
+                "continue": {"rvcontinue": str(next_offset), "continue": "||"},
+                "query": {"pages": pages},
+            }
+        return {"batchcomplete": True, "query": {"pages": pages}}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        wiki = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, Nagle would delay the body by ~40 ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                wiki.requests += 1
+                time.sleep(wiki.latency)
+                params = {
+                    key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()
+                }
+                body = json.dumps(wiki.query(params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args: object) -> None:
+                pass
+
+        return Handler
+
+
+BENCHMARK_ENV_PREFIX = "WIKICOUNTER_BENCHMARK_"
+
+
+def benchmark_output(variable: str, name: str, tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    The path the results of a benchmark are written to.
+
+    It is read from the `WIKICOUNTER_BENCHMARK_<variable>` environment variable, the results are
+    written to a temporary directory of pytest otherwise, so the runs do not litter the checkout.
+    """
+    path = os.environ.get(f"{BENCHMARK_ENV_PREFIX}{variable}")
+    output = Path(path) if path else tmp_path_factory.mktemp("benchmarks") / name
+    print(f"\nWriting the benchmark results to {output}")  # noqa: T201
+    return output
+
+
+@pytest.fixture(name="fake_mediawiki", scope="session")
+def fixture_fake_mediawiki() -> Iterator[FakeMediaWiki]:
+    """
+    The MediaWiki stand-in, shared by the benchmarks of the session.
+
+    The graph is configured with the `WIKICOUNTER_BENCHMARK_FAN_OUT`, `_PAGE_WORDS`, `_LATENCY`
+    and `_MAX_RESULT_SIZE` environment variables.
+    """
+    environ = os.environ
+    with FakeMediaWiki(
+        fan_out=int(environ.get(f"{BENCHMARK_ENV_PREFIX}FAN_OUT", 8)),
+        page_words=int(environ.get(f"{BENCHMARK_ENV_PREFIX}PAGE_WORDS", 300)),
+        latency=float(environ.get(f"{BENCHMARK_ENV_PREFIX}LATENCY", 0.005)),
+        max_result_size=int(environ.get(f"{BENCHMARK_ENV_PREFIX}MAX_RESULT_SIZE", 8 * 1024 * 1024)),
+    ) as wiki:
+        yield wiki
@@ -0,0 +1,51 @@
+"""Benchmark of merging the word counts of large crawls."""
+
+from collections.abc import Iterable
+from time import perf_counter
+
+import pytest
+
+from wikicounter.wiki_connection import PageContent, walk_pages
+
+FAN_OUT = 71
+WORDS_PER_PAGE = 60
+
+
+class SyntheticGraph:
+    """A link graph of `page_count` pages, each with its own words, served without any I/O."""
+
+    def __init__(self, page_count: int) -> None:
+        self.page_count = page_count
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        return {title: self._page(int(title)) for title in page_titles}
+
+    def _page(self, index: int) -> PageContent:
+        # Every page brings new words, so the merged vocabulary grows with the crawl
+        text = " ".join(f"word{index}x{word}" for word in range(WORDS_PER_PAGE))
+        links = [
+            str((index * FAN_OUT + offset) % self.page_count) for offset in range(1, FAN_OUT + 1)
+        ]
+        return PageContent(f"the common words {text}", links)
+
+
+async def crawl_seconds(page_count: int) -> float:
+    start_time = perf_counter()
+    crawl = await walk_pages("0", 2, client=SyntheticGraph(page_count))
+    elapsed = perf_counter() - start_time
+
+    assert crawl.word_counter["the"] == page_count
+    assert len(crawl.word_counter) == page_count * WORDS_PER_PAGE + 3
+    return elapsed
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+@pytest.mark.anyio
+async def test_walk_pages__scales_linearly():
+    """Crawling 5x more pages takes about 5x longer, not 25x as with quadratic merging."""
+    small = await crawl_seconds(1_000)
+    large = await crawl_seconds(5_000)
+    print(f"\nwalk_pages: 1,000 pages in {small:.2f}s, 5,000 pages in {large:.2f}s")  # noqa: T201
+
+    assert large / small < 10
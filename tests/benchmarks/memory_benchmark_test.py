@@ -0,0 +1,118 @@
+"""Memory benchmark of the Counter, the compact vocabulary and the approximate counting backends."""
+
+import gc
+import random
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+
+import pytest
+
+from wikicounter.counting import (
+    ApproximateCounter,
+    Approximation,
+    Vocabulary,
+    VocabularyCounter,
+    count_words,
+)
+
+PAGE_COUNT = 1_000
+WORDS_PER_PAGE = 500
+CRAWL_COUNT = 4
+PAGES_PER_CRAWL = 700
+
+
+@pytest.fixture(name="page_texts", scope="module")
+def fixture_page_texts() -> list[str]:
+    """Page texts with a long-tailed vocabulary, shared in part by the pages."""
+    rng = random.Random(42)  # noqa: S311
+    return [
+        " ".join(f"word{int(rng.paretovariate(0.3))}" for _ in range(WORDS_PER_PAGE))
+        for _ in range(PAGE_COUNT)
+    ]
+
+
+def retained_bytes(build: Callable[[], object]) -> int:
+    """Returns the memory still allocated by the result of `build`."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        retained, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def overlapping_crawls(page_texts: list[str]) -> list[list[str]]:
+    """The pages of concurrent crawls, every crawl shares pages with the next one."""
+    step = (PAGE_COUNT - PAGES_PER_CRAWL) // (CRAWL_COUNT - 1)
+    return [page_texts[start : start + PAGES_PER_CRAWL] for start in range(0, PAGE_COUNT, step)][
+        :CRAWL_COUNT
+    ]
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_vocabulary_counter__merged_crawls(page_texts: list[str]):
+    """Concurrent crawls sharing a vocabulary hold less memory than one Counter per crawl."""
+    crawls = overlapping_crawls(page_texts)
+
+    def merge_counters() -> list[Counter]:
+        merged = []
+        for texts in crawls:
+            word_counter: Counter = Counter()
+            for text in texts:
+                word_counter.update(count_words(text))
+            merged.append(word_counter)
+        return merged
+
+    def merge_vocabulary() -> tuple[Vocabulary, list[VocabularyCounter]]:
+        vocabulary = Vocabulary()
+        merged = []
+        for texts in crawls:
+            word_counter = VocabularyCounter(vocabulary)
+            for text in texts:
+                word_counter.update(count_words(text))
+            merged.append(word_counter)
+        return vocabulary, merged
+
+    counters = retained_bytes(merge_counters)
+    compact = retained_bytes(merge_vocabulary)
+    print(f"\nmerged crawls: Counter {counters >> 10:,} KiB, vocabulary {compact >> 10:,} KiB")  # noqa: T201
+
+    assert compact < counters * 0.75
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_approximate_counter__long_tail(page_texts: list[str]):
+    """The approximate counter holds a bounded size, finding the top words of the long tail."""
+    page_counts = [count_words(text) for text in page_texts]
+    approximation = Approximation(error=0.001, confidence=0.99, top_words=1_000)
+
+    def merge_counter() -> Counter:
+        word_counter: Counter = Counter()
+        for counts in page_counts:
+            word_counter.update(counts)
+        return word_counter
+
+    def merge_approximate() -> ApproximateCounter:
+        word_counter = ApproximateCounter(approximation)
+        for counts in page_counts:
+            word_counter.update(counts)
+        return word_counter
+
+    counters = retained_bytes(merge_counter)
+    approximate = retained_bytes(merge_approximate)
+    print(  # noqa: T201
+        f"\nlong tail: Counter {counters >> 10:,} KiB, approximate {approximate >> 10:,} KiB",
+    )
+
+    exact, estimated = merge_counter(), merge_approximate()
+    assert [word for word, _count in estimated.most_common(100)] == [
+        word for word, _count in exact.most_common(100)
+    ]
+    assert approximate < counters * 0.5
@@ -0,0 +1,186 @@
+"""
+End-to-end benchmark of the endpoints against the local MediaWiki stand-in.
+
+Every case sends requests for distinct articles to the application, at most `concurrency` at a
+time, with the result and page caches disabled so that every request crawls through the HTTP API.
+The latencies and throughput of the cases are written as JSON to the path in
+`WIKICOUNTER_BENCHMARK_OUTPUT`, or to `bench_output.json` in a temporary directory of pytest.
+
+Pass the output of an earlier run in `WIKICOUNTER_BENCHMARK_BASELINE` to compare against it: a
+case fails when its median latency grows, or its throughput drops, by more than
+`WIKICOUNTER_BENCHMARK_TOLERANCE` (25% by default).
+"""
+
+import asyncio
+import json
+import os
+import statistics
+from collections.abc import Iterator
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+import pytest
+
+from .conftest import BENCHMARK_ENV_PREFIX, FakeMediaWiki, benchmark_output
+from wikicounter.main import app, lifespan
+from wikicounter.wiki_connection import WikiClient
+
+ENDPOINTS = ["word-frequency", "keywords"]
+DEPTHS = [0, 1, 2]
+CONCURRENCIES = [1, 8, 64]
+
+MIN_REQUESTS = 16
+"""Number of requests sent by the cases with a lower concurrency."""
+
+
+def case_id(endpoint: str, depth: int, concurrency: int) -> str:
+    return f"{endpoint}-depth{depth}-concurrency{concurrency}"
+
+
+@pytest.fixture(name="report", scope="module")
+def fixture_report(
+    fake_mediawiki: FakeMediaWiki,
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Iterator[list[dict]]:
+    """Collects the results of the cases and writes them as JSON after the last one."""
+    cases: list[dict] = []
+    yield cases
+    output = benchmark_output("OUTPUT", "bench_output.json", tmp_path_factory)
+    graph = {
+        "fan_out": fake_mediawiki.fan_out,
+        "page_words": fake_mediawiki.page_words,
+        "latency": fake_mediawiki.latency,
+    }
+    output.write_text(json.dumps({"graph": graph, "cases": cases}, indent=2))
+
+
+@pytest.fixture(name="baseline", scope="module")
+def fixture_baseline() -> dict[str, dict]:
+    """The cases of an earlier run keyed by their id, empty without a baseline."""
+    path = os.environ.get(f"{BENCHMARK_ENV_PREFIX}BASELINE")
+    if path is None:
+        return {}
+    return {case["id"]: case for case in json.loads(Path(path).read_text())["cases"]}
+
+
+async def run_case(
+    wiki: FakeMediaWiki,
+    endpoint: str,
+    depth: int,
+    concurrency: int,
+) -> dict:
+    """Sends the requests of a case and measures their latencies and the throughput."""
+    request_count = max(concurrency, MIN_REQUESTS)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    api_requests = wiki.requests
+
+    async def send(client: httpx.AsyncClient, index: int) -> int:
+        article = f"Page {index * 613 % wiki.page_count}"
+        async with semaphore:
+            start_time = perf_counter()
+            if endpoint == "word-frequency":
+                response = await client.get(
+                    "/word-frequency",
+                    params={"article": article, "depth": depth},
+                )
+            else:
+                response = await client.post(
+                    "/keywords",
+                    json={
+                        "article": article,
+                        "depth": depth,
+                        "ignore_list": ["the"],
+                        "percentile": 90,
+                    },
+                )
+            latencies.append(perf_counter() - start_time)
+        response.raise_for_status()
+        return response.json()["pages_visited"]
+
+    async with (
+        lifespan(app),
+        httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://test") as client,
+    ):
+        start_time = perf_counter()
+        pages = await asyncio.gather(*(send(client, index) for index in range(request_count)))
+        elapsed = perf_counter() - start_time
+
+    return {
+        "id": case_id(endpoint, depth, concurrency),
+        "endpoint": endpoint,
+        "depth": depth,
+        "concurrency": concurrency,
+        "requests": request_count,
+        "pages_per_request": statistics.mean(pages),
+        "api_requests": wiki.requests - api_requests,
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "latency_p95_ms": round(statistics.quantiles(latencies, n=20)[-1] * 1000, 2),
+        "throughput_rps": round(request_count / elapsed, 2),
+    }
+
+
+def regressions(case: dict, baseline_case: dict | None, tolerance: float) -> list[str]:
+    """Returns the metrics of the case that are worse than the baseline beyond the tolerance."""
+    if baseline_case is None:
+        return []
+    regressed = []
+    if case["latency_p50_ms"] > baseline_case["latency_p50_ms"] * (1 + tolerance):
+        regressed.append("latency_p50_ms")
+    if case["throughput_rps"] < baseline_case["throughput_rps"] * (1 - tolerance):
+        regressed.append("throughput_rps")
+    return regressed
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+@pytest.mark.anyio
+@pytest.mark.parametrize("concurrency", CONCURRENCIES)
+@pytest.mark.parametrize("depth", DEPTHS)
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+async def test_endpoint__latency_and_throughput(  # noqa: PLR0913, PLR0917
+    endpoint: str,
+    depth: int,
+    concurrency: int,
+    fake_mediawiki: FakeMediaWiki,
+    report: list[dict],
+    baseline: dict[str, dict],
+    monkeypatch,
+):
+    """The endpoint crawls the stand-in without regressing against the baseline."""
+    monkeypatch.setenv("WIKICOUNTER_API_URL", fake_mediawiki.api_url)
+    monkeypatch.setenv("WIKICOUNTER_PAGE_CACHE_SIZE", "0")
+    monkeypatch.setenv("WIKICOUNTER_RESULT_CACHE_SIZE", "0")
+    # The rate limit protects Wikimedia, the stand-in measures the service without it
+    monkeypatch.setenv("WIKICOUNTER_API_RATE_LIMIT", "1000000")
+
+    case = await run_case(fake_mediawiki, endpoint, depth, concurrency)
+    tolerance = float(os.environ.get(f"{BENCHMARK_ENV_PREFIX}TOLERANCE", "0.25"))
+    case["regressions"] = regressions(case, baseline.get(case["id"]), tolerance)
+    report.append(case)
+    print(  # noqa: T201
+        f"\n{case['id']}: p50 {case['latency_p50_ms']} ms, p95 {case['latency_p95_ms']} ms,"
+        f" {case['throughput_rps']} requests/s",
+    )
+
+    # Links wrapping around the graph can lead to pages visited before
+    assert case["pages_per_request"] <= sum(
+        fake_mediawiki.fan_out**level for level in range(depth + 1)
+    )
+    assert not case["regressions"]
+
+
+@pytest.mark.anyio
+async def test_fake_mediawiki__continues_contents():
+    """The stand-in splits the contents of a batch over responses like the API, in one query."""
+    with FakeMediaWiki(page_count=50, page_words=100, latency=0, max_result_size=10_000) as wiki:
+        async with WikiClient(wiki.api_url) as client:
+            pages = await client.get_pages_content(f"Page {index}" for index in range(50))
+
+    assert [page.page_text for page in pages.values()] == [
+        wiki.page(index)["content"] for index in range(50)
+    ]
+    assert all(page.links for page in pages.values())
+    # The site information, then the batch and its continuations
+    assert wiki.requests == 1 + 1 + 4
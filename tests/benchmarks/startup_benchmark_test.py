@@ -0,0 +1,120 @@
+"""
+Cold start benchmark of the service: importing the application and running its lifespan.
+
+Every run starts a fresh interpreter, like a scaled-from-zero instance, with the bytecode compiled
+by an earlier run, like a deployed image. The medians of the runs are written as JSON to the path
+in `WIKICOUNTER_BENCHMARK_STARTUP_OUTPUT`, or to `bench_startup.json` in a temporary directory of
+pytest.
+
+Pass the output of an earlier run in `WIKICOUNTER_BENCHMARK_STARTUP_BASELINE` to compare against
+it: a phase fails when it grows by more than `WIKICOUNTER_BENCHMARK_TOLERANCE` (25% by default).
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import pytest
+
+from .conftest import BENCHMARK_ENV_PREFIX, benchmark_output
+
+RUNS = 7
+
+STARTUP_SCRIPT = """
+import asyncio, json, sys
+from time import perf_counter
+
+start = perf_counter()
+from wikicounter.main import app, lifespan
+imported = perf_counter()
+
+async def run():
+    entered = perf_counter()
+    async with lifespan(app):
+        started = perf_counter()
+    return entered, started, perf_counter()
+
+entered, started, stopped = asyncio.run(run())
+json.dump(
+    {
+        "import_ms": (imported - start) * 1000,
+        "startup_ms": (started - entered) * 1000,
+        "shutdown_ms": (stopped - started) * 1000,
+    },
+    sys.stdout,
+)
+"""
+
+DEFERRED_MODULES = [
+    "multiprocessing",
+    "concurrent.futures.process",
+    "numpy",
+    "wikicounter.dump",
+]
+"""Modules only imported by the features needing them, not by the default service."""
+
+
+def run_startup(env: dict[str, str]) -> dict[str, float]:
+    """Starts and stops the service in a fresh interpreter, returning the phase durations."""
+    start = perf_counter()
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    ).stdout
+    return {**json.loads(output), "process_ms": (perf_counter() - start) * 1000}
+
+
+def test_import__defers_optional_modules():
+    """Importing the application leaves the process pool, NumPy and the dump reader unimported."""
+    script = f"import sys, wikicounter.main; print([m for m in {DEFERRED_MODULES!r} if m in sys.modules])"
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert output.strip() == "[]"
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_startup__cold_start(tmp_path_factory: pytest.TempPathFactory):
+    """The service imports and starts without regressing against the baseline."""
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if not name.startswith("WIKICOUNTER_") and name != "PYTHONDONTWRITEBYTECODE"
+    }
+    # Compiles the bytecode, which a deployed image ships with
+    run_startup(env)
+    runs = [run_startup(env) for _ in range(RUNS)]
+    phases = {
+        phase: round(statistics.median(run[phase] for run in runs), 2)
+        for phase in ("process_ms", "import_ms", "startup_ms", "shutdown_ms")
+    }
+
+    baseline_path = os.environ.get(f"{BENCHMARK_ENV_PREFIX}STARTUP_BASELINE")
+    baseline = json.loads(Path(baseline_path).read_text())["phases"] if baseline_path else {}
+    tolerance = float(os.environ.get(f"{BENCHMARK_ENV_PREFIX}TOLERANCE", "0.25"))
+    regressions = [
+        phase
+        for phase, duration in phases.items()
+        if phase in baseline and duration > baseline[phase] * (1 + tolerance)
+    ]
+    output = benchmark_output("STARTUP_OUTPUT", "bench_startup.json", tmp_path_factory)
+    output.write_text(
+        json.dumps({"runs": RUNS, "phases": phases, "regressions": regressions}, indent=2),
+    )
+    print(  # noqa: T201
+        f"\nstartup: process {phases['process_ms']} ms, import {phases['import_ms']} ms,"
+        f" lifespan {phases['startup_ms']} ms",
+    )
+
+    assert not regressions
@@ -0,0 +1,55 @@
+"""Microbenchmark of the tokenizer behind count_words."""
+
+import random
+import string
+from collections import Counter
+from collections.abc import Iterable
+from timeit import repeat
+
+import pytest
+
+from wikicounter.counting import _normalize_word, count_words
+
+TOKEN_COUNT = 200_000
+
+
+def legacy_count_words(text: str, ignore_words: Iterable[str] | None = None) -> Counter:
+    """The tokenizer before the single-pass rewrite, normalizing every token twice."""
+    if ignore_words is None:
+        ignore_words = set()
+
+    return Counter(
+        _normalize_word(word) for word in text.split() if _normalize_word(word) not in ignore_words
+    )
+
+
+@pytest.fixture(name="article_text", scope="module")
+def fixture_article_text() -> str:
+    """A large article body with a Zipf-like vocabulary, mixed case and punctuation."""
+    rng = random.Random(42)  # noqa: S311
+    vocabulary = [
+        "".join(rng.choices(string.ascii_letters, k=rng.randint(2, 12))) for _ in range(50_000)
+    ]
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    words = rng.choices(vocabulary, weights, k=TOKEN_COUNT)
+    return " ".join(f"{word}{rng.choice(['', '', '', ',', '.', ')'])}" for word in words)
+
+
+def tokens_per_second(function, text: str, ignore_words: list[str]) -> float:
+    return TOKEN_COUNT / min(repeat(lambda: function(text, ignore_words), number=1, repeat=3))
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_count_words__throughput(article_text: str):
+    """The single-pass tokenizer counts the same words faster than the legacy one."""
+    # A list, like KeywordsRequest.ignore_list, makes every membership test O(n) in the legacy one
+    ignore_words = [f"ignored{index}" for index in range(200)]
+    assert count_words(article_text, ignore_words) == legacy_count_words(article_text, ignore_words)
+
+    before = tokens_per_second(legacy_count_words, article_text, ignore_words)
+    after = tokens_per_second(count_words, article_text, ignore_words)
+    print(  # noqa: T201
+        f"\ncount_words: {before:,.0f} -> {after:,.0f} tokens/s ({after / before:.1f}x)",
+    )
+    assert after > before
@@ -0,0 +1,374 @@
+"""Tests for the cache module."""
+
+import asyncio
+import sqlite3
+from collections import Counter
+from collections.abc import Iterable
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from wikicounter.cache import (
+    CachedPage,
+    CacheStats,
+    CachingPageSource,
+    CountsKey,
+    LRUPageCache,
+    PageRefresher,
+    ResultCache,
+    ResultCacheStats,
+    SQLitePageCache,
+    TieredPageCache,
+    create_page_cache,
+)
+from wikicounter.counting import NORMALIZATION_KEY, count_words
+from wikicounter.wiki_connection import PageContent
+
+PAGE = PageContent("some text", ["Link"], 7)
+
+
+class FakeWikiClient:
+    """Record the fetched pages and revision lookups instead of calling Wikipedia."""
+
+    def __init__(self) -> None:
+        self.pages = {"Page": PAGE, "Other": PageContent("other text", [], 3)}
+        self.fetched: list[str] = []
+        self.revalidated: list[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        titles = list(page_titles)
+        self.fetched.extend(titles)
+        await self.release.wait()
+        return {title: self.pages[title] for title in titles}
+
+    async def get_revision_ids(self, page_titles: Iterable[str]) -> dict[str, int]:
+        titles = list(page_titles)
+        self.revalidated.extend(titles)
+        return {title: self.pages[title].revision_id for title in titles}
+
+
+@pytest.fixture(name="sqlite_cache")
+def fixture_sqlite_cache(tmp_path: Path):
+    """SQLite page cache in a temporary directory."""
+    cache = SQLitePageCache(tmp_path / "pages.sqlite")
+    yield cache
+    cache.close()
+
+
+# MARK: Storage Tests
+
+
+def test_lru_page_cache__evicts_least_recently_used():
+    """The least recently used page is evicted when the cache is full."""
+    cache = LRUPageCache(max_size=2)
+    cache.set("A", CachedPage(PAGE, 0))
+    cache.set("B", CachedPage(PAGE, 0))
+    assert cache.get("A") is not None  # "B" becomes the least recently used
+    cache.set("C", CachedPage(PAGE, 0))
+
+    assert cache.get("B") is None
+    assert cache.get("A") is not None
+    assert len(cache) == 2
+
+
+def test_sqlite_page_cache__persists_pages(tmp_path: Path):
+    """Pages survive reopening the database."""
+    path = tmp_path / "pages.sqlite"
+    cache = SQLitePageCache(path)
+    cache.set("Page", CachedPage(PAGE, 12.5))
+    cache.close()
+
+    reopened = SQLitePageCache(path)
+    assert reopened.get("Page") == CachedPage(PAGE, 12.5)
+    assert reopened.get("Unknown") is None
+    assert len(reopened) == 1
+    reopened.close()
+
+
+def test_sqlite_page_cache__word_counts(sqlite_cache: SQLitePageCache):
+    """Word counts are stored per revision and dropped when a new revision is cached."""
+    key = CountsKey("Page", 7, "normalization")
+    sqlite_cache.set("Page", CachedPage(PAGE, 1))
+    sqlite_cache.set_counts(key, Counter({"some": 1, "text": 1}))
+    assert sqlite_cache.get_counts(key) == Counter({"some": 1, "text": 1})
+    assert sqlite_cache.get_counts(key._replace(normalization_key="other")) is None
+
+    sqlite_cache.set("Page", CachedPage(PAGE._replace(revision_id=8), 2))
+    assert sqlite_cache.get_counts(key) is None
+
+
+@pytest.mark.anyio
+async def test_sqlite_page_cache__flush_writes_buffered(tmp_path: Path):
+    """Stored pages and counts are served at once, and only written to the database by `flush`."""
+    path = tmp_path / "pages.sqlite"
+    cache = SQLitePageCache(path)
+    reader = SQLitePageCache(path)
+    key = CountsKey("Page", 7, "normalization")
+    cache.set("Page", CachedPage(PAGE, 1))
+    cache.set_counts(key, Counter({"some": 1}))
+
+    assert cache.get("Page") == CachedPage(PAGE, 1)
+    assert len(cache) == 1
+    assert reader.get("Page") is None
+
+    await cache.flush()
+    assert reader.get("Page") == CachedPage(PAGE, 1)
+    assert reader.get_counts(key) == Counter({"some": 1})
+
+    # Buffered again or for the first time, every page is counted once
+    cache.set("Page", CachedPage(PAGE, 2))
+    cache.set("Other", CachedPage(PAGE, 2))
+    assert len(cache) == 2
+    cache.close()
+    reader.close()
+
+
+def test_sqlite_page_cache__reads_during_write(tmp_path: Path):
+    """Lookups read the last commit while another transaction writes."""
+    path = tmp_path / "pages.sqlite"
+    cache = SQLitePageCache(path)
+    cache.set("Page", CachedPage(PAGE, 1))
+    cache.close()
+
+    cache = SQLitePageCache(path)
+    writer = sqlite3.connect(path, timeout=0)
+    try:
+        writer.execute("BEGIN EXCLUSIVE")
+        writer.execute("DELETE FROM pages")
+        assert cache.get("Page") == CachedPage(PAGE, 1)
+        assert len(cache) == 1
+    finally:
+        writer.rollback()
+        writer.close()
+        cache.close()
+
+
+@pytest.mark.parametrize("tier", ["memory", "sqlite"])
+def test_page_cache__stale_pages(tier: str, sqlite_cache: SQLitePageCache):
+    """The pages fetched before a time are returned oldest first, up to the limit."""
+    cache = LRUPageCache(10) if tier == "memory" else sqlite_cache
+    for title, fetched_at in [("A", 3), ("B", 1), ("C", 2), ("D", 9)]:
+        cache.set(title, CachedPage(PAGE, fetched_at))
+
+    assert list(cache.stale_pages(5, limit=2)) == ["B", "C"]
+    assert cache.stale_pages(5, limit=10)["A"] == CachedPage(PAGE, 3)
+    assert cache.stale_pages(1, limit=10) == {}
+
+
+def test_tiered_page_cache__promotes_to_faster_tier(sqlite_cache: SQLitePageCache):
+    """A page found on disk is copied to the memory tier."""
+    memory = LRUPageCache(max_size=10)
+    cache = TieredPageCache(memory, sqlite_cache)
+    sqlite_cache.set("Page", CachedPage(PAGE, 1))
+
+    assert cache.get("Page") == CachedPage(PAGE, 1)
+    assert memory.get("Page") == CachedPage(PAGE, 1)
+
+
+def test_create_page_cache__tiers(tmp_path: Path):
+    """The tiers are created according to the settings."""
+    assert len(create_page_cache(0).tiers) == 0
+    assert [type(tier) for tier in create_page_cache(10, tmp_path / "pages.sqlite").tiers] == [
+        LRUPageCache,
+        SQLitePageCache,
+    ]
+
+
+# MARK: CachingPageSource Tests
+
+
+@pytest.mark.anyio
+async def test_caching_page_source__fetches_each_page_once():
+    """Fresh cached pages are served without calling the client."""
+    client = FakeWikiClient()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+
+    assert await source.get_pages_content(["Page"]) == {"Page": PAGE}
+    assert await source.get_pages_content(["Other", "Page"]) == {
+        "Other": client.pages["Other"],
+        "Page": PAGE,
+    }
+    assert client.fetched == ["Page", "Other"]
+    assert client.revalidated == []
+    assert source.stats == CacheStats(hits=1, misses=2)
+
+
+@pytest.mark.anyio
+async def test_caching_page_source__flushes_in_background(tmp_path: Path):
+    """The fetched pages and their counts are written to the disk tier without being awaited."""
+    path = tmp_path / "pages.sqlite"
+    source = CachingPageSource(FakeWikiClient(), SQLitePageCache(path), ttl=60)
+    pages = await source.get_pages_content(["Page", "Other"])
+    await source.count_page("Page", pages["Page"])
+
+    await source.flush()
+    reader = SQLitePageCache(path)
+    assert len(reader) == 2
+    assert reader.get_counts(CountsKey("Page", 7, NORMALIZATION_KEY)) == count_words("some text")
+    reader.close()
+    source.cache.close()
+
+
+@pytest.mark.anyio
+async def test_caching_page_source__revalidates_unchanged_page():
+    """A stale page with an unchanged revision is not downloaded again."""
+    client = FakeWikiClient()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+    await source.get_pages_content(["Page"])
+
+    with patch("wikicounter.cache.time", return_value=10**10):
+        assert await source.get_pages_content(["Page"]) == {"Page": PAGE}
+
+    assert client.fetched == ["Page"]
+    assert client.revalidated == ["Page"]
+    assert source.stats == CacheStats(hits=1, misses=1, revalidations=1)
+
+
+@pytest.mark.anyio
+async def test_caching_page_source__refetches_changed_page():
+    """A stale page with a new revision is downloaded again."""
+    client = FakeWikiClient()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+    await source.get_pages_content(["Page"])
+    client.pages["Page"] = PageContent("new text", [], 8)
+
+    with patch("wikicounter.cache.time", return_value=10**10):
+        assert await source.get_pages_content(["Page"]) == {"Page": client.pages["Page"]}
+
+    assert client.fetched == ["Page", "Page"]
+    assert source.stats == CacheStats(hits=0, misses=2)
+
+
+@pytest.mark.anyio
+async def test_caching_page_source__joins_fetches_in_flight():
+    """Pages being fetched for another crawl are awaited instead of being fetched again."""
+    client = FakeWikiClient()
+    client.release.clear()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+    first = asyncio.ensure_future(source.get_pages_content(["Page"]))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(source.get_pages_content(["Other", "Page"]))
+    await asyncio.sleep(0)
+    client.release.set()
+
+    assert await first == {"Page": PAGE}
+    assert await second == {"Other": client.pages["Other"], "Page": PAGE}
+    assert client.fetched == ["Page", "Other"]
+    assert source.stats == CacheStats(hits=0, misses=3, coalesced=1)
+
+
+@pytest.mark.anyio
+async def test_caching_page_source__counts_each_revision_once():
+    """Word counts are computed once per page revision and served from the cache afterwards."""
+    client = FakeWikiClient()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+    page = (await source.get_pages_content(["Page"]))["Page"]
+
+    with patch("wikicounter.tokenization.count_words", wraps=count_words) as mock_count_words:
+        assert await source.count_page("Page", page) == Counter({"some": 1, "text": 1})
+        assert await source.count_page("Page", page) == Counter({"some": 1, "text": 1})
+        await source.count_page("Page", page._replace(revision_id=8))
+
+    assert mock_count_words.call_count == 2
+    assert source.counts_stats == CacheStats(hits=1, misses=2)
+
+
+@pytest.mark.anyio
+async def test_caching_page_source__refresh():
+    """Stale pages are revalidated, and the changed ones are fetched and counted again."""
+    client = FakeWikiClient()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+    await source.get_pages_content(["Page", "Other"])
+    client.pages["Other"] = PageContent("new text", [], 4)
+
+    with patch("wikicounter.cache.time", return_value=10**10):
+        assert await source.refresh(fetched_before=10**10) == 2
+        assert await source.refresh(fetched_before=10**10) == 0
+        assert await source.get_pages_content(["Page", "Other"]) == {
+            "Page": PAGE,
+            "Other": client.pages["Other"],
+        }
+
+    assert client.fetched == ["Page", "Other", "Other"]
+    assert source.stats == CacheStats(hits=2, misses=2, refreshed=2)
+    assert source.cache.get_counts(CountsKey("Other", 4, NORMALIZATION_KEY)) == Counter(
+        {"new": 1, "text": 1},
+    )
+
+
+@pytest.mark.anyio
+async def test_page_refresher__refreshes_before_expiry():
+    """A pass refreshes the pages expiring before the next pass, in batches."""
+    client = FakeWikiClient()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+    await source.get_pages_content(["Page", "Other"])
+    refresher = PageRefresher(source, interval=30)
+
+    assert await refresher.refresh_once() == 0
+    with (
+        patch("wikicounter.cache.time", return_value=10**10),
+        patch("wikicounter.cache.REFRESH_BATCH_SIZE", 1),
+    ):
+        assert await refresher.refresh_once() == 2
+    assert sorted(client.revalidated) == ["Other", "Page"]
+
+
+@pytest.mark.anyio
+async def test_page_refresher__start_and_close():
+    """The refresher runs in the background until it is closed."""
+    source = CachingPageSource(FakeWikiClient(), LRUPageCache(10), ttl=0)
+    refresher = PageRefresher(source, interval=0.001)
+    with patch.object(source, "refresh", wraps=source.refresh) as mock_refresh:
+        refresher.start()
+        await asyncio.sleep(0.05)
+        await refresher.aclose()
+    assert mock_refresh.call_count > 0
+
+
+# MARK: ResultCache Tests
+
+
+def test_result_cache__evicts_by_size():
+    """The least recently used results are evicted when their total size exceeds the limit."""
+    cache: ResultCache[str, str] = ResultCache(max_size=100, ttl=60)
+    cache.set("a", "A", 40)
+    cache.set("b", "B", 40)
+    assert cache.get("a") == "A"  # "b" becomes the least recently used
+    cache.set("c", "C", 40)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "C"
+    assert cache.stats == ResultCacheStats(hits=2, misses=1, evictions=1, entries=2, size=80)
+
+
+def test_result_cache__too_large_or_disabled():
+    """Results larger than the whole cache are not stored."""
+    cache: ResultCache[str, str] = ResultCache(max_size=10, ttl=60)
+    cache.set("a", "A", 11)
+    assert len(cache) == 0
+    assert len(ResultCache(max_size=0, ttl=60)) == 0
+
+
+def test_result_cache__expires():
+    """Results older than the TTL are not served."""
+    cache: ResultCache[str, str] = ResultCache(max_size=100, ttl=60)
+    cache.set("a", "A", 10)
+
+    with patch("wikicounter.cache.time", return_value=10**10):
+        assert cache.get("a") is None
+    assert cache.stats == ResultCacheStats(misses=1)
+
+
+def test_result_cache__invalidate():
+    """Results are invalidated by a predicate on their key, or all at once."""
+    cache: ResultCache[str, str] = ResultCache(max_size=100, ttl=60)
+    for key in ("a1", "a2", "b1"):
+        cache.set(key, key.upper(), 10)
+
+    assert cache.invalidate(lambda key: key.startswith("a")) == 2
+    assert cache.get("b1") == "B1"
+    assert cache.invalidate() == 1
+    assert cache.stats.size == 0
@@ -0,0 +1,80 @@
+"""Tests for the coalescing module."""
+
+import asyncio
+
+import pytest
+
+from wikicounter.coalescing import FlightStats, SingleFlight
+
+
+class Call:
+    """Count the started calls and return their number once released."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await self.release.wait()
+        return self.calls
+
+
+@pytest.mark.anyio
+async def test_single_flight__shares_concurrent_calls():
+    """Concurrent callers of the same key share one call and its result."""
+    flights: SingleFlight[str, int] = SingleFlight()
+    call = Call()
+    waiters = [asyncio.ensure_future(flights.run("key", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    call.release.set()
+
+    assert await asyncio.gather(*waiters) == [1, 1, 1]
+    assert call.calls == 1
+    assert flights.stats == FlightStats(started=1, shared=2)
+    assert len(flights) == 0
+
+
+@pytest.mark.anyio
+async def test_single_flight__different_keys_and_later_calls():
+    """Different keys run separately, and a finished call is not reused."""
+    flights: SingleFlight[str, int] = SingleFlight()
+    call = Call()
+    call.release.set()
+
+    assert await asyncio.gather(flights.run("a", call), flights.run("b", call)) == [1, 2]
+    assert await flights.run("a", call) == 3
+    assert flights.stats == FlightStats(started=3, shared=0)
+
+
+@pytest.mark.anyio
+async def test_single_flight__cancelled_caller():
+    """Cancelling one caller does not cancel the call for the others."""
+    flights: SingleFlight[str, int] = SingleFlight()
+    call = Call()
+    first = asyncio.ensure_future(flights.run("key", call))
+    second = asyncio.ensure_future(flights.run("key", call))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    call.release.set()
+    assert await second == 1
+    assert first.cancelled()
+
+
+@pytest.mark.anyio
+async def test_single_flight__exception():
+    """The exception of a shared call is raised to every caller."""
+    flights: SingleFlight[str, int] = SingleFlight()
+
+    async def fail() -> int:
+        await asyncio.sleep(0)
+        raise ValueError
+
+    results = await asyncio.gather(
+        flights.run("key", fail),
+        flights.run("key", fail),
+        return_exceptions=True,
+    )
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert len(flights) == 0
@@ -1,4 +1,5 @@
 from collections import Counter
+from collections.abc import AsyncIterator, Iterator
 from unittest.mock import patch
 
 import pytest
@@ -6,12 +7,20 @@ from fastapi.testclient import TestClient
 
 from wikicounter.counting import WordFrequency
 from wikicounter.main import app
+from wikicounter.wiki_connection import CrawlResult, PageVisit
 
 
 @pytest.fixture(name="client")
-def fixture_client() -> TestClient:
-    """Fixture to create a FastAPI test client."""
-    return TestClient(app)
+def fixture_client() -> Iterator[TestClient]:
+    """Fixture to create a FastAPI test client with the application lifespan running."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    """Run the `anyio` marked async tests on asyncio only."""
+    return "asyncio"
 
 
 # MARK: Mocking Fixtures
@@ -21,8 +30,11 @@ def fixture_client() -> TestClient:
 def mock_walk_pages():
     """Mock the walk_pages function to avoid actual Wikipedia API calls."""
     with patch("wikicounter.main.walk_pages") as mock:
-        # Return a predefined counter for any call
-        mock.return_value = Counter({"python": 10, "programming": 8, "language": 5})
+        # Return a predefined crawl result for any call
+        mock.return_value = CrawlResult(
+            Counter({"python": 10, "programming": 8, "language": 5}),
+            pages_visited=3,
+        )
         yield mock
 
 
@@ -37,3 +49,15 @@ def mock_create_frequency_dict():
             "language": WordFrequency(word_count=5, frequency_percent=21.74),
         }
         yield mock
+
+
+@pytest.fixture
+def mock_iter_pages():
+    """Mock the iter_pages function used by the streaming responses."""
+
+    async def visit_pages(*_args: object, **_kwargs: object) -> AsyncIterator[PageVisit]:
+        yield PageVisit("Python", 0, Counter({"python": 10, "programming": 8}))
+        yield PageVisit("Guido", 1, Counter({"python": 2, "language": 5}))
+
+    with patch("wikicounter.main.iter_pages", side_effect=visit_pages) as mock:
+        yield mock
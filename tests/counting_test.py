@@ -1,14 +1,28 @@
 """Tests for the counting module."""
 
+import random
+import tracemalloc
 from collections import Counter
+from unittest.mock import patch
 
 import pytest
 
 from wikicounter.counting import (
+    ApproximateCounter,
+    Approximation,
+    CountMinSketch,
+    ErrorBounds,
+    HyperLogLog,
+    Vocabulary,
+    VocabularyCounter,
     WordFrequency,
     _normalize_word,
+    _select_top_words,
+    _select_top_words_numpy,
     count_words,
     create_frequency_dict,
+    normalize_words,
+    remove_words,
 )
 
 
@@ -45,6 +59,24 @@ def test_count_words__empty_string():
     assert result == expected
 
 
+def test_remove_words(word_counter):
+    """Test that ignored words are removed in place, unknown words are skipped."""
+    result = remove_words(word_counter, ["hello", "unknown"])
+    assert result is word_counter
+    assert result == Counter({"world": 3, "test": 2})
+
+
+def test_remove_words__no_ignore_list(word_counter):
+    """Test that nothing is removed without an ignore list."""
+    assert remove_words(word_counter, None) == Counter({"hello": 5, "world": 3, "test": 2})
+
+
+def test_normalize_words():
+    """Test that words are normalized like the counted words and deduplicated."""
+    assert normalize_words(["The", "the", "(and)", "Python!"]) == {"the", "and", "python"}
+    assert normalize_words(None) == frozenset()
+
+
 @pytest.mark.parametrize(
     ("input_word", "expected"),
     [
@@ -139,3 +171,236 @@ def test_create_frequency_dict__with_low_limit(word_counter):
         "test": WordFrequency(word_count=2, frequency_percent=20),
     }
     assert result == expected
+
+
+@pytest.fixture(name="tied_counter")
+def fixture_tied_counter() -> Counter:
+    """A counter with many ties, where the selection order is decided by the insertion order."""
+    return Counter({f"word{index}": (index * 7) % 13 + 1 for index in range(1_000)})
+
+
+@pytest.mark.parametrize("keep_count", [1, 10, 77, 500, 1_000])
+def test_select_top_words__matches_most_common(tied_counter, keep_count):
+    """Test that every selection path returns the same words in the same order as most_common."""
+    assert _select_top_words(tied_counter, keep_count) == tied_counter.most_common(keep_count)
+
+
+@pytest.mark.parametrize("keep_count", [1, 10, 77, 500, 999])
+def test_select_top_words_numpy__matches_most_common(tied_counter, keep_count):
+    """Test that the NumPy selection keeps the most_common order, including ties."""
+    pytest.importorskip("numpy")
+    assert _select_top_words_numpy(tied_counter, keep_count) == tied_counter.most_common(keep_count)
+
+
+def test_create_frequency_dict__large_vocabulary(tied_counter):
+    """Test that the percentile selection of a large vocabulary keeps the most common words."""
+    with patch("wikicounter.counting.NUMPY_SELECTION_MIN_VOCABULARY", 100):
+        result = create_frequency_dict(tied_counter, percentile=99)
+
+    assert list(result.items()) == [
+        (word, WordFrequency(count, round(count / sum(tied_counter.values()) * 100, 4)))
+        for word, count in tied_counter.most_common(10)
+    ]
+
+
+# MARK: Compact Counting Tests
+
+
+def test_vocabulary__intern():
+    """Test that the words get dense ids, and no new ids once the vocabulary is full."""
+    vocabulary = Vocabulary(max_words=2)
+
+    assert [vocabulary.intern(word) for word in ["world", "hello", "world", "full"]] == [
+        0,
+        1,
+        0,
+        None,
+    ]
+    assert vocabulary.words == ["world", "hello"]
+    assert vocabulary.get_id("hello") == 1
+    assert vocabulary.get_id("full") is None
+
+
+def test_vocabulary_counter__merges_like_counter(tied_counter):
+    """Test that merged counters give the same counts as a Counter, across compactions."""
+    word_counter = VocabularyCounter(Vocabulary())
+    word_counter.update(tied_counter)
+    assert word_counter["word1"] == tied_counter["word1"]
+    word_counter.update(Counter({"word1": 5, "new": 1}))
+
+    expected = tied_counter + Counter({"word1": 5, "new": 1})
+    assert dict(word_counter.items()) == expected
+    assert (len(word_counter), word_counter.total()) == (len(expected), expected.total())
+    assert word_counter["word1"] == expected["word1"]
+    assert word_counter["unknown"] == 0
+
+
+def test_vocabulary_counter__full_vocabulary():
+    """Test that the words a full vocabulary does not intern are counted by word."""
+    vocabulary = Vocabulary(max_words=1)
+    word_counter = VocabularyCounter(vocabulary)
+    word_counter.update(Counter({"common": 3, "rare": 1}))
+    word_counter.update(Counter({"rare": 1, "common": 1}))
+
+    assert vocabulary.words == ["common"]
+    assert dict(word_counter.items()) == {"common": 4, "rare": 2}
+    assert word_counter.most_common(1) == [("common", 4)]
+    del word_counter["rare"]
+    assert (len(word_counter), word_counter.total()) == (1, 4)
+
+
+def test_vocabulary_counter__sized_by_own_words():
+    """Test that a counter only holds its own words, not the whole shared vocabulary."""
+    vocabulary = Vocabulary()
+    VocabularyCounter(vocabulary).update(Counter({f"word{index}": 1 for index in range(10_000)}))
+    page = Counter({"word9999": 2, "new": 1})
+
+    tracemalloc.start()
+    try:
+        word_counter = VocabularyCounter(vocabulary)
+        word_counter.update(page)
+        assert len(word_counter) == 2
+        _size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Counts for the whole vocabulary would take 80 kB
+    assert peak < 10_000
+    assert list(word_counter.items()) == [("word9999", 2), ("new", 1)]
+
+
+def test_vocabulary_counter__shared_vocabulary():
+    """Test that counters sharing a vocabulary only see their own words."""
+    vocabulary = Vocabulary()
+    first, second = VocabularyCounter(vocabulary), VocabularyCounter(vocabulary)
+    first.update(Counter({"a": 1}))
+    second.update(Counter({"b": 2}))
+
+    assert list(first.items()) == [("a", 1)]
+    assert list(second.items()) == [("b", 2)]
+    assert first["b"] == 0
+
+
+def test_remove_words__vocabulary_counter(word_counter):
+    """Test that the ignored words are removed from a compact counter."""
+    compact = VocabularyCounter(Vocabulary())
+    compact.update(word_counter)
+
+    remove_words(compact, ["hello", "unknown"])
+    assert dict(compact.items()) == {"world": 3, "test": 2}
+
+
+@pytest.mark.parametrize("percentile", [0, 50, 99])
+def test_create_frequency_dict__vocabulary_counter(tied_counter, percentile):
+    """Test that the frequency dictionary of a compact counter is the same as of a Counter."""
+    compact = VocabularyCounter(Vocabulary())
+    compact.update(tied_counter)
+
+    assert create_frequency_dict(compact, percentile) == create_frequency_dict(
+        tied_counter,
+        percentile,
+    )
+
+
+# MARK: Approximate Counting Tests
+
+
+@pytest.fixture(name="zipf_pages")
+def fixture_zipf_pages() -> list[Counter]:
+    """Pages drawing their words from a Zipf-like vocabulary, with a long tail of rare words."""
+    rng = random.Random(42)  # noqa: S311
+    vocabulary = [f"word{rank}" for rank in range(20_000)]
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    return [Counter(rng.choices(vocabulary, weights, k=500)) for _ in range(100)]
+
+
+def test_count_min_sketch__never_underestimates(zipf_pages):
+    """Test that the estimates are at least the exact counts, and exact without collisions."""
+    sketch = CountMinSketch.for_error(0.01, 0.99)
+    assert (sketch.width, sketch.depth) == (272, 5)
+    exact = Counter()
+    for page in zipf_pages:
+        sketch.update(page)
+        exact.update(page)
+    assert all(sketch.estimate(word) >= count for word, count in exact.items())
+
+    sketch = CountMinSketch(1_000_000, 2)
+    sketch.add("hello", 3)
+    sketch.add("world")
+    assert (sketch.estimate("hello"), sketch.estimate("world"), sketch.estimate("other")) == (
+        3,
+        1,
+        0,
+    )
+
+
+def test_hyper_log_log__estimate():
+    """Test that the distinct items are estimated within a few percent, repeats are not counted."""
+    distinct = HyperLogLog()
+    assert distinct.estimate() == 0
+    distinct.add("hello")
+    distinct.update(["hello", "world"])
+    assert distinct.estimate() == 2
+
+    distinct.update(f"word{index}" for index in range(100_000))
+    distinct.update(f"word{index}" for index in range(50_000))
+    assert distinct.estimate() == pytest.approx(100_002, rel=0.05)
+
+
+def test_approximate_counter__distinct_words(zipf_pages):
+    """Test that the distinct words are estimated beyond the tracked ones, without the removed ones."""
+    approximate = ApproximateCounter(Approximation(top_words=100))
+    exact = Counter()
+    for page in zipf_pages:
+        approximate.update(page)
+        exact.update(page)
+    remove_words(approximate, ["word0", "missing"])
+
+    assert approximate.distinct_words() == pytest.approx(len(exact) - 1, rel=0.05)
+    assert approximate.error_bounds().distinct_words == approximate.distinct_words()
+
+
+def test_approximate_counter__exact_below_top_words(word_counter):
+    """Test that the counts are exact while every word is tracked."""
+    approximate = ApproximateCounter(Approximation(top_words=10))
+    approximate.update(word_counter)
+
+    assert dict(approximate.items()) == word_counter
+    assert approximate.total() == word_counter.total()
+    assert approximate.error_bounds() == ErrorBounds(0, 1.0, 3, 3)
+
+
+def test_approximate_counter__heavy_hitters(zipf_pages):
+    """Test that the most frequent words are found, with counts within the error bounds."""
+    approximate = ApproximateCounter(Approximation(error=0.001, confidence=0.99, top_words=200))
+    exact = Counter()
+    for page in zipf_pages:
+        approximate.update(page)
+        exact.update(page)
+
+    bounds = approximate.error_bounds()
+    assert bounds.tracked_words == len(approximate) == 200
+    assert approximate.total() == exact.total()
+    for word, count in approximate.items():
+        assert exact[word] <= count <= exact[word] + bounds.max_overcount
+    assert all(approximate[word] >= count for word, count in exact.items())
+    top_words = [word for word, _count in exact.most_common(20)]
+    assert [word for word, _count in approximate.most_common(20)] == top_words
+
+
+def test_create_frequency_dict__approximate_counter(zipf_pages):
+    """Test that the frequencies are relative to every counted word, without the ignored ones."""
+    approximate = ApproximateCounter(Approximation(top_words=100))
+    exact = Counter()
+    for page in zipf_pages:
+        approximate.update(page)
+        exact.update(page)
+    remove_words(approximate, ["word0"])
+    del exact["word0"]
+
+    result = create_frequency_dict(approximate, percentile=99.9)
+    assert "word0" not in result
+    assert abs(len(result) - len(exact) // 1000) <= 1
+    assert list(result) == [word for word, _count in exact.most_common(len(result))]
+    word_count, percent = result["word1"]
+    assert percent == round(word_count / exact.total() * 100, 4)
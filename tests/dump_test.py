@@ -0,0 +1,177 @@
+"""Tests for the dump module."""
+
+import bz2
+import html
+import json
+from pathlib import Path
+
+import pytest
+
+from wikicounter.dump import DumpPageSource, iter_dump_pages, main
+from wikicounter.wiki_connection import PageContent, walk_pages
+
+HEADER = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/" version="0.11" xml:lang="en">
+  <siteinfo>
+    <sitename>Wikipedia</sitename>
+  </siteinfo>
+"""
+
+FOOTER = "</mediawiki>\n"
+
+PAGES = [
+    ("Root", 0, 101, None, "The '''root''' links [[Child A]] and [[Child B|the b child]]."),
+    ("Child A", 0, 102, None, "Child words.{{Infobox|name=x}} [[Root]] [[Category:Trees]]"),
+    ("Child B", 0, 103, None, "Child b &amp; more<ref>a citation</ref> [[grandchild]]"),
+    ("Grandchild", 0, 104, None, "== Deep ==\nDeep words [[File:Leaf.png|thumb|a leaf]]"),
+    ("Kid A", 0, 105, "Child A", "#REDIRECT [[Child A]]"),
+    ("Talk:Root", 1, 106, None, "Talk words"),
+]
+
+
+def page_xml(title: str, namespace: int, revision_id: int, redirect: str | None, text: str) -> str:
+    redirect_tag = "" if redirect is None else f'<redirect title="{redirect}" />'
+    return f"""  <page>
+    <title>{title}</title>
+    <ns>{namespace}</ns>
+    <id>{revision_id - 100}</id>
+    {redirect_tag}
+    <revision>
+      <id>{revision_id}</id>
+      <text bytes="{len(text)}" xml:space="preserve">{html.escape(text)}</text>
+    </revision>
+  </page>
+"""
+
+
+@pytest.fixture(name="xml_dump")
+def fixture_xml_dump(tmp_path: Path) -> Path:
+    """Uncompressed dump of the test pages."""
+    path = tmp_path / "pages-articles.xml"
+    path.write_text(HEADER + "".join(page_xml(*page) for page in PAGES) + FOOTER)
+    return path
+
+
+@pytest.fixture(name="bz2_dump")
+def fixture_bz2_dump(tmp_path: Path) -> Path:
+    """Multistream bzip2 dump of the test pages, with two pages per stream."""
+    pages = [page_xml(*page) for page in PAGES]
+    streams = [HEADER, *("".join(pages[start : start + 2]) for start in range(0, len(pages), 2))]
+    path = tmp_path / "pages-articles-multistream.xml.bz2"
+    path.write_bytes(b"".join(bz2.compress(stream.encode()) for stream in [*streams, FOOTER]))
+    return path
+
+
+@pytest.fixture(name="dump", params=["xml_dump", "bz2_dump"])
+def fixture_dump(request) -> Path:
+    """Each of the dump formats."""
+    return request.getfixturevalue(request.param)
+
+
+def test_dump_page_source__get_page_content(dump: Path):
+    """A page is read from its indexed offset, as plain text with its article links."""
+    with DumpPageSource(dump, ":memory:") as source:
+        assert len(source) == 5
+        assert source.get_page_content("Child_A") == PageContent(
+            "Child words. Root ",
+            ["Root"],
+            102,
+        )
+        assert source.get_page_content("Grandchild").links == []
+
+
+def test_dump_page_source__redirect(dump: Path):
+    """Redirects are followed to their target."""
+    with DumpPageSource(dump, ":memory:") as source:
+        assert source.get_page_content("Kid A") == source.get_page_content("Child A")
+
+
+def test_dump_page_source__missing_page(dump: Path):
+    """Missing pages and the pages of other namespaces are empty."""
+    with DumpPageSource(dump, ":memory:") as source:
+        assert source.get_page_content("Missing") == PageContent("", [])
+        assert source.get_page_content("Talk:Root") == PageContent("", [])
+
+
+def test_dump_page_source__reuses_index(xml_dump: Path):
+    """The index is stored next to the dump and rebuilt when the dump changes."""
+    DumpPageSource(xml_dump).close()
+    assert xml_dump.with_name(f"{xml_dump.name}.index.sqlite").exists()
+
+    xml_dump.write_text(HEADER + page_xml("New", 0, 200, None, "new words") + FOOTER)
+    with DumpPageSource(xml_dump) as source:
+        assert len(source) == 1
+        assert source.get_page_content("New").page_text == "new words"
+
+
+@pytest.mark.anyio
+async def test_walk_pages__offline(dump: Path):
+    """A crawl runs over the dump without any API call."""
+    with DumpPageSource(dump, ":memory:") as source:
+        crawl = await walk_pages("Root", 2, client=source)
+
+    assert crawl.pages_visited == 4
+    assert crawl.word_counter["words"] == 2
+    assert crawl.word_counter["deep"] == 2
+
+
+def test_iter_dump_pages(dump: Path):
+    """The articles are streamed in order, without redirects and other namespaces."""
+    pages = list(iter_dump_pages(dump))
+    assert [page.title for page in pages] == ["Root", "Child A", "Child B", "Grandchild"]
+    assert pages[2].content.page_text == "Child b & more grandchild"
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_dump__siteinfo_namespaces(tmp_path: Path, compressed: bool):  # noqa: FBT001
+    """The links to the namespaces listed in the siteinfo of the dump are skipped."""
+    siteinfo = """    <namespaces>
+      <namespace key="-1" case="first-letter">Spezial</namespace>
+      <namespace key="0" case="first-letter" />
+      <namespace key="14" case="first-letter">Kategorie</namespace>
+    </namespaces>
+  </siteinfo>"""
+    header = HEADER.replace("  </siteinfo>", siteinfo)
+    page = page_xml("Root", 0, 101, None, "[[Kategorie:A]] [[Category:B]] [[Tom: C]] [[de:D]]")
+    xml = header + page + FOOTER
+    path = tmp_path / "pages-articles.xml"
+    if compressed:
+        path = path.with_suffix(".xml.bz2")
+        path.write_bytes(bz2.compress(xml.encode()))
+    else:
+        path.write_text(xml)
+
+    with DumpPageSource(path, ":memory:") as source:
+        assert source.get_page_content("Root").links == ["Category:B", "Tom: C"]
+    [page] = iter_dump_pages(path)
+    assert page.content.links == ["Category:B", "Tom: C"]
+
+
+def test_main__crawl(xml_dump: Path, capsys):
+    """The command line crawls from an article and prints the frequencies as JSON."""
+    main([str(xml_dump), "Root", "--depth", "1", "--ignore", "The", "--format", "columnar"])
+
+    output = json.loads(capsys.readouterr().out)
+    assert output["pages_visited"] == 3
+    assert output["word_frequency"]["words"][0] == "child"
+    assert "the" not in output["word_frequency"]["words"]
+
+
+def test_main__whole_dump(bz2_dump: Path, capsys):
+    """Without an article, every article of the dump is counted."""
+    main([str(bz2_dump)])
+
+    output = json.loads(capsys.readouterr().out)
+    assert output["start_article"] is None
+    assert output["pages_visited"] == 4
+    assert not output["truncated"]
+    assert output["word_frequency"]["words"] == [2, 10.0]
+
+
+@pytest.mark.parametrize(("max_pages", "truncated"), [(1, True), (4, False)])
+def test_main__whole_dump_max_pages(bz2_dump: Path, capsys, max_pages: int, truncated: bool):  # noqa: FBT001
+    """The whole dump count is truncated when the page limit leaves articles uncounted."""
+    main([str(bz2_dump), "--max-pages", str(max_pages)])
+
+    output = json.loads(capsys.readouterr().out)
+    assert output["pages_visited"] == max_pages
+    assert output["truncated"] is truncated
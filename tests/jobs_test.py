@@ -0,0 +1,207 @@
+"""Tests for the jobs module."""
+
+import asyncio
+from collections import Counter
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from unittest.mock import patch
+
+import orjson
+import pytest
+
+from wikicounter.jobs import CrawlJob, JobLimitError, JobScheduler, JobSource, JobStatus
+from wikicounter.sites import Site
+from wikicounter.wiki_connection import CrawlState, PageContent, WikiApiError
+
+LINK_GRAPH = {
+    "Root": PageContent("root words", ["Child A", "Child B"]),
+    "Child A": PageContent("child words", ["Root", "Grandchild"]),
+    "Child B": PageContent("child b", ["Child A", "Grandchild"]),
+    "Grandchild": PageContent("deep words", ["Root"]),
+}
+
+
+class FakeClient:
+    """Serve pages from the in-memory link graph, optionally blocking on some of them."""
+
+    def __init__(self, blocked: Iterable[str] = ()) -> None:
+        self.fetched: list[str] = []
+        self.blocked = set(blocked)
+        self.waiting = asyncio.Event()
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        titles = list(page_titles)
+        if self.blocked.intersection(titles):
+            self.waiting.set()
+            await asyncio.Future()
+        if "Error" in titles:
+            msg = "Bad request"
+            raise WikiApiError(msg)
+        if "Broken" in titles:
+            msg = "Unreadable response"
+            raise ValueError(msg)
+        self.fetched.extend(titles)
+        return {title: LINK_GRAPH.get(title, PageContent("", [])) for title in titles}
+
+
+def sources(client: FakeClient) -> Callable[[Site], JobSource]:
+    """Crawls the pages of every site from the client."""
+    return lambda _site: JobSource(client)
+
+
+async def wait_finished(scheduler: JobScheduler, job_id: str) -> CrawlJob:
+    """Waits until the job is finished."""
+    for _ in range(200):
+        job = scheduler.get(job_id)
+        assert job is not None
+        if job.status.finished:
+            return job
+        await asyncio.sleep(0.01)
+    pytest.fail(f"Job {job_id} did not finish")
+
+
+@pytest.mark.anyio
+async def test_job__completes():
+    """A job crawls the pages in the background and merges their counts."""
+    scheduler = JobScheduler(sources(FakeClient()))
+    scheduler.start()
+    try:
+        job = scheduler.submit("Root", 2, ignore_words=["child"])
+        assert job.status is JobStatus.QUEUED
+        job = await wait_finished(scheduler, job.id)
+    finally:
+        await scheduler.aclose()
+
+    assert job.status is JobStatus.COMPLETED
+    assert job.pages_visited == 4
+    assert job.word_counts == {"words": 3, "root": 1, "b": 1, "deep": 1}
+    assert job.state is None
+
+
+@pytest.mark.anyio
+async def test_job__failure():
+    """A job whose crawl fails keeps the error."""
+    scheduler = JobScheduler(sources(FakeClient()))
+    scheduler.start()
+    try:
+        job = await wait_finished(scheduler, scheduler.submit("Error", 0).id)
+    finally:
+        await scheduler.aclose()
+
+    assert job.status is JobStatus.FAILED
+    assert job.error == "Bad request"
+
+
+@pytest.mark.anyio
+async def test_job__unexpected_failure():
+    """A job failing with any other error is finished, and does not hold a worker."""
+    scheduler = JobScheduler(sources(FakeClient()), workers=1)
+    scheduler.start()
+    try:
+        job = await wait_finished(scheduler, scheduler.submit("Broken", 0).id)
+        completed = await wait_finished(scheduler, scheduler.submit("Root", 0).id)
+    finally:
+        await scheduler.aclose()
+
+    assert job.status is JobStatus.FAILED
+    assert job.error == "Unreadable response"
+    assert job.state is None
+    assert completed.status is JobStatus.COMPLETED
+
+
+@pytest.mark.anyio
+async def test_job__resumes_from_checkpoint(tmp_path: Path):
+    """An interrupted job is resumed by the next scheduler, without counting any page twice."""
+    client = FakeClient(blocked=["Grandchild"])
+    scheduler = JobScheduler(sources(client), tmp_path, checkpoint_interval=0)
+    progress = set()
+    snapshot = CrawlJob.snapshot
+
+    def record_progress(job: CrawlJob) -> dict:
+        progress.add((job.pages_visited, job.bytes_fetched))
+        return snapshot(job)
+
+    with patch.object(CrawlJob, "snapshot", autospec=True, side_effect=record_progress):
+        scheduler.start()
+        job_id = scheduler.submit("Root", 2).id
+        await asyncio.wait_for(client.waiting.wait(), timeout=1)
+        await scheduler.aclose()
+    # Every checkpoint charges the bytes of the merged pages, not of their whole batch
+    merged_bytes = [0, 10, 21, 28]
+    assert progress == {(pages, merged_bytes[pages]) for pages in range(4)}
+
+    checkpoint = CrawlJob.from_json((tmp_path / f"{job_id}.json").read_bytes())
+    assert checkpoint.status is JobStatus.RUNNING
+    assert checkpoint.pages_visited == 3
+    # Only the merged pages, the blocked batch is fetched and charged again on resume
+    assert checkpoint.bytes_fetched == len("root words") + len("child words") + len("child b")
+    assert checkpoint.state == CrawlState(
+        depth=2,
+        frontier=["Grandchild"],
+        visited={"Root", "Child A", "Child B", "Grandchild"},
+    )
+
+    client = FakeClient()
+    scheduler = JobScheduler(sources(client), tmp_path)
+    scheduler.start()
+    try:
+        job = await wait_finished(scheduler, job_id)
+    finally:
+        await scheduler.aclose()
+
+    assert client.fetched == ["Grandchild"]
+    assert job.pages_visited == 4
+    assert job.bytes_fetched == checkpoint.bytes_fetched + len("deep words")
+    assert job.word_counts == {"words": 3, "child": 2, "root": 1, "b": 1, "deep": 1}
+
+
+@pytest.mark.anyio
+async def test_job__remove(tmp_path: Path):
+    """Removing a running job cancels it and deletes its checkpoint."""
+    client = FakeClient(blocked=["Root"])
+    scheduler = JobScheduler(sources(client), tmp_path)
+    scheduler.start()
+    try:
+        job = scheduler.submit("Root", 1)
+        await asyncio.wait_for(client.waiting.wait(), timeout=1)
+        assert scheduler.remove(job.id)
+        await asyncio.sleep(0)
+        assert not scheduler.remove(job.id)
+    finally:
+        await scheduler.aclose()
+
+    assert scheduler.get(job.id) is None
+    assert not list(tmp_path.iterdir())  # noqa: ASYNC240
+
+
+@pytest.mark.anyio
+async def test_job__max_jobs():
+    """The oldest finished job makes room for a new one, unfinished jobs are never dropped."""
+    client = FakeClient(blocked=["Child A"])
+    scheduler = JobScheduler(sources(client), workers=1, max_jobs=2)
+    scheduler.start()
+    try:
+        finished = await wait_finished(scheduler, scheduler.submit("Root", 0).id)
+        scheduler.submit("Child A", 0)
+        scheduler.submit("Child B", 0)
+        assert scheduler.get(finished.id) is None
+        assert len(scheduler) == 2
+
+        with pytest.raises(JobLimitError):
+            scheduler.submit("Grandchild", 0)
+    finally:
+        await scheduler.aclose()
+
+
+def test_job__snapshot():
+    """The snapshot of a job does not follow the changes of the crawl."""
+    state = CrawlState.start("Root")
+    job = CrawlJob("id", "Root", 1, word_counts=Counter({"root": 1}), state=state)
+    snapshot = job.snapshot()
+    job.word_counts["words"] += 1
+    state.frontier.append("Child A")
+    state.visited.add("Child A")
+
+    checkpoint = CrawlJob.from_json(orjson.dumps(snapshot))
+    assert checkpoint.word_counts == {"root": 1}
+    assert checkpoint.state == CrawlState.start("Root")
@@ -0,0 +1,84 @@
+"""Tests for the link_graph module."""
+
+from pathlib import Path
+
+import pytest
+
+from wikicounter.link_graph import LinkEstimate, LinkGraph
+from wikicounter.wiki_connection import PageContent
+
+PAGES = {
+    "Root": PageContent("root", ["A", "B"], 1),
+    "A": PageContent("a", ["Root", "C"], 2),
+    "B": PageContent("b", ["C", "D"], 3),
+}
+
+
+@pytest.fixture(name="link_graph")
+def fixture_link_graph():
+    """Link graph in memory with the links of the test pages."""
+    link_graph = LinkGraph()
+    link_graph.update(PAGES)
+    yield link_graph
+    link_graph.close()
+
+
+@pytest.mark.anyio
+async def test_link_graph__get_links(link_graph: LinkGraph):
+    """Only the known links are returned."""
+    assert await link_graph.get_links(["Root", "C"]) == {"Root": ["A", "B"]}
+    assert len(link_graph) == 3
+
+
+@pytest.mark.anyio
+async def test_link_graph__replaces_links(link_graph: LinkGraph):
+    """The links of a new revision replace the old ones."""
+    link_graph.update({"Root": PageContent("root", ["E"], 4)})
+    assert await link_graph.get_links(["Root"]) == {"Root": ["E"]}
+
+
+@pytest.mark.anyio
+async def test_link_graph__persists(tmp_path: Path):
+    """The links are written in the background, and survive reopening the database."""
+    path = tmp_path / "links.sqlite"
+    link_graph = LinkGraph(path)
+    link_graph.update(PAGES)
+    reader = LinkGraph(path)
+    assert len(reader) == 0
+    await link_graph.flush()
+    assert len(reader) == 3
+    assert len(link_graph) == 3
+    reader.close()
+
+    link_graph.update({"C": PageContent("c", [], 4)})
+    link_graph.close()
+
+    reopened = LinkGraph(path)
+    assert len(reopened) == 4
+    assert await reopened.get_links(["A"]) == {"A": ["Root", "C"]}
+    reopened.close()
+
+
+@pytest.mark.anyio
+async def test_link_graph__get_links_many_titles(link_graph: LinkGraph):
+    """Titles are looked up in chunks below the SQLite variable limit."""
+    titles = [f"Unknown {index}" for index in range(2_000)]
+    assert await link_graph.get_links([*titles, "B"]) == {"B": ["C", "D"]}
+
+
+@pytest.mark.parametrize(
+    ("depth", "limit", "expected", "exact"),
+    [
+        (0, None, LinkEstimate(1, 0), True),
+        (1, None, LinkEstimate(3, 0), True),
+        (2, None, LinkEstimate(5, 0), True),
+        # C and D would be expanded at depth 3, but their links are not known
+        (3, None, LinkEstimate(5, 2), False),
+        (2, 3, LinkEstimate(3, 0, limited=True), False),
+    ],
+)
+def test_link_graph__estimate(link_graph: LinkGraph, depth, limit, expected, exact):
+    """The pages are counted breadth-first through the known links."""
+    estimate = link_graph.estimate("Root", depth, limit)
+    assert estimate == expected
+    assert estimate.exact is exact
@@ -0,0 +1,69 @@
+"""Tests for the cache statistics endpoint of the Wikicounter application."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_cache_stats(client: TestClient):
+    """Test that the page and word count cache statistics are returned."""
+    response = client.get("/cache")
+    assert response.status_code == 200
+    assert response.json() == {
+        "pages": {"hits": 0, "misses": 0, "revalidations": 0, "coalesced": 0, "refreshed": 0},
+        "word_counts": {"hits": 0, "misses": 0, "revalidations": 0, "coalesced": 0, "refreshed": 0},
+        "crawls": {"started": 0, "shared": 0},
+        "results": {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "size": 0},
+    }
+
+
+def test_cache__repeated_request(mock_walk_pages, client: TestClient):
+    """Test that a repeated request is answered from the result cache without crawling."""
+    first = client.get("/word-frequency?article=Python")
+    second = client.get("/word-frequency?article=Python")
+
+    assert first.json()["word_frequency"] == second.json()["word_frequency"]
+    mock_walk_pages.assert_called_once()
+    results = client.get("/cache").json()["results"]
+    assert (results["hits"], results["misses"], results["entries"]) == (1, 1, 1)
+    assert results["size"] > 0
+
+
+def test_cache__canonical_ignore_list(mock_walk_pages, client: TestClient):
+    """Test that the order and the case of the ignore list do not change the cache key."""
+    client.post("/keywords", json={"article": "Python", "ignore_list": ["the", "And"]})
+    client.post("/keywords", json={"article": "Python", "ignore_list": ["and", "The", "the"]})
+    client.post("/keywords", json={"article": "Python", "ignore_list": ["and"]})
+
+    assert mock_walk_pages.call_count == 2
+
+
+def test_cache__truncated_results_are_not_cached(mock_walk_pages, client: TestClient):
+    """Test that results cut short by a crawl limit are crawled again."""
+    mock_walk_pages.return_value = mock_walk_pages.return_value._replace(truncated=True)
+    client.get("/word-frequency?article=Python&max_pages=1")
+    client.get("/word-frequency?article=Python&max_pages=1")
+
+    assert mock_walk_pages.call_count == 2
+
+
+def test_invalidate_results(mock_walk_pages, client: TestClient):
+    """Test that the cached results are invalidated by article or all at once."""
+    client.get("/word-frequency?article=Python")
+    client.get("/word-frequency?article=Java")
+
+    assert client.delete("/cache/results?article=Python").json() == {"invalidated": 1}
+    assert client.delete("/cache/results").json() == {"invalidated": 1}
+    client.get("/word-frequency?article=Python")
+    assert mock_walk_pages.call_count == 3
+
+
+@pytest.mark.usefixtures("mock_walk_pages")
+def test_invalidate_results__by_site(client: TestClient):
+    """Test that the results of an article are only invalidated for the selected site."""
+    client.get("/word-frequency?article=Python")
+    client.get("/word-frequency?article=Python&language=de")
+    client.get("/word-frequency?article=Python&language=de&site=wiktionary")
+
+    assert client.delete("/cache/results?article=Python&language=de").json() == {"invalidated": 2}
+    assert client.delete("/cache/results?site=wiktionary").json() == {"invalidated": 0}
+    assert client.delete("/cache/results?language=en&site=wikipedia").json() == {"invalidated": 1}
@@ -0,0 +1,53 @@
+"""Tests for the crawl estimate endpoint of the Wikicounter application."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from wikicounter.main import app
+from wikicounter.sites import Site
+from wikicounter.wiki_connection import PageContent
+
+
+def test_estimate__unknown_article(client: TestClient):
+    """Test that an article without known links is estimated as a lower bound."""
+    response = client.get("/estimate?article=Python&depth=1")
+    assert response.status_code == 200
+    assert response.json() == {
+        "start_article": "Python",
+        "max_depth": 1,
+        "pages": 1,
+        "unknown_pages": 1,
+        "exact": False,
+    }
+
+
+def test_estimate__known_links(client: TestClient):
+    """Test that the pages reached through the known links are counted."""
+    client.portal.call(app.state.sites.get, Site()).link_graph.update(
+        {
+            "Python": PageContent("", ["Guido", "Monty"]),
+            "Guido": PageContent("", ["Python", "Netherlands"]),
+        },
+    )
+    response = client.get("/estimate?article=Python&depth=1")
+    assert response.json()["pages"] == 3
+    assert response.json()["exact"] is True
+
+    response = client.get("/estimate?article=Python&depth=2&limit=2")
+    assert response.json()["pages"] == 3
+    assert response.json()["exact"] is False
+
+
+def test_estimate__with_negative_depth(client: TestClient):
+    """Test that providing a negative depth returns a validation error."""
+    response = client.get("/estimate?article=Python&depth=-1")
+    assert response.status_code == 422
+
+
+def test_estimate__opens_site_with_refresher(monkeypatch: pytest.MonkeyPatch):
+    """Test that a site is opened on the event loop, where its page refresher starts."""
+    monkeypatch.setenv("WIKICOUNTER_PAGE_CACHE_REFRESH_INTERVAL", "60")
+    with TestClient(app) as client:
+        response = client.get("/estimate?article=Python&language=de")
+        assert response.status_code == 200
+        assert client.portal.call(app.state.sites.get, Site("de")).refresher is not None
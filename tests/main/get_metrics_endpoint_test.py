@@ -0,0 +1,16 @@
+"""Tests for the metrics endpoint of the Wikicounter application."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.mark.usefixtures("mock_walk_pages")
+def test_metrics(client: TestClient):
+    """Test that the stage timings and cache statistics are exposed in the Prometheus format."""
+    client.get("/word-frequency?article=Python")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'wikicounter_cache_misses{cache="results"} 1' in response.text
+    assert 'wikicounter_stage_seconds_total{stage="frequency"}' in response.text
@@ -1,5 +1,8 @@
 """Test cases for the word-frequency GET endpoint in the Wikicounter application."""
 
+import json
+from unittest.mock import ANY
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -31,14 +34,112 @@ def test_word_frequency_endpoint(mock_walk_pages, mock_create_frequency_dict, cl
     data = response.json()
     assert data["start_article"] == "Python"
     assert data["max_depth"] == 0
-    assert "word_frequency" in data
+    assert data["word_frequency"]["python"] == [10, 43.48]
     assert isinstance(data["time_elapsed"], float)
+    assert data["pages_visited"] == 3
+    assert data["truncated"] is False
 
     # Verify the mock was called with correct parameters
-    mock_walk_pages.assert_called_once_with("Python", 0)
+    mock_walk_pages.assert_called_once_with(
+        "Python",
+        0,
+        ignore_words=frozenset(),
+        client=ANY,
+        max_concurrency=8,
+        count_page=ANY,
+        budget=ANY,
+        vocabulary=None,
+        link_index=ANY,
+        approximation=None,
+    )
+    mock_create_frequency_dict.assert_called_once()
+
+
+def test_word_frequency_endpoint__columnar(
+    mock_walk_pages,
+    mock_create_frequency_dict,
+    client: TestClient,
+):
+    """Test that the columnar format returns parallel arrays in frequency order."""
+    response = client.get("/word-frequency?article=Python&format=columnar")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["word_frequency"] == {
+        "words": ["python", "programming", "language"],
+        "counts": [10, 8, 5],
+        "percent": [43.48, 34.78, 21.74],
+    }
+    mock_walk_pages.assert_called_once()
     mock_create_frequency_dict.assert_called_once()
 
 
+def test_word_frequency__with_invalid_limits(client: TestClient):
+    """Test that non-positive crawl limits return a validation error."""
+    response = client.get("/word-frequency?article=Python&max_pages=0&timeout_s=0")
+    assert response.status_code == 422
+    assert [error["loc"][-1] for error in response.json()["detail"]] == ["max_pages", "timeout_s"]
+
+
+def test_word_frequency_endpoint__limits(mock_walk_pages, client: TestClient):
+    """Test that the crawl limits of the query are turned into the budget of the crawl."""
+    response = client.get("/word-frequency?article=Python&max_pages=5&max_bytes=1000&timeout_s=2")
+    assert response.status_code == 200
+
+    budget = mock_walk_pages.call_args.kwargs["budget"]
+    assert (budget.max_pages, budget.max_bytes) == (5, 1000)
+    assert budget.deadline is not None
+
+
+def test_word_frequency__with_invalid_format(client: TestClient):
+    """Test that an unknown output format returns a validation error."""
+    response = client.get("/word-frequency?article=Python&format=xml")
+    assert response.status_code == 422
+    assert "format" in response.json()["detail"][0]["loc"]
+
+
+def test_word_frequency__with_invalid_site(client: TestClient):
+    """Test that an invalid language code or an unknown project returns a validation error."""
+    response = client.get("/word-frequency?article=Python&language=EN!&site=wikimedia")
+    assert response.status_code == 422
+    assert [error["loc"][-1] for error in response.json()["detail"]] == ["language", "site"]
+
+
+def test_word_frequency_endpoint__sites(mock_walk_pages, client: TestClient):
+    """Test that every wiki is crawled with its own client, and has its own cached results."""
+    for query in ["", "&language=de", "&language=de&site=wiktionary", "&language=de"]:
+        response = client.get(f"/word-frequency?article=Python{query}")
+        assert response.status_code == 200
+
+    clients = [call.kwargs["client"] for call in mock_walk_pages.call_args_list]
+    assert len(clients) == 3
+    assert len({id(client) for client in clients}) == 3
+    assert len(client.app.state.sites) == 3
+
+
+def test_word_frequency_endpoint__stream(mock_iter_pages, client: TestClient):
+    """Test that the streamed response reports every page, then the frequencies."""
+    response = client.get("/word-frequency?article=Python&depth=1&stream=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    events = [json.loads(line) for line in response.iter_lines()]
+    assert [event["event"] for event in events] == ["page", "page", "word_frequency", "done"]
+    assert events[1]["total_words"] == 25
+    assert events[2]["word_frequency"]["python"] == [12, 48.0]
+    assert events[3]["max_depth"] == 1
+    assert mock_iter_pages.call_args.args == ("Python", 1)
+
+
+@pytest.mark.usefixtures("mock_walk_pages")
+def test_word_frequency__debug_timings(client: TestClient):
+    """Test that the stage timings are only returned when requested."""
+    assert "debug_timings" not in client.get("/word-frequency?article=Python").json()
+
+    response = client.get("/word-frequency?article=Java&debug_timings=true")
+    assert set(response.json()["debug_timings"]) == {"frequency", "serialize"}
+
+
 # MARK: Actual API Integration Tests
 
 
@@ -0,0 +1,68 @@
+"""Tests for the crawl job endpoints of the Wikicounter application."""
+
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Iterator
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from wikicounter.wiki_connection import PageVisit
+
+
+@pytest.fixture(name="mock_job_pages")
+def fixture_mock_job_pages() -> Iterator[None]:
+    """Mock the pages crawled by the jobs."""
+
+    async def visit_pages(*_args: object, **_kwargs: object) -> AsyncIterator[PageVisit]:
+        yield PageVisit("Python", 0, Counter({"python": 10, "the": 8}))
+        yield PageVisit("Guido", 1, Counter({"python": 2, "language": 5}))
+
+    with patch("wikicounter.jobs.iter_pages", side_effect=visit_pages):
+        yield
+
+
+def wait_finished(client: TestClient, job_id: str) -> dict:
+    """Polls the job until it is finished."""
+    for _ in range(200):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in {"completed", "failed"}:
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"Job {job_id} did not finish")
+
+
+@pytest.mark.usefixtures("mock_job_pages")
+def test_jobs__lifecycle(client: TestClient):
+    """A job is queued, polled until completed, then deleted."""
+    response = client.post("/jobs", json={"article": "Python", "depth": 1, "ignore_list": ["The"]})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert job["start_article"] == "Python"
+    assert job["word_frequency"] == {}
+
+    job = wait_finished(client, job["id"])
+    assert job["status"] == "completed"
+    assert job["pages_visited"] == 2
+    assert job["current_depth"] is None
+    assert job["word_frequency"] == {"python": [12, 70.5882], "language": [5, 29.4118]}
+
+    response = client.get(f"/jobs/{job['id']}?format=columnar")
+    assert response.json()["word_frequency"]["words"] == ["python", "language"]
+
+    assert client.delete(f"/jobs/{job['id']}").status_code == 204
+    assert client.get(f"/jobs/{job['id']}").status_code == 404
+
+
+def test_jobs__unknown_job(client: TestClient):
+    """Unknown jobs are not found."""
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.delete("/jobs/missing").status_code == 404
+
+
+def test_jobs__with_negative_depth(client: TestClient):
+    """Test that providing a negative depth returns a validation error."""
+    response = client.post("/jobs", json={"article": "Python", "depth": -1})
+    assert response.status_code == 422
@@ -1,8 +1,15 @@
 """Tests for the keywords - POST endpoint in the Wikicounter application."""
 
+import json
+from collections import Counter
+from unittest.mock import ANY, patch
+
 import pytest
 from fastapi.testclient import TestClient
 
+from wikicounter.counting import ApproximateCounter, Approximation
+from wikicounter.wiki_connection import CrawlResult
+
 # MARK: Parameter Validation Tests
 
 
@@ -31,6 +38,13 @@ def test_keywords__missing_article(client: TestClient):
     assert any("article" in err["loc"] for err in error_detail)
 
 
+def test_keywords__invalid_language(client: TestClient):
+    """Test that an invalid language code returns a validation error."""
+    response = client.post("/keywords", json={"article": "Python", "language": "x"})
+    assert response.status_code == 422
+    assert any("language" in err["loc"] for err in response.json()["detail"])
+
+
 # MARK: Endpoint Tests
 
 
@@ -52,8 +66,22 @@ def test_keywords_endpoint(mock_walk_pages, mock_create_frequency_dict, client:
     assert isinstance(data["time_elapsed"], float)
 
     # Verify the mocks were called with correct parameters
-    mock_walk_pages.assert_called_once_with("Python", 0, ignore_words=["the", "and", "to"])
-    mock_create_frequency_dict.assert_called_once_with(mock_walk_pages.return_value, percentile=50)
+    mock_walk_pages.assert_called_once_with(
+        "Python",
+        0,
+        ignore_words=frozenset({"the", "and", "to"}),
+        client=ANY,
+        max_concurrency=8,
+        count_page=ANY,
+        budget=ANY,
+        vocabulary=None,
+        link_index=ANY,
+        approximation=None,
+    )
+    mock_create_frequency_dict.assert_called_once_with(
+        mock_walk_pages.return_value.word_counter,
+        50,
+    )
 
 
 def test_keywords_endpoint__minimal_body(
@@ -75,9 +103,100 @@ def test_keywords_endpoint__minimal_body(
     assert isinstance(data["time_elapsed"], float)
 
     # Verify the mocks were called with correct parameters
-    # Defaults: depth is 0, ignore list is None, percentile is 0
-    mock_walk_pages.assert_called_once_with("Python", 0, ignore_words=None)
-    mock_create_frequency_dict.assert_called_once_with(mock_walk_pages.return_value, percentile=0)
+    # Defaults: depth is 0, ignore list is empty, percentile is 0
+    mock_walk_pages.assert_called_once_with(
+        "Python",
+        0,
+        ignore_words=frozenset(),
+        client=ANY,
+        max_concurrency=8,
+        count_page=ANY,
+        budget=ANY,
+        vocabulary=None,
+        link_index=ANY,
+        approximation=None,
+    )
+    mock_create_frequency_dict.assert_called_once_with(
+        mock_walk_pages.return_value.word_counter,
+        0,
+    )
+
+
+def test_keywords_endpoint__columnar(
+    mock_walk_pages,
+    mock_create_frequency_dict,
+    client: TestClient,
+):
+    """Test that the columnar format is selected with the `format` field of the body."""
+    response = client.post("/keywords", json={"article": "Python", "format": "columnar"})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["word_frequency"]["words"] == ["python", "programming", "language"]
+    assert data["word_frequency"]["counts"] == [10, 8, 5]
+    mock_walk_pages.assert_called_once()
+    mock_create_frequency_dict.assert_called_once()
+
+
+@pytest.mark.usefixtures("mock_walk_pages")
+def test_keywords_endpoint__debug_timings(client: TestClient):
+    """Test that the stage timings are returned when requested in the body."""
+    response = client.post("/keywords", json={"article": "Python", "debug_timings": True})
+    assert response.status_code == 200
+    assert set(response.json()["debug_timings"]) == {"frequency", "serialize"}
+
+
+def test_keywords_endpoint__approximate(client: TestClient):
+    """Test that the approximate counts are returned with their error bounds, and cached apart."""
+    approximate = ApproximateCounter(Approximation(top_words=2))
+    approximate.update(Counter({"python": 10, "programming": 8, "language": 5}))
+    with patch("wikicounter.main.walk_pages") as mock_walk_pages:
+        mock_walk_pages.return_value = CrawlResult(approximate, pages_visited=3)
+        response = client.post("/keywords", json={"article": "Python", "approximate": True})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["word_frequency"] == {"python": [10, 43.4783], "language": [5, 21.7391]}
+    # "language" replaced "programming", the sketch bounds its count closer than the replaced count
+    assert data["approximation"] == {
+        "max_overcount": 1,
+        "confidence": 0.99,
+        "tracked_words": 2,
+        "distinct_words": 3,
+    }
+    assert mock_walk_pages.call_args.kwargs["approximation"] == Approximation(0.001, 0.99, 1000)
+
+    with patch("wikicounter.main.walk_pages") as mock_walk_pages:
+        mock_walk_pages.return_value = CrawlResult(Counter({"python": 1}), pages_visited=1)
+        response = client.post("/keywords", json={"article": "Python"})
+    assert "approximation" not in response.json()
+
+
+def test_keywords__approximate_stream(client: TestClient):
+    """Test that the approximate counting cannot be streamed."""
+    response = client.post(
+        "/keywords",
+        json={"article": "Python", "approximate": True, "stream": True},
+    )
+    assert response.status_code == 422
+
+
+def test_keywords_endpoint__stream(mock_iter_pages, client: TestClient):
+    """Test that the streamed response applies the ignore list and the percentile."""
+    request_data = {
+        "article": "Python",
+        "depth": 1,
+        "ignore_list": ["programming"],
+        "percentile": 50,
+        "stream": True,
+    }
+    response = client.post("/keywords", json=request_data)
+    assert response.status_code == 200
+
+    events = [json.loads(line) for line in response.iter_lines()]
+    assert [event["event"] for event in events] == ["page", "page", "word_frequency", "done"]
+    assert events[2]["word_frequency"] == {"python": [12, 70.5882]}
+    mock_iter_pages.assert_called_once()
 
 
 # MARK: Actual API Integration Tests
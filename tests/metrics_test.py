@@ -0,0 +1,49 @@
+"""Tests for the metrics module."""
+
+import asyncio
+
+import pytest
+
+from wikicounter.cache import CacheStats
+from wikicounter.metrics import MetricCounter, Metrics, Stage, collect_timings, measure
+
+
+def test_metrics__render():
+    """The stages, counters and statistics are rendered in the Prometheus text format."""
+    metrics = Metrics()
+    metrics.observe(Stage.FETCH, 0.5)
+    metrics.observe(Stage.FETCH, 0.25)
+    metrics.increment(MetricCounter.API_REQUESTS, 3)
+
+    lines = metrics.render({"pages": CacheStats(hits=2)}).splitlines()
+    assert 'wikicounter_stage_seconds_total{stage="fetch"} 0.750000' in lines
+    assert 'wikicounter_stage_calls_total{stage="fetch"} 2' in lines
+    assert 'wikicounter_stage_calls_total{stage="merge"} 0' in lines
+    assert "wikicounter_api_requests_total 3" in lines
+    assert 'wikicounter_cache_hits{cache="pages"} 2' in lines
+
+
+def test_metrics__reset():
+    metrics = Metrics()
+    metrics.increment(MetricCounter.PAGES_FETCHED)
+    metrics.reset()
+    assert metrics.counters[MetricCounter.PAGES_FETCHED] == 0
+
+
+@pytest.mark.anyio
+async def test_collect_timings__includes_started_tasks():
+    """The stages measured by the tasks started in the block are collected too."""
+
+    async def fetch() -> None:
+        with measure(Stage.FETCH):
+            await asyncio.sleep(0)
+
+    with collect_timings() as timings:
+        await asyncio.ensure_future(fetch())
+        with measure(Stage.MERGE):
+            pass
+    with measure(Stage.FREQUENCY):
+        pass
+
+    assert set(timings) == {"fetch", "merge"}
+    assert all(seconds >= 0 for seconds in timings.values())
@@ -0,0 +1,188 @@
+"""Tests for the scheduling module."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+from time import monotonic
+
+import httpx
+import pytest
+
+from wikicounter.metrics import METRICS, MetricCounter
+from wikicounter.scheduling import (
+    RequestScheduler,
+    current_priority,
+    request_priority,
+    retry_after,
+)
+
+
+def responses(*status_codes: int, headers: dict[str, str] | None = None):
+    """Returns a request answering with the status codes in turn, and the list of its calls."""
+    calls: list[int] = []
+
+    async def request() -> httpx.Response:
+        status_code = status_codes[min(len(calls), len(status_codes) - 1)]
+        calls.append(status_code)
+        return httpx.Response(status_code, headers=headers if status_code != 200 else None)
+
+    return request, calls
+
+
+@pytest.mark.anyio
+async def test_send__retries_throttled_responses():
+    """Throttled responses are retried, and the concurrency is halved for each of them."""
+    scheduler = RequestScheduler(None, max_in_flight=8, backoff=0)
+    request, calls = responses(429, 503, 200, headers={"Retry-After": "0"})
+    retries = METRICS.counters[MetricCounter.API_RETRIES]
+
+    response = await scheduler.send(request)
+
+    assert response.status_code == 200
+    assert calls == [429, 503, 200]
+    assert METRICS.counters[MetricCounter.API_RETRIES] == retries + 2
+    # Halved twice, then raised by the successful response
+    assert scheduler.limit == 2.5
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_send__retries_maxlag():
+    """A `maxlag` error is retried after its `Retry-After`, holding back the other requests."""
+    scheduler = RequestScheduler(None, backoff=0)
+    lagging = True
+
+    async def request() -> httpx.Response:
+        nonlocal lagging
+        if lagging:
+            lagging = False
+            return httpx.Response(
+                200,
+                headers={"MediaWiki-API-Error": "maxlag", "Retry-After": "0.05"},
+            )
+        return httpx.Response(200)
+
+    start = monotonic()
+    response = await scheduler.send(request)
+
+    assert "MediaWiki-API-Error" not in response.headers
+    assert monotonic() - start >= 0.05
+
+
+@pytest.mark.anyio
+async def test_send__gives_up_after_max_retries():
+    """The last response is returned when the retries are used up, client errors are not retried."""
+    scheduler = RequestScheduler(None, max_retries=2, backoff=0)
+    request, calls = responses(500)
+    assert (await scheduler.send(request)).status_code == 500
+    assert len(calls) == 3
+
+    request, calls = responses(404)
+    assert (await scheduler.send(request)).status_code == 404
+    assert len(calls) == 1
+
+
+@pytest.mark.anyio
+async def test_send__retries_transport_errors():
+    """Transport errors are retried, and raised once the retries are used up."""
+    scheduler = RequestScheduler(None, max_retries=1, backoff=0)
+    attempts = 0
+
+    async def request() -> httpx.Response:
+        nonlocal attempts
+        attempts += 1
+        msg = "unreachable"
+        raise httpx.ConnectError(msg)
+
+    with pytest.raises(httpx.ConnectError):
+        await scheduler.send(request)
+    assert attempts == 2
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_send__rate_limit():
+    """Requests beyond the burst wait for the token bucket to refill."""
+    scheduler = RequestScheduler(50, burst=2)
+    request, _calls = responses(200)
+
+    start = monotonic()
+    await asyncio.gather(*(scheduler.send(request) for _ in range(4)))
+
+    # Two requests start right away, the two others one 20 ms token apart
+    assert monotonic() - start >= 0.035
+
+
+@pytest.mark.anyio
+async def test_send__priority_order():
+    """Waiting requests start by priority, then in order of arrival."""
+    scheduler = RequestScheduler(None, max_in_flight=1)
+    release = asyncio.Event()
+    started: list[str] = []
+
+    def named_request(name: str) -> Callable[[], Awaitable[httpx.Response]]:
+        async def request() -> httpx.Response:
+            started.append(name)
+            await release.wait()
+            return httpx.Response(200)
+
+        return request
+
+    async def send(name: str, priority: int) -> None:
+        with request_priority(priority):
+            await scheduler.send(named_request(name))
+
+    tasks = [asyncio.ensure_future(send("blocking", 0))]
+    await asyncio.sleep(0)
+    for name, priority in [("deep", 2), ("first", 0), ("middle", 1), ("second", 0)]:
+        tasks.append(asyncio.ensure_future(send(name, priority)))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert started == ["blocking", "first", "second", "middle", "deep"]
+
+
+@pytest.mark.anyio
+async def test_send__cancelled_while_waiting():
+    """A request cancelled while waiting does not keep its place."""
+    scheduler = RequestScheduler(None, max_in_flight=1)
+    release = asyncio.Event()
+
+    async def blocking() -> httpx.Response:
+        await release.wait()
+        return httpx.Response(200)
+
+    first = asyncio.ensure_future(scheduler.send(blocking))
+    await asyncio.sleep(0)
+    waiting = asyncio.ensure_future(scheduler.send(blocking))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    release.set()
+    await first
+
+    request, _calls = responses(200)
+    assert (await scheduler.send(request)).status_code == 200
+    assert scheduler.in_flight == 0
+
+
+def test_request_priority():
+    """The priority is restored when leaving the block."""
+    assert current_priority() == 0
+    with request_priority(3):
+        assert current_priority() == 3
+    assert current_priority() == 0
+
+
+@pytest.mark.parametrize(
+    ("headers", "expected"),
+    [({}, None), ({"Retry-After": "5"}, 5.0), ({"Retry-After": "soon"}, None)],
+)
+def test_retry_after(headers: dict[str, str], expected: float | None):
+    assert retry_after(httpx.Response(429, headers=headers)) == expected
+
+
+def test_retry_after__http_date():
+    date = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+    assert 25 < retry_after(httpx.Response(429, headers={"Retry-After": date})) <= 30  # type: ignore[operator]
@@ -0,0 +1,30 @@
+"""Tests for the serialization module."""
+
+import orjson
+
+from wikicounter.counting import WordFrequency
+from wikicounter.serialization import OutputFormat, encode_word_frequency
+
+FREQUENCY_DICT = {
+    "hello": WordFrequency(word_count=5, frequency_percent=50.0),
+    "world": WordFrequency(word_count=3, frequency_percent=30.0),
+}
+
+
+def test_encode_word_frequency__dict():
+    """The default layout serializes like the Pydantic response model."""
+    result = orjson.loads(orjson.dumps(encode_word_frequency(FREQUENCY_DICT)))
+    assert result == {"hello": [5, 50.0], "world": [3, 30.0]}
+
+
+def test_encode_word_frequency__columnar():
+    """The columnar layout keeps the words and their values in the same order."""
+    encoded = encode_word_frequency(FREQUENCY_DICT, OutputFormat.COLUMNAR)
+    result = orjson.loads(orjson.dumps(encoded))
+    assert result == {"words": ["hello", "world"], "counts": [5, 3], "percent": [50.0, 30.0]}
+
+
+def test_encode_word_frequency__columnar_empty():
+    """An empty table has empty columns."""
+    result = encode_word_frequency({}, OutputFormat.COLUMNAR)
+    assert result == {"words": [], "counts": (), "percent": ()}
@@ -0,0 +1,118 @@
+"""Tests for the sites module."""
+
+from collections.abc import Iterable
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from wikicounter.settings import Settings
+from wikicounter.sites import Site, SiteLimitError, SitePool, WikiProject, site_path
+from wikicounter.wiki_connection import PageContent, WikiApiError, WikiClient
+
+
+class FakeClient:
+    """Serve every page with the same text and links."""
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        if "Error" in page_titles:
+            msg = "Bad request"
+            raise WikiApiError(msg)
+        return {
+            title: PageContent("hot words words", ["Linked"], revision_id=1)
+            for title in page_titles
+        }
+
+
+@pytest.mark.anyio
+async def test_site_pool__opens_sites_lazily():
+    """The clients of a site are created on its first request, then shared."""
+    sites = SitePool(Settings(api_url="https://{language}.{project}.org/w/api.php"))
+    try:
+        assert len(sites) == 0
+        with patch("wikicounter.sites.WikiClient", side_effect=WikiClient) as client_class:
+            english = sites.get(Site())
+            assert sites.get(Site("en", WikiProject.WIKIPEDIA)) is english
+            german = sites.get(Site("de", WikiProject.WIKTIONARY))
+        assert len(sites) == 2
+    finally:
+        await sites.aclose()
+
+    assert [call.args for call in client_class.call_args_list] == [
+        ("https://en.wikipedia.org/w/api.php",),
+        ("https://de.wiktionary.org/w/api.php",),
+    ]
+    # One rate limit for the whole process
+    assert all(call.kwargs["scheduler"] is sites.scheduler for call in client_class.call_args_list)
+    assert german.page_cache is not english.page_cache
+    assert german.link_graph is not english.link_graph
+    assert len(sites) == 0
+
+
+@pytest.mark.anyio
+async def test_site_pool__limits():
+    """New sites are refused beyond `max_sites`, and invalid language codes are rejected."""
+    sites = SitePool(Settings(max_sites=1))
+    try:
+        sites.get(Site())
+        with pytest.raises(SiteLimitError):
+            sites.get(Site("fr"))
+        sites.get(Site())
+    finally:
+        await sites.aclose()
+
+    sites = SitePool(Settings())
+    with pytest.raises(ValueError, match="language"):
+        sites.get(Site("../evil"))
+
+
+@pytest.mark.anyio
+async def test_site_pool__page_stats():
+    """The cache statistics are summed over the sites."""
+    sites = SitePool(Settings())
+    try:
+        sites.get(Site()).page_source.stats.hits = 2
+        sites.get(Site("de")).page_source.stats.hits = 3
+        pages, word_counts = sites.page_stats()
+    finally:
+        await sites.aclose()
+
+    assert pages.hits == 5
+    assert word_counts.hits == 0
+
+
+@pytest.mark.anyio
+async def test_site_pool__warm_up():
+    """The warm-up caches the pages with their counts and links, a failure is only logged."""
+    settings = Settings.from_env({"WIKICOUNTER_WARMUP_ARTICLES": "Python| Guido van Rossum |"})
+    assert settings.warmup_articles == ("Python", "Guido van Rossum")
+
+    sites = SitePool(settings)
+    try:
+        clients = sites.get(Site())
+        clients.page_source.client = FakeClient()  # type: ignore[assignment]
+        sites.warm_up(Site(), settings.warmup_articles)
+        assert clients.warmup is not None
+        await clients.warmup
+
+        pages = await clients.page_source.get_pages_content(["Python", "Guido van Rossum"])
+        assert clients.page_source.stats.hits == 2
+        assert await clients.page_source.count_page("Python", pages["Python"]) == {
+            "words": 2,
+            "hot": 1,
+        }
+        assert clients.page_source.counts_stats.hits == 1
+        assert clients.link_graph.estimate("Python", 1).pages == 2
+
+        sites.warm_up(Site(), ["Error"])
+        await clients.warmup
+    finally:
+        await sites.aclose()
+
+
+def test_site_path():
+    """Every site has a file of its own next to the configured one."""
+    assert site_path(None, Site()) is None
+    assert site_path(Path("data/pages.sqlite"), Site("de", WikiProject.WIKIVOYAGE)) == Path(
+        "data/pages.de.wikivoyage.sqlite",
+    )
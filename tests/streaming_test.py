@@ -0,0 +1,105 @@
+"""Tests for the streaming module."""
+
+import json
+from collections import Counter
+from collections.abc import AsyncIterator
+
+import pytest
+
+from wikicounter.streaming import stream_word_frequency
+from wikicounter.wiki_connection import CrawlBudget, PageVisit, WikiApiError
+
+VISITS = [
+    PageVisit("Root", 0, Counter({"the": 2, "root": 1})),
+    PageVisit("Child", 1, Counter({"the": 1, "child": 3})),
+]
+
+
+async def visit_pages(visits: list[PageVisit], error: Exception | None = None):
+    for visit in visits:
+        yield visit
+    if error is not None:
+        raise error
+
+
+async def collect_events(lines: AsyncIterator[bytes]) -> list[dict]:
+    return [json.loads(line) async for line in lines]
+
+
+@pytest.mark.anyio
+async def test_stream_word_frequency__events():
+    """Every page is reported with running totals, then the table and the summary follow."""
+    events = await collect_events(
+        stream_word_frequency(visit_pages(VISITS), start_article="Root", max_depth=1),
+    )
+
+    assert [event["event"] for event in events] == ["page", "page", "word_frequency", "done"]
+    assert events[1] == {
+        "event": "page",
+        "title": "Child",
+        "depth": 1,
+        "page_words": 4,
+        "pages_visited": 2,
+        "total_words": 7,
+        "unique_words": 3,
+    }
+    assert events[2]["word_frequency"] == {
+        "child": [3, 42.8571],
+        "the": [3, 42.8571],
+        "root": [1, 14.2857],
+    }
+    assert events[3]["start_article"] == "Root"
+    assert events[3]["pages_visited"] == 2
+    assert events[3]["truncated"] is False
+
+
+@pytest.mark.anyio
+async def test_stream_word_frequency__truncated():
+    """The summary reports whether the budget of the crawl ran out."""
+    budget = CrawlBudget(max_pages=2)
+    budget.truncated = True
+    events = await collect_events(
+        stream_word_frequency(
+            visit_pages(VISITS),
+            start_article="Root",
+            max_depth=1,
+            budget=budget,
+        ),
+    )
+    assert events[-1]["truncated"] is True
+
+
+@pytest.mark.anyio
+async def test_stream_word_frequency__ignore_words_and_chunks():
+    """Ignored words are left out of the totals and the table is split into chunks."""
+    events = await collect_events(
+        stream_word_frequency(
+            visit_pages(VISITS),
+            start_article="Root",
+            max_depth=1,
+            ignore_words=["the"],
+            chunk_size=1,
+        ),
+    )
+
+    assert events[1]["total_words"] == 4
+    assert events[1]["unique_words"] == 2
+    assert [event["word_frequency"] for event in events[2:4]] == [
+        {"child": [3, 75.0]},
+        {"root": [1, 25.0]},
+    ]
+
+
+@pytest.mark.anyio
+async def test_stream_word_frequency__error():
+    """A failing crawl ends the stream with an error event."""
+    events = await collect_events(
+        stream_word_frequency(
+            visit_pages(VISITS[:1], WikiApiError("Bad request")),
+            start_article="Root",
+            max_depth=1,
+        ),
+    )
+
+    assert [event["event"] for event in events] == ["page", "error"]
+    assert events[1]["detail"] == "Bad request"
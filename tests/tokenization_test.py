@@ -0,0 +1,39 @@
+"""Tests for the tokenization module."""
+
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+from wikicounter.tokenization import ProcessTokenizer
+
+
+@pytest.mark.anyio
+async def test_process_tokenizer__in_process():
+    """Without workers, every text is counted in-process."""
+    tokenizer = ProcessTokenizer(workers=0)
+    assert await tokenizer.count("The the text") == Counter({"the": 2, "text": 1})
+    tokenizer.close()
+
+
+@pytest.mark.anyio
+async def test_process_tokenizer__small_text_fallback():
+    """Texts below the size threshold are not sent to the worker processes."""
+    tokenizer = ProcessTokenizer(workers=1, min_text_size=100)
+    try:
+        with patch.object(tokenizer, "_executor") as mock_executor:
+            assert await tokenizer.count("small text") == Counter({"small": 1, "text": 1})
+        mock_executor.submit.assert_not_called()
+    finally:
+        tokenizer.close()
+
+
+@pytest.mark.anyio
+async def test_process_tokenizer__worker_process():
+    """Large texts are counted in a worker process with the same result."""
+    tokenizer = ProcessTokenizer(workers=1, min_text_size=10)
+    try:
+        text = "Words, words and more words! " * 100
+        assert await tokenizer.count(text) == Counter({"words": 300, "and": 100, "more": 100})
+    finally:
+        tokenizer.close()
@@ -0,0 +1,423 @@
+"""Tests for the wiki_connection module."""
+
+import asyncio
+from collections import Counter
+from collections.abc import AsyncIterator, Iterable
+
+import httpx
+import pytest
+
+from wikicounter.cache import CachingPageSource, LRUPageCache
+from wikicounter.counting import ApproximateCounter, Approximation, Vocabulary, VocabularyCounter
+from wikicounter.link_graph import LinkGraph
+from wikicounter.metrics import collect_timings
+from wikicounter.scheduling import RequestScheduler, current_priority
+from wikicounter.wiki_connection import (
+    CrawlBudget,
+    PageContent,
+    WikiApiError,
+    WikiClient,
+    walk_pages,
+)
+
+LINK_GRAPH = {
+    "Root": PageContent("root words", ["Child A", "Child B"]),
+    "Child A": PageContent("child words", ["Root", "Grandchild"]),
+    "Child B": PageContent("child b", ["Child A", "Grandchild"]),
+    "Grandchild": PageContent("deep words", ["Root"]),
+}
+
+
+REDIRECTS = {"Kid A": "Child A"}
+
+REVISIONS = {title: index + 100 for index, title in enumerate(LINK_GRAPH)}
+
+LINKS_PER_RESPONSE = 3
+
+CONTENTS_PER_RESPONSE = 2
+
+SITEINFO = {
+    "namespaces": {
+        "-1": {"id": -1, "name": "Special", "canonical": "Special"},
+        "0": {"id": 0, "name": ""},
+        "6": {"id": 6, "name": "Datei", "canonical": "File"},
+    },
+    "namespacealiases": [{"id": 6, "alias": "Bild"}],
+}
+
+
+class FakeClient:
+    """Serve pages from the in-memory link graph instead of Wikipedia."""
+
+    def __init__(self) -> None:
+        self.fetched: list[str] = []
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        titles = list(page_titles)
+        self.fetched.extend(titles)
+        return {title: LINK_GRAPH.get(title, PageContent("", [])) for title in titles}
+
+
+def mediawiki_handler(request: httpx.Request) -> httpx.Response:
+    """
+    Answer `action=query` requests like the MediaWiki API.
+
+    Like the real API, the content of the requested pages and their links are split over several
+    responses, the rest is served through continuations.
+    """
+    params = request.url.params
+    if params.get("meta") == "siteinfo":
+        return httpx.Response(200, json={"query": SITEINFO})
+    titles = params["titles"].split("|")
+    if "Error" in titles:
+        return httpx.Response(200, json={"error": {"code": "bad", "info": "Bad request"}})
+
+    resolved = [REDIRECTS.get(title, title) for title in titles]
+    existing = [title for title in resolved if title in LINK_GRAPH]
+    pages = {title: {"title": title} for title in existing}
+    missing = [{"title": title, "missing": True} for title in resolved if title not in LINK_GRAPH]
+
+    props = params["prop"].split("|")
+    if "info" in props:
+        for title, page in pages.items():
+            page["lastrevid"] = REVISIONS[title]
+
+    content_offset = int(params.get("rvcontinue", 0))
+    if "revisions" not in props:
+        content_offset = len(existing)
+    for title in existing[content_offset : content_offset + CONTENTS_PER_RESPONSE]:
+        content = {"content": LINK_GRAPH[title].page_text}
+        pages[title]["revisions"] = [{"revid": REVISIONS[title], "slots": {"main": content}}]
+
+    all_links = [(title, link) for title in existing for link in LINK_GRAPH[title].links]
+    link_offset = int(params.get("plcontinue", 0))
+    if "links" not in props:
+        all_links = []
+    for title, link in all_links[link_offset : link_offset + LINKS_PER_RESPONSE]:
+        pages[title].setdefault("links", []).append({"ns": 0, "title": link})
+
+    data: dict = {
+        "query": {
+            "redirects": [
+                {"from": title, "to": REDIRECTS[title]} for title in titles if title in REDIRECTS
+            ],
+            "pages": [*pages.values(), *missing],
+        },
+    }
+    more_contents = content_offset + CONTENTS_PER_RESPONSE < len(existing)
+    if more_contents or link_offset + LINKS_PER_RESPONSE < len(all_links):
+        data["continue"] = {
+            "rvcontinue": str(content_offset + CONTENTS_PER_RESPONSE),
+            "plcontinue": str(link_offset + LINKS_PER_RESPONSE),
+            "continue": "||",
+        }
+    return httpx.Response(200, json=data)
+
+
+@pytest.fixture(name="wiki_client")
+async def fixture_wiki_client() -> AsyncIterator[WikiClient]:
+    """WikiClient talking to the mocked MediaWiki API."""
+    async with WikiClient(transport=httpx.MockTransport(mediawiki_handler)) as client:
+        yield client
+
+
+# MARK: WikiClient Tests
+
+
+@pytest.mark.anyio
+async def test_get_page_content(wiki_client: WikiClient):
+    """The text and every page of links are collected."""
+    result = await wiki_client.get_page_content("Child A")
+    assert result == PageContent("child words", ["Root", "Grandchild"], REVISIONS["Child A"])
+
+
+@pytest.mark.anyio
+async def test_get_pages_content(wiki_client: WikiClient):
+    """Several pages are fetched at once, redirects are resolved to the requested title."""
+    result = await wiki_client.get_pages_content(["Root", "Kid A", "Grandchild", "Nowhere"])
+    assert result == {
+        "Root": LINK_GRAPH["Root"]._replace(revision_id=REVISIONS["Root"]),
+        "Kid A": LINK_GRAPH["Child A"]._replace(revision_id=REVISIONS["Child A"]),
+        "Grandchild": LINK_GRAPH["Grandchild"]._replace(revision_id=REVISIONS["Grandchild"]),
+        "Nowhere": PageContent("", []),
+    }
+
+
+@pytest.mark.anyio
+async def test_get_revision_ids(wiki_client: WikiClient):
+    """Revision ids are resolved through redirects, missing pages have revision 0."""
+    result = await wiki_client.get_revision_ids(["Root", "Kid A", "Nowhere"])
+    assert result == {"Root": REVISIONS["Root"], "Kid A": REVISIONS["Child A"], "Nowhere": 0}
+
+
+@pytest.mark.anyio
+async def test_get_pages_content__batches_titles():
+    """The content and links are queried in batches of at most 50 titles, one query per batch."""
+    requested_titles: list[int] = []
+    siteinfo_requests = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal siteinfo_requests
+        if "titles" in request.url.params:
+            requested_titles.append(len(request.url.params["titles"].split("|")))
+        else:
+            siteinfo_requests += 1
+        return mediawiki_handler(request)
+
+    async with WikiClient(transport=httpx.MockTransport(handler)) as client:
+        result = await client.get_pages_content(f"Missing {index}" for index in range(120))
+        await client.get_pages_content(["Root"])
+
+    assert len(result) == 120
+    assert sorted(requested_titles) == [1, 20, 50, 50]
+    assert siteinfo_requests == 1
+
+
+@pytest.mark.anyio
+async def test_get_pages_content__converts_wikitext():
+    """The wikitext is converted into plain text, without the links to the namespaces of the wiki."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params.get("meta") == "siteinfo":
+            return mediawiki_handler(request)
+        content = {"content": "'''Root''' [[Child A|a child]] [[Datei:X.png|thumb]] [[Bild:Y.png]]"}
+        revisions = [{"revid": 7, "slots": {"main": content}}]
+        page = {"title": "Root", "lastrevid": 7, "revisions": revisions}
+        return httpx.Response(200, json={"query": {"pages": [page]}})
+
+    async with WikiClient(transport=httpx.MockTransport(handler)) as client:
+        result = await client.get_page_content("Root")
+
+    assert result == PageContent("Root a child  ", [], 7)
+
+
+@pytest.mark.anyio
+async def test_get_page_content__missing_page(wiki_client: WikiClient):
+    """A missing page has no text and no links."""
+    result = await wiki_client.get_page_content("Nowhere")
+    assert result == PageContent("", [])
+
+
+@pytest.mark.anyio
+async def test_get_page_content__api_error(wiki_client: WikiClient):
+    """API errors are raised as WikiApiError."""
+    with pytest.raises(WikiApiError, match="Bad request"):
+        await wiki_client.get_page_content("Error")
+
+
+@pytest.mark.anyio
+async def test_get_page_content__retries_maxlag():
+    """The `maxlag` parameter is sent, and lagging responses are retried by the scheduler."""
+    maxlags = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        maxlags.append(request.url.params["maxlag"])
+        if len(maxlags) == 1:
+            return httpx.Response(
+                200,
+                headers={"MediaWiki-API-Error": "maxlag", "Retry-After": "0"},
+                json={"error": {"code": "maxlag", "info": "Waiting for a database server"}},
+            )
+        return mediawiki_handler(request)
+
+    scheduler = RequestScheduler(None, backoff=0)
+    transport = httpx.MockTransport(handler)
+    async with WikiClient(transport=transport, scheduler=scheduler, maxlag=3) as client:
+        result = await client.get_page_content("Grandchild")
+
+    assert result.page_text == "deep words"
+    assert maxlags[:2] == ["3", "3"]
+
+
+# MARK: walk_pages Tests
+
+
+@pytest.mark.anyio
+async def test_walk_pages__depth_zero():
+    """Only the starting page is counted at depth 0."""
+    client = FakeClient()
+    result = await walk_pages("Root", 0, client=client)
+    assert result.word_counter == Counter({"root": 1, "words": 1})
+    assert client.fetched == ["Root"]
+
+
+@pytest.mark.anyio
+async def test_walk_pages__depth_one():
+    """Direct links are fetched once each and their words are merged."""
+    client = FakeClient()
+    result = await walk_pages("Root", 1, client=client)
+    assert result.word_counter == Counter({"root": 1, "words": 2, "child": 2, "b": 1})
+    assert sorted(client.fetched) == ["Child A", "Child B", "Root"]
+
+
+@pytest.mark.anyio
+async def test_walk_pages__depth_as_priority():
+    """The pages are fetched with their depth as the priority of their requests."""
+    priorities: dict[str, int] = {}
+
+    class PriorityClient(FakeClient):
+        async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+            titles = list(page_titles)
+            priorities.update(dict.fromkeys(titles, current_priority()))
+            return await super().get_pages_content(titles)
+
+    await walk_pages("Root", 2, client=PriorityClient())
+
+    assert priorities == {"Root": 0, "Child A": 1, "Child B": 1, "Grandchild": 2}
+
+
+@pytest.mark.anyio
+async def test_walk_pages__visits_each_page_once():
+    """Pages reachable through several paths or cycles are only fetched once."""
+    client = FakeClient()
+    result = await walk_pages("Root", 5, client=client, max_concurrency=2)
+    assert result.word_counter == Counter({"root": 1, "words": 3, "child": 2, "b": 1, "deep": 1})
+    assert result.pages_visited == len(LINK_GRAPH)
+    assert not result.truncated
+    assert sorted(client.fetched) == sorted(LINK_GRAPH)
+
+
+@pytest.mark.anyio
+async def test_walk_pages__measures_stages():
+    """The fetch, tokenize, links and merge stages of the crawl are timed."""
+    with collect_timings() as timings:
+        await walk_pages("Root", 1, client=FakeClient())
+    assert set(timings) == {"fetch", "tokenize", "links", "merge"}
+
+
+@pytest.mark.anyio
+async def test_walk_pages__with_ignore_words():
+    """Ignored words are excluded from the merged counter."""
+    result = await walk_pages("Root", 1, ignore_words={"words", "b"}, client=FakeClient())
+    assert result.word_counter == Counter({"root": 1, "child": 2})
+
+
+@pytest.mark.anyio
+async def test_walk_pages__with_vocabulary():
+    """The counts are merged into a compact counter when a vocabulary is given."""
+    vocabulary = Vocabulary()
+    result = await walk_pages("Root", 1, ["b"], client=FakeClient(), vocabulary=vocabulary)
+    assert isinstance(result.word_counter, VocabularyCounter)
+    assert dict(result.word_counter.items()) == {"root": 1, "words": 2, "child": 2}
+    assert "b" in vocabulary.words
+
+
+@pytest.mark.anyio
+async def test_walk_pages__approximate():
+    """The counts are merged into an approximate counter when an approximation is given."""
+    result = await walk_pages(
+        "Root",
+        1,
+        ["b"],
+        client=FakeClient(),
+        vocabulary=Vocabulary(),
+        approximation=Approximation(top_words=10),
+    )
+    assert isinstance(result.word_counter, ApproximateCounter)
+    assert dict(result.word_counter.items()) == {"root": 1, "words": 2, "child": 2}
+    assert result.word_counter.total() == 5
+
+
+@pytest.mark.anyio
+async def test_walk_pages__with_wiki_client(wiki_client: WikiClient):
+    """The crawl works end-to-end over the mocked MediaWiki API."""
+    result = await walk_pages("Root", 1, client=wiki_client)
+    assert result.word_counter == Counter({"root": 1, "words": 2, "child": 2, "b": 1})
+
+
+# MARK: Crawl Budget Tests
+
+
+class SlowClient(FakeClient):
+    """Serve the pages of the link graph, taking a long time for the grandchild."""
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        titles = list(page_titles)
+        if "Grandchild" in titles:
+            await asyncio.sleep(10)
+        return await super().get_pages_content(titles)
+
+
+@pytest.mark.anyio
+async def test_walk_pages__max_pages():
+    """The crawl stops after the maximum number of pages, in breadth-first order."""
+    client = FakeClient()
+    result = await walk_pages("Root", 5, client=client, budget=CrawlBudget(max_pages=2))
+    assert result.word_counter == Counter({"root": 1, "words": 2, "child": 1})
+    assert (result.pages_visited, result.truncated) == (2, True)
+    assert client.fetched == ["Root", "Child A"]
+
+
+@pytest.mark.anyio
+async def test_walk_pages__max_pages_not_reached():
+    """A budget larger than the crawl does not mark the result truncated."""
+    result = await walk_pages("Root", 5, client=FakeClient(), budget=CrawlBudget(max_pages=4))
+    assert (result.pages_visited, result.truncated) == (4, False)
+
+
+@pytest.mark.anyio
+async def test_walk_pages__max_bytes():
+    """The crawl stops after the page exceeding the byte budget."""
+    budget = CrawlBudget(max_bytes=12)
+    result = await walk_pages("Root", 5, client=FakeClient(), budget=budget)
+    assert result.word_counter == Counter({"root": 1, "words": 2, "child": 1})
+    assert (result.pages_visited, result.truncated) == (2, True)
+    assert budget.bytes_fetched == len("root words") + len("child words")
+
+
+@pytest.mark.anyio
+async def test_walk_pages__timeout():
+    """The pages fetched before the deadline are returned when the crawl runs out of time."""
+    result = await walk_pages("Root", 5, client=SlowClient(), budget=CrawlBudget(timeout_s=0.2))
+    assert result.word_counter == Counter({"root": 1, "words": 2, "child": 2, "b": 1})
+    assert (result.pages_visited, result.truncated) == (3, True)
+
+
+# MARK: Link Graph Tests
+
+
+class GatedClient(FakeClient):
+    """Serve the pages of the link graph, holding back the root page until released."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def get_pages_content(self, page_titles: Iterable[str]) -> dict[str, PageContent]:
+        titles = list(page_titles)
+        if "Root" in titles:
+            self.fetched.extend(titles)
+            await self.release.wait()
+            return {title: LINK_GRAPH[title] for title in titles}
+        return await super().get_pages_content(titles)
+
+
+@pytest.mark.anyio
+async def test_walk_pages__records_links():
+    """The links of the fetched pages are stored in the link index."""
+    link_graph = LinkGraph()
+    await walk_pages("Root", 1, client=FakeClient(), link_index=link_graph)
+    assert await link_graph.get_links(["Root", "Child A", "Grandchild"]) == {
+        "Root": LINK_GRAPH["Root"].links,
+        "Child A": LINK_GRAPH["Child A"].links,
+    }
+
+
+@pytest.mark.anyio
+async def test_walk_pages__prefetches_known_links():
+    """The next level is fetched while the current one is pending, and served from the cache."""
+    link_graph = LinkGraph()
+    link_graph.update({"Root": LINK_GRAPH["Root"]})
+    client = GatedClient()
+    source = CachingPageSource(client, LRUPageCache(10), ttl=60)
+
+    crawl = asyncio.ensure_future(
+        walk_pages("Root", 1, client=source, count_page=source.count_page, link_index=link_graph),
+    )
+    await asyncio.sleep(0.01)
+    assert client.fetched == ["Root", "Child A", "Child B"]
+
+    client.release.set()
+    result = await crawl
+    assert result.word_counter == Counter({"root": 1, "words": 2, "child": 2, "b": 1})
+    assert client.fetched == ["Root", "Child A", "Child B"]
@@ -0,0 +1,37 @@
+"""Tests for the wikitext module."""
+
+import pytest
+
+from wikicounter.wikitext import link_prefixes, normalize_title, wikitext_links, wikitext_to_text
+
+
+@pytest.mark.parametrize(
+    ("title", "expected"),
+    [("child_a", "Child a"), ("  Root  ", "Root"), ("Ünïcode title", "Ünïcode title")],
+)
+def test_normalize_title(title: str, expected: str):
+    assert normalize_title(title) == expected
+
+
+def test_wikitext_links():
+    """Only distinct article links are kept."""
+    wikitext = (
+        "[[a|x]] [[B#Section]] [[A]] [[Category:C]] [[de:D]] [[:File:E]] [[#Top]]"
+        " [[Star Wars: Episode I]] [[Tom: A film]] [[Art: B]] [[zh-yue:E]] [[Talk:F]] [[wikt:G]]"
+    )
+    assert wikitext_links(wikitext) == ["A", "B", "Star Wars: Episode I", "Tom: A film", "Art: B"]
+
+
+def test_wikitext_links__prefixes():
+    """The links to the given namespaces are skipped, those of the English Wikipedia are kept."""
+    prefixes = link_prefixes(["Kategorie", "Diskussion"])
+    wikitext = "[[Kategorie:A]] [[diskussion:B]] [[Category:C]] [[en:D]]"
+    assert wikitext_links(wikitext, prefixes) == ["Category:C"]
+
+
+def test_wikitext_to_text():
+    wikitext = (
+        "== Title ==\n''Bold'' {{cite|{{nested}}}} [[A|label]] [[B]] [https://x.org site]"
+        "<!-- comment --> <ref name=x/> [[Category:C]] <b>tag</b>"
+    )
+    assert wikitext_to_text(wikitext) == " Title \nBold  label B site   tag"